@@ -1,11 +1,20 @@
 import os
 import json  # Import the json library
-from flask import Flask, request, jsonify
+import functools
+from flask import Flask, Response, request, jsonify, make_response
 import requests
 from dotenv import load_dotenv
 
-from lambda_climate_data.climate_point_interpolation import optimized_climate_data
-import time
+from lambda_climate_data.climate_point_interpolation import (
+    optimized_climate_data,
+    optimized_climate_data_batch,
+    climate_data_year,
+    NoDataForYearError,
+    FORMAT_VERSIONS,
+    MAX_BATCH_POINTS,
+)
+from lambda_climate_data.climate_json import dumps
+from lambda_climate_data.tracing import span, server_timing, TRACE_DEBUG
 from flask_cors import CORS
 
 application = Flask(__name__)
@@ -20,7 +29,34 @@ It is not used in production.
 """
 
 
+def traced_route(view):
+    """
+    Run a view in a span named after it. Set TRACE_LOG=- to log the spans, and
+    TRACE_DEBUG=1 to return their durations in a Server-Timing header.
+    """
+
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        with span(view.__name__) as request_span:
+            response = make_response(view(*args, **kwargs))
+        if TRACE_DEBUG:
+            response.headers["Server-Timing"] = server_timing(request_span)
+            response.headers["Timing-Allow-Origin"] = "*"
+        return response
+
+    return wrapper
+
+
+def json_response(data):
+    # jsonify would write NaN, which the frontend cannot parse
+    with span("encode_response") as encode_span:
+        body = dumps(data)
+        encode_span.set(bytes=len(body))
+    return Response(body, mimetype="application/json")
+
+
 @application.route("/climate_data", methods=["POST"])
+@traced_route
 def climate_data():
     # Get the raw JSON from the request
     data = request.get_json()
@@ -50,17 +86,44 @@ def climate_data():
                     400,
                 )
 
-            start_time = time.time()  # Start timer
-            climate_data, location_data = optimized_climate_data(
-                latitude, longitude, elevation
-            )
-            print("Backend Server Elapsed Time:", time.time() - start_time, "seconds")
+            # Opt in to the columnar historical records with "format_version": 2
+            try:
+                format_version = int(inner_data.get("format_version", 1))
+            except (TypeError, ValueError):
+                format_version = inner_data["format_version"]
+            if format_version not in FORMAT_VERSIONS:
+                return (
+                    jsonify({"error": f"Unsupported format_version {format_version}"}),
+                    400,
+                )
+
+            if inner_data.get("year") is not None:
+                # One year of historical data, "year": 2015
+                try:
+                    year = int(inner_data["year"])
+                except (TypeError, ValueError):
+                    return jsonify({"error": f"Invalid year {inner_data['year']}"}), 400
+                try:
+                    data = climate_data_year(
+                        latitude, longitude, elevation, year, format_version
+                    )
+                except NoDataForYearError as e:
+                    return jsonify({"error": str(e)}), 400
+            else:
+                # Only the averages and the list of years, "summary": true
+                climate_data, location_data = optimized_climate_data(
+                    latitude,
+                    longitude,
+                    elevation,
+                    format_version,
+                    include_historical=not inner_data.get("summary", False),
+                )
+                data = {
+                    "climate_data": climate_data,
+                    "location_data": location_data,
+                }
 
-            data = {
-                "climate_data": climate_data,
-                "location_data": location_data,
-            }
-            return jsonify(data)
+            return json_response(data)
         else:
             # If one of the keys is missing, send an appropriate response
             return (
@@ -74,6 +137,64 @@ def climate_data():
         return jsonify({"error": "No body key in JSON."}), 400
 
 
+@application.route("/climate_data_batch", methods=["POST"])
+@traced_route
+def climate_data_batch():
+    """
+    Climate data for several points at once, reading the stations they share once.
+    The inner body is {"points": [{"latitude", "longitude", "elevation"}, ...]}, and
+    the response is {"results": [{"climate_data", "location_data"}, ...]} in order.
+    With "summary": true only the averages are returned for each point.
+    """
+    data = request.get_json()
+    if "body" not in data:
+        return jsonify({"error": "No body key in JSON."}), 400
+    inner_data = json.loads(data["body"])
+
+    try:
+        points = [
+            (
+                float(point["latitude"]),
+                float(point["longitude"]),
+                float(point["elevation"]),
+            )
+            for point in inner_data["points"]
+        ]
+    except (KeyError, TypeError, ValueError):
+        return (
+            jsonify(
+                {"error": "Each point needs a latitude, longitude, and elevation."}
+            ),
+            400,
+        )
+
+    if not 0 < len(points) <= MAX_BATCH_POINTS:
+        return jsonify({"error": f"Send between 1 and {MAX_BATCH_POINTS} points."}), 400
+    try:
+        format_version = int(inner_data.get("format_version", 1))
+    except (TypeError, ValueError):
+        format_version = inner_data["format_version"]
+    if format_version not in FORMAT_VERSIONS:
+        return (
+            jsonify({"error": f"Unsupported format_version {format_version}"}),
+            400,
+        )
+
+    results = optimized_climate_data_batch(
+        points,
+        format_version,
+        include_historical=not inner_data.get("summary", False),
+    )
+
+    data = {
+        "results": [
+            {"climate_data": climate_data, "location_data": location_data}
+            for climate_data, location_data in results
+        ]
+    }
+    return json_response(data)
+
+
 """
 @application.route("/elevation", methods=["POST"])
 def elevation():
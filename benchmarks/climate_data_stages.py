@@ -0,0 +1,331 @@
+"""
+Time optimized_climate_data end to end and stage by stage on synthetic stations.
+
+    python benchmarks/climate_data_stages.py [--data-dir DIR] [--repeat 10]
+        [--format-version 1] [--save-baseline FILE | --baseline FILE]
+        [--tolerance 0.25]
+
+The stations, station tables and models are written by synthetic_stations.py, into
+--data-dir if given (and not already there) or a temporary directory, so nothing is
+read from S3. Each point is run once untimed to load the station catalog and models,
+then --repeat times with the daily frame cache cleared, reporting the p50 and p95 of
+each stage. Stages run on station threads are summed over the threads, so they can
+add up to more than the stage that runs them. A last run per point under tracemalloc
+reports the peak memory and the blocks still allocated by the result.
+
+--save-baseline writes the timings, the memory and a fingerprint of the results to
+FILE. --baseline compares against FILE, and exits non-zero if the results differ or
+a stage's p50 is slower than the baseline's by more than --tolerance. The stages
+summed over threads are not checked, as their sum depends on the thread scheduling.
+"""
+
+import os
+import io
+import sys
+import json
+import time
+import hashlib
+import argparse
+import functools
+import tempfile
+import threading
+import tracemalloc
+from collections import defaultdict
+from contextlib import redirect_stdout
+import numpy as np
+
+import common  # puts the repository root on sys.path
+import lambda_climate_data.climate_point_interpolation as cpi
+from lambda_climate_data import climate_json
+from synthetic_stations import BENCHMARK_POINTS, generate
+
+# Functions of climate_point_interpolation timed as stages, in the order they run
+STAGES = [
+    "select_stations",
+    "load_station_data",
+    "process_noaa_station_data",
+    "process_nws_station_data",
+    "interpolate_station_data",
+    "fill_missing_nws_data",
+    "build_daily_climate_frame",
+    "PeriodRollups",
+    "climate_summary",
+    "historical_year",
+]
+# Stages run on the station threads. Their summed time depends on how the threads
+# share the GIL, so it is reported but not checked for regressions
+THREADED_STAGES = [
+    "load_station_data",
+    "process_noaa_station_data",
+    "process_nws_station_data",
+]
+# Station processors cannot be wrapped when they are pickled to the process pool
+PROCESS_POOL_STAGES = ["process_noaa_station_data", "process_nws_station_data"]
+# Stages faster than this are not reported as regressions, their timings are noise
+MIN_REGRESSION_MS = 2.0
+
+
+class StageTimer:
+    """Sums the time spent in each wrapped function since the last reset."""
+
+    def __init__(self):
+        self.totals = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def wrap(self, name, function):
+        @functools.wraps(function)
+        def timed(*args, **kwargs):
+            start_time = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start_time
+                with self._lock:
+                    self.totals[name] += elapsed
+
+        return timed
+
+    def reset(self):
+        totals = dict(self.totals)
+        self.totals.clear()
+        return totals
+
+
+def install_stage_timer():
+    timer = StageTimer()
+    for name in STAGES:
+        if cpi.STATION_EXECUTION_MODE == "process" and name in PROCESS_POOL_STAGES:
+            continue
+        setattr(cpi, name, timer.wrap(name, getattr(cpi, name)))
+    return timer
+
+
+def point_label(point):
+    return ",".join(f"{value:g}" for value in point)
+
+
+def run_point(point, format_version):
+    # A cached daily frame would skip every stage but the summary and historical
+    cpi.DAILY_FRAMES = cpi.DailyFrameCache()
+    start_time = time.perf_counter()
+    climate_data, location_data = cpi.optimized_climate_data(*point, format_version)
+    end_to_end = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    body = climate_json.dumps(climate_data)
+    encode = time.perf_counter() - start_time
+    return climate_data, location_data, body, end_to_end, encode
+
+
+def time_stages(points, format_version, repeat, timer):
+    samples = defaultdict(list)
+    for _ in range(repeat):
+        for point in points:
+            timer.reset()
+            _, _, _, end_to_end, encode = run_point(point, format_version)
+            for name, elapsed in timer.reset().items():
+                samples[name].append(elapsed)
+            samples["end_to_end"].append(end_to_end)
+            samples["encode"].append(encode)
+
+    return {
+        name: {
+            "p50_ms": float(np.percentile(samples[name], 50) * 1000),
+            "p95_ms": float(np.percentile(samples[name], 95) * 1000),
+        }
+        for name in STAGES + ["end_to_end", "encode"]
+        if samples[name]
+    }
+
+
+def measure_memory(point, format_version):
+    tracemalloc.start()
+    try:
+        climate_data, _, _, _, _ = run_point(point, format_version)
+        _, peak = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    statistics = snapshot.statistics("filename")
+    del climate_data
+    return {
+        "peak_mb": peak / 1024**2,
+        "retained_mb": sum(stat.size for stat in statistics) / 1024**2,
+        "retained_blocks": sum(stat.count for stat in statistics),
+    }
+
+
+def result_fingerprint(climate_data, location_data, body):
+    """
+    The averages, the annual value of each historical year and the location data,
+    as decoded from JSON, with a hash of the whole encoded result.
+    """
+    historical = climate_data.get("historical", {})
+    return {
+        "sha256": hashlib.sha256(body).hexdigest(),
+        "values": json.loads(
+            climate_json.dumps(
+                {
+                    "avg_annual": climate_data["avg_annual"],
+                    "avg_monthly": climate_data["avg_monthly"],
+                    "historical_annual": {
+                        str(year): data["annual"] for year, data in historical.items()
+                    },
+                    "location": location_data,
+                }
+            )
+        ),
+    }
+
+
+def differences(value, expected, rtol, path=""):
+    """Paths where value differs from expected by more than rtol."""
+    if isinstance(expected, dict):
+        if not isinstance(value, dict) or value.keys() != expected.keys():
+            return [f"{path}: keys differ"]
+        return [
+            difference
+            for key in expected
+            for difference in differences(
+                value[key], expected[key], rtol, f"{path}/{key}"
+            )
+        ]
+    if isinstance(expected, list):
+        if not isinstance(value, list) or len(value) != len(expected):
+            return [f"{path}: lengths differ"]
+        return [
+            difference
+            for i, (item, expected_item) in enumerate(zip(value, expected))
+            for difference in differences(item, expected_item, rtol, f"{path}/{i}")
+        ]
+    if isinstance(expected, float) and isinstance(value, (int, float)):
+        if np.isclose(value, expected, rtol=rtol, atol=rtol):
+            return []
+    elif value == expected:
+        return []
+    return [f"{path}: {value!r} != {expected!r}"]
+
+
+def compare_to_baseline(report, baseline, tolerance, rtol):
+    """Print the comparison and return the list of failures."""
+    if report["config"] != baseline["config"]:
+        return [f"config {report['config']} != baseline {baseline['config']}"]
+
+    failures = []
+    for label, fingerprint in report["results"].items():
+        expected = baseline["results"][label]
+        if fingerprint["sha256"] == expected["sha256"]:
+            print(f"{label}: result identical to the baseline")
+            continue
+        result_differences = differences(
+            fingerprint["values"], expected["values"], rtol
+        )
+        if result_differences:
+            failures.extend(f"{label}{difference}" for difference in result_differences)
+        else:
+            print(f"{label}: result within rtol {rtol:g} of the baseline")
+
+    print(f"{'stage':28s} {'p50 ms':>10s} {'baseline':>10s} {'change':>8s}")
+    for name, timing in report["timings"].items():
+        if name not in baseline["timings"]:
+            continue
+        expected_ms = baseline["timings"][name]["p50_ms"]
+        change = timing["p50_ms"] / expected_ms - 1 if expected_ms else 0.0
+        print(
+            f"{name:28s} {timing['p50_ms']:10.1f} {expected_ms:10.1f} "
+            f"{change * 100:+7.1f}%"
+        )
+        if name in THREADED_STAGES:
+            continue
+        if change > tolerance and timing["p50_ms"] - expected_ms > MIN_REGRESSION_MS:
+            failures.append(
+                f"{name} p50 {timing['p50_ms']:.1f} ms, baseline {expected_ms:.1f} ms"
+            )
+    return failures
+
+
+def run(args, data_dir):
+    if not os.path.exists(os.path.join(data_dir, "noaa-station-identifiers.csv")):
+        generate(data_dir)
+    cpi.STATION_STORE.local_directory = data_dir
+    cpi.STATION_STORE.station_directory = os.path.join(data_dir, "STATIONS")
+    points = BENCHMARK_POINTS
+
+    output = sys.stdout if args.verbose else io.StringIO()
+    timer = install_stage_timer()
+    with redirect_stdout(output):
+        results = {}
+        for point in points:
+            climate_data, location_data, body, _, _ = run_point(
+                point, args.format_version
+            )
+            results[point_label(point)] = result_fingerprint(
+                climate_data, location_data, body
+            )
+        timings = time_stages(points, args.format_version, args.repeat, timer)
+        memory = {
+            point_label(point): measure_memory(point, args.format_version)
+            for point in points
+        }
+
+    return {
+        "config": {
+            "points": [point_label(point) for point in points],
+            "format_version": args.format_version,
+            "station_execution_mode": cpi.STATION_EXECUTION_MODE,
+        },
+        "timings": timings,
+        "memory": memory,
+        "results": results,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--data-dir")
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--format-version", type=int, default=1)
+    parser.add_argument("--save-baseline")
+    parser.add_argument("--baseline")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.25,
+        help="allowed p50 slowdown of a stage as a fraction of the baseline",
+    )
+    parser.add_argument(
+        "--rtol",
+        type=float,
+        default=1e-9,
+        help="allowed relative difference of a result value from the baseline",
+    )
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    if args.data_dir:
+        report = run(args, args.data_dir)
+    else:
+        with tempfile.TemporaryDirectory() as data_dir:
+            report = run(args, data_dir)
+
+    print(f"{len(report['results'])} point(s), {args.repeat} repeats")
+    print(f"{'stage':28s} {'p50 ms':>10s} {'p95 ms':>10s}")
+    for name, timing in report["timings"].items():
+        print(f"{name:28s} {timing['p50_ms']:10.1f} {timing['p95_ms']:10.1f}")
+    for label, memory in report["memory"].items():
+        print(
+            f"{label}: peak {memory['peak_mb']:.1f} MB, result holds "
+            f"{memory['retained_mb']:.1f} MB in {memory['retained_blocks']} blocks"
+        )
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved baseline to {args.save_baseline}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        failures = compare_to_baseline(report, baseline, args.tolerance, args.rtol)
+        if failures:
+            raise SystemExit("Regressions:\n" + "\n".join(failures))
+        print("No regressions against the baseline")
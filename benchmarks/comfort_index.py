@@ -0,0 +1,85 @@
+"""
+Check climate_kernels.calc_comfort_index_vector against the Series.apply version it
+replaced, and time both.
+
+    python benchmarks/comfort_index.py [--rows 9862] [--repeat 5]
+
+Inputs are random values plus every breakpoint of the scores and NaN. Exits non-zero
+if any output differs.
+"""
+
+import argparse
+import numpy as np
+import pandas as pd
+
+from common import best_time
+from lambda_climate_data.climate_kernels import calc_comfort_index_vector
+
+BREAKPOINTS = [-10, 0, 20, 55, 60, 70, 80, 110, 130, np.nan]
+
+
+def previous_comfort_index(temperature_df, apparent_df, dewpoint_df, sunshine_df):
+    """calc_comfort_index_vector before it was vectorized."""
+
+    def temperature_score(temp):
+        if temp <= 20 or temp >= 110:
+            return 0
+        elif temp == 70:
+            return 100
+        elif 20 < temp < 70:
+            return (temp - 20) * (100 / 50)
+        elif 70 < temp < 110:
+            return (110 - temp) * (100 / 40)
+
+    def dewpoint_score(dewpoint):
+        if dewpoint >= 80:
+            return 0
+        elif dewpoint < 55:
+            return 100
+        else:
+            return (80 - dewpoint) * (100 / 25)
+
+    def sunlight_score(sunlight):
+        if sunlight >= 60:
+            return 100
+        elif sunlight <= 0:
+            return 0
+        else:
+            return sunlight * (100 / 60)
+
+    df = pd.DataFrame()
+    df["temp_score"] = temperature_df.apply(temperature_score) * 0.4
+    df["apparent_temp_score"] = apparent_df.apply(temperature_score) * 0.2
+    df["dew_score"] = dewpoint_df.apply(dewpoint_score) * 0.2
+    df["sun_score"] = sunshine_df.apply(sunlight_score) * 0.2
+    df["comfort_index"] = (
+        df["temp_score"] + df["apparent_temp_score"] + df["dew_score"] + df["sun_score"]
+    )
+    return df["comfort_index"]
+
+
+def inputs(rows, rng):
+    columns = []
+    for low, high in [(0, 120), (-10, 130), (20, 90), (-5, 100)]:
+        values = rng.uniform(low, high, rows)
+        values[: len(BREAKPOINTS)] = rng.permutation(BREAKPOINTS)
+        columns.append(pd.Series(values))
+    return columns
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=9862)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    columns = inputs(args.rows, np.random.default_rng(0))
+    previous_seconds, expected = best_time(previous_comfort_index, columns, 1)
+    seconds, result = best_time(calc_comfort_index_vector, columns, args.repeat)
+
+    print(f"Series.apply  {previous_seconds * 1000:8.2f} ms")
+    print(f"vectorized    {seconds * 1000:8.2f} ms")
+
+    if not np.array_equal(result.to_numpy(), expected.to_numpy(), equal_nan=True):
+        raise SystemExit("Vectorized comfort index differs from the previous version")
+    print("Outputs identical")
@@ -0,0 +1,25 @@
+"""
+Setup shared by the benchmark scripts.
+
+Importing it puts the repository root on sys.path, so a script run as
+python benchmarks/<script>.py can import lambda_climate_data, and the other scripts
+in benchmarks can already be imported as they share the script's directory.
+"""
+
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+
+def best_time(function, args, repeat):
+    """Call function(*args) repeat times and return the fastest seconds and the result."""
+    times = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        result = function(*args)
+        times.append(time.perf_counter() - start_time)
+    return min(times), result
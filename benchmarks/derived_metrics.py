@@ -0,0 +1,178 @@
+"""
+Check the fused apparent temperature, humidity and UV kernels in climate_kernels against
+the per-column versions they replaced, and time both.
+
+    python benchmarks/derived_metrics.py [--rows 9862] [--repeat 5]
+
+The apparent temperatures of the six temperature columns and the humidity of the three
+are computed the way the climate data service does. Inputs include the heat index and
+wind chill breakpoints, calm wind and NaN. Exits non-zero if any output differs.
+"""
+
+import argparse
+import warnings
+import numpy as np
+import pandas as pd
+
+from common import best_time
+from lambda_climate_data.climate_kernels import (
+    calc_apparent_temperatures,
+    calc_humidity_percentages,
+    calc_uv_index_vectorized,
+)
+
+TEMPERATURE_BREAKPOINTS = [20, 49.9, 50, 70, 80, 81, 87, 95, 110, 112, np.nan]
+
+
+def previous_uv_index(sun_angle, altitude, sunshine_percentage):
+    # Ensure sunshine_percentage is within [0,1]
+    sunshine_percentage = sunshine_percentage.clip(0, 100) / 100
+
+    # Calculate the basic UV index
+    uv_index = (sun_angle / 90) * 12
+
+    # Adjust for altitude
+    altitude_adjustment = altitude / 1000 * 0.05
+    uv_index_adjusted = uv_index * (1 + altitude_adjustment)
+
+    # Adjust for sunshine percentage, with a sqrt transformation
+    uv_index_adjusted *= np.sqrt(sunshine_percentage).clip(0, 1)
+
+    return uv_index_adjusted.clip(lower=0)
+
+
+def previous_humidity_percentage(dew_points_F, temperatures_F):
+    # Convert Fahrenheit to Celsius
+    dew_points_C = (dew_points_F - 32) * 5 / 9
+    temperatures_C = (temperatures_F - 32) * 5 / 9
+
+    # Calculate actual vapor pressure
+    vapor_pressure = 6.112 * 10 ** (7.5 * dew_points_C / (237.7 + dew_points_C))
+
+    # Calculate saturation vapor pressure
+    saturation_vapor_pressure = 6.112 * 10 ** (
+        7.5 * temperatures_C / (237.7 + temperatures_C)
+    )
+
+    # Calculate humidity percentage
+    humidity_percentages = (vapor_pressure / saturation_vapor_pressure) * 100
+
+    # Handle the case where dew point is equal to or greater than the temperature
+    humidity_percentages = np.where(
+        dew_points_F >= temperatures_F, 100, humidity_percentages
+    )
+
+    return humidity_percentages
+
+
+def previous_apparent_temperature(T, DP, V):
+    # Replace zero values with 3 for wind speed
+    V = np.where(V == 0, 3, V)
+
+    RH = 100 * (
+        np.exp((17.625 * DP) / (243.04 + DP)) / np.exp((17.625 * T) / (243.04 + T))
+    )
+
+    # Conditions for Heat Index calculation
+    condition_heat_index = T > 80
+    HI = np.where(
+        condition_heat_index,
+        -42.379
+        + 2.04901523 * T
+        + 10.14333127 * RH
+        - 0.22475541 * T * RH
+        - 0.00683783 * T * T
+        - 0.05481717 * RH * RH
+        + 0.00122874 * T * T * RH
+        + 0.00085282 * T * RH * RH
+        - 0.00000199 * T * T * RH * RH,
+        T,  # default to nan, will be replaced later
+    )
+
+    # Adjustments for Heat Index
+    condition_adjustment1 = (T < 112) & (RH < 13)
+    adjustment1 = np.where(
+        condition_adjustment1,
+        ((13 - RH) / 4) * np.sqrt((17 - np.abs(T - 95.0)) / 17),
+        0,
+    )
+    condition_adjustment2 = (T < 87) & (RH > 85)
+    adjustment2 = np.where(condition_adjustment2, ((RH - 85) / 10) * ((87 - T) / 5), 0)
+    HI = HI - adjustment1 + adjustment2
+
+    # Conditions for Wind Chill calculation
+    condition_wind_chill = (T < 50) & (V >= 3)
+    WC = np.where(
+        condition_wind_chill,
+        35.74 + (0.6215 * T) - 35.75 * (V**0.16) + 0.4275 * T * (V**0.16),
+        T,  # default to nan, will be replaced later
+    )
+
+    # If neither Heat Index nor Wind Chill conditions are met, return the original temperature
+    result = np.where(
+        condition_heat_index | condition_wind_chill,
+        np.where(condition_heat_index, HI, WC),
+        T,
+    )
+
+    return result
+
+
+def inputs(rows, rng):
+    temperatures = []
+    for low, high in [(-30, 125)] * 6:
+        values = rng.uniform(low, high, rows)
+        values[: len(TEMPERATURE_BREAKPOINTS)] = rng.permutation(
+            TEMPERATURE_BREAKPOINTS
+        )
+        temperatures.append(pd.Series(values))
+    dewpoint = temperatures[0] - rng.uniform(-5, 60, rows)
+    dewpoint[len(TEMPERATURE_BREAKPOINTS)] = np.nan
+    wind = pd.Series(rng.choice([0, 0.5, 2.9, 3, 10], rows) * rng.uniform(0.5, 2, rows))
+    sun_angle = pd.Series(rng.uniform(-10, 95, rows))
+    sunshine = pd.Series(rng.uniform(-10, 110, rows))
+    sunshine[:5] = np.nan
+    return temperatures, dewpoint, wind, sun_angle, sunshine
+
+
+def previous_metrics(temperatures, dewpoint, wind, sun_angle, sunshine):
+    apparent = [previous_apparent_temperature(T, dewpoint, wind) for T in temperatures]
+    humidity = [previous_humidity_percentage(dewpoint, T) for T in temperatures[:3]]
+    uv_index = previous_uv_index(sun_angle, 6000.0, sunshine)
+    return apparent + humidity + [uv_index]
+
+
+def fused_metrics(temperatures, dewpoint, wind, sun_angle, sunshine):
+    temperatures = [T.to_numpy() for T in temperatures]
+    apparent = calc_apparent_temperatures(
+        temperatures, dewpoint.to_numpy(), wind.to_numpy()
+    )
+    humidity = calc_humidity_percentages(dewpoint.to_numpy(), temperatures[:3])
+    uv_index = calc_uv_index_vectorized(sun_angle, 6000.0, sunshine)
+    return apparent + humidity + [uv_index]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=9862)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    columns = inputs(args.rows, np.random.default_rng(0))
+    with warnings.catch_warnings():
+        # The previous heat index adjustment takes sqrt of negative values
+        warnings.simplefilter("ignore", RuntimeWarning)
+        previous_seconds, expected = best_time(previous_metrics, columns, args.repeat)
+    seconds, result = best_time(fused_metrics, columns, args.repeat)
+
+    print(f"per column  {previous_seconds * 1000:8.2f} ms")
+    print(f"fused       {seconds * 1000:8.2f} ms")
+
+    for previous_values, values in zip(expected, result):
+        if not np.array_equal(
+            np.asarray(previous_values, dtype=float),
+            np.asarray(values, dtype=float),
+            equal_nan=True,
+        ):
+            raise SystemExit("Fused kernels differ from the previous versions")
+    print("Outputs identical")
@@ -0,0 +1,103 @@
+"""
+Profile the cold import of the interpolation module and check it against a budget.
+
+    python benchmarks/import_time.py [--module lambda_climate_data.climate_point_interpolation]
+        [--repeat 5] [--budget-ms 1000] [--top 15] [--forbid sklearn ...]
+
+Each repeat imports the module in a fresh interpreter with -X importtime, so nothing
+is already loaded. Reports the median total import time and the modules costing the
+most, grouped by top-level package. Exits non-zero if the median total is over
+--budget-ms (IMPORT_BUDGET_MS by default), or if any --forbid module was imported.
+The forbidden modules default to the heavy dependencies the request path loads only
+when it needs them.
+"""
+
+import os
+import sys
+import argparse
+import subprocess
+from collections import defaultdict
+import numpy as np
+
+from common import ROOT
+
+DEFAULT_MODULE = "lambda_climate_data.climate_point_interpolation"
+DEFAULT_BUDGET_MS = float(os.environ.get("IMPORT_BUDGET_MS", 1000))
+# Loaded by climate_models and station_store when a model or S3 is first used, and
+# by station_archive when an archive file is first read. pandas imports pyarrow itself.
+DEFAULT_FORBIDDEN = ["sklearn", "joblib", "scipy.stats", "boto3", "pyarrow.parquet"]
+
+
+def import_profile(module):
+    """
+    Import module in a fresh interpreter.
+
+    :return: List of (module name, self microseconds, cumulative microseconds), in
+        the order -X importtime reports them.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise SystemExit(f"Importing {module} failed:\n{result.stderr}")
+
+    profile = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        profile.append((name.strip(), int(self_us), int(cumulative_us)))
+    return profile
+
+
+def package_costs(profile):
+    """Self time summed by top-level package, in milliseconds."""
+    costs = defaultdict(float)
+    for name, self_us, _ in profile:
+        costs[name.split(".")[0]] += self_us / 1000
+    return costs
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--module", default=DEFAULT_MODULE)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument(
+        "--forbid",
+        nargs="*",
+        default=DEFAULT_FORBIDDEN,
+        help="modules that must not be imported by the module",
+    )
+    args = parser.parse_args()
+
+    profiles = [import_profile(args.module) for _ in range(args.repeat)]
+    totals_ms = [
+        next(cumulative for name, _, cumulative in profile if name == args.module)
+        / 1000
+        for profile in profiles
+    ]
+    # The repeat with the median total is representative of the breakdown
+    median_profile = profiles[int(np.argsort(totals_ms)[len(totals_ms) // 2])]
+    total_ms = float(np.median(totals_ms))
+
+    print(f"{args.module}: median {total_ms:.0f} ms over {args.repeat} cold imports")
+    print(f"{'package':28s} {'self ms':>8s}")
+    costs = package_costs(median_profile)
+    for package, cost in sorted(costs.items(), key=lambda item: -item[1])[: args.top]:
+        print(f"{package:28s} {cost:8.1f}")
+
+    imported = {name for name, _, _ in median_profile}
+    forbidden = [name for name in args.forbid if name in imported]
+    failures = []
+    if forbidden:
+        failures.append(f"imported {', '.join(forbidden)}")
+    if total_ms > args.budget_ms:
+        failures.append(f"{total_ms:.0f} ms is over the {args.budget_ms:.0f} ms budget")
+    if failures:
+        raise SystemExit(f"{args.module} " + "; ".join(failures))
+    print(f"Within the {args.budget_ms:.0f} ms budget")
@@ -0,0 +1,96 @@
+"""
+Compare encoding the climate data result with climate_json.dumps against the previous
+path, which cleaned a copy of the result with handle_nan and then ran json.dumps.
+
+    python benchmarks/json_encoding.py [--years 24] [--repeat 5]
+
+The result is synthetic but has the shape optimized_climate_data returns, with a
+share of NaN values. Each encoder's output is checked to decode to the same data.
+"""
+
+import json
+import argparse
+import numpy as np
+
+from common import best_time
+from lambda_climate_data import climate_json
+
+NUM_COLUMNS = 45
+NAN_FRACTION = 0.05
+
+
+def handle_nan(obj):
+    """The recursive cleanup optimized_climate_data used to apply before encoding."""
+    if isinstance(obj, float) and np.isnan(obj):
+        return None
+    elif isinstance(obj, np.float_):
+        return float(obj) if not np.isnan(obj) else None
+    elif isinstance(obj, np.int_):
+        return int(obj)
+    elif isinstance(obj, (list, tuple, np.ndarray)):
+        return [handle_nan(item) for item in obj]
+    elif isinstance(obj, dict):
+        return {k: handle_nan(v) for k, v in obj.items()}
+    return obj
+
+
+def synthetic_result(years, rng):
+    columns = [f"COLUMN_{i}" for i in range(NUM_COLUMNS)]
+
+    def records(count):
+        values = rng.normal(50, 20, (count, NUM_COLUMNS))
+        values[rng.random(values.shape) < NAN_FRACTION] = np.nan
+        return [dict(zip(columns, row.tolist())) for row in values]
+
+    return {
+        "avg_annual": records(1)[0],
+        "avg_monthly": records(12),
+        "avg_daily": records(366),
+        "historical": {
+            year: {
+                "annual": records(1)[0],
+                "monthly": records(12),
+                "daily": records(365),
+            }
+            for year in range(2000, 2000 + years)
+        },
+    }
+
+
+def previous_dumps(result):
+    return json.dumps(handle_nan(result)).encode()
+
+
+def stdlib_dumps(result):
+    orjson = climate_json.orjson
+    climate_json.orjson = None
+    try:
+        return climate_json.dumps(result)
+    finally:
+        climate_json.orjson = orjson
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--years", type=int, default=24)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    result = synthetic_result(args.years, np.random.default_rng(0))
+    encoders = [("handle_nan + json.dumps", previous_dumps), ("stdlib", stdlib_dumps)]
+    if climate_json.orjson is not None:
+        encoders.append(("orjson", climate_json.dumps))
+
+    expected = None
+    baseline = None
+    for name, encode in encoders:
+        seconds, encoded = best_time(encode, [result], args.repeat)
+        decoded = json.loads(encoded)
+        if expected is None:
+            expected, baseline = decoded, seconds
+        elif decoded != expected:
+            raise SystemExit(f"{name} output differs from the previous encoding")
+        print(
+            f"{name:<26} {seconds * 1000:9.1f} ms  {len(encoded) / 1e6:6.1f} MB"
+            f"  {baseline / seconds:5.1f}x"
+        )
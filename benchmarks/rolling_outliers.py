@@ -0,0 +1,99 @@
+"""
+Check climate_kernels.replace_rolling_outliers against the per-column pandas rolling
+filter it replaced, and time both.
+
+    python benchmarks/rolling_outliers.py [--rows 10957] [--repeat 5]
+
+Filters a high and a low temperature column with 3 standard deviations and a dewpoint
+column with 2, over centered 14 day windows, the way the NOAA aggregate is cleaned.
+Inputs are a seasonal cycle with noise and spikes, NaN gaps and runs of one repeated
+value. Exits non-zero if any outlier differs, or a cleaned value differs by more
+than --atol.
+"""
+
+import argparse
+import numpy as np
+import pandas as pd
+
+from common import best_time
+from lambda_climate_data.climate_kernels import replace_rolling_outliers
+
+WINDOW_SIZE = 14
+COLUMNS = {"DAILY_HIGH_AVG": 3, "DAILY_LOW_AVG": 3, "DAILY_DEWPOINT_AVG": 2}
+
+
+def previous_replace_outliers(dataframe, column_name, window_size, std_dev):
+    """replace_outliers_with_rolling_mean before it was moved to climate_kernels."""
+    rolling_mean = (
+        dataframe[column_name].rolling(window=window_size, center=True).mean()
+    )
+    rolling_std = dataframe[column_name].rolling(window=window_size, center=True).std()
+
+    is_outlier = (dataframe[column_name] < (rolling_mean - std_dev * rolling_std)) | (
+        dataframe[column_name] > (rolling_mean + std_dev * rolling_std)
+    )
+    dataframe.loc[is_outlier, column_name] = rolling_mean[is_outlier]
+    return dataframe, is_outlier
+
+
+def previous_filter(df):
+    df = df.copy()
+    is_outlier = []
+    for column_name, std_dev in COLUMNS.items():
+        df, column_outliers = previous_replace_outliers(
+            df, column_name, WINDOW_SIZE, std_dev
+        )
+        is_outlier.append(column_outliers.to_numpy())
+    return df[list(COLUMNS)].to_numpy().T, np.array(is_outlier)
+
+
+def fused_filter(df):
+    return replace_rolling_outliers(
+        [df[column_name] for column_name in COLUMNS],
+        WINDOW_SIZE,
+        list(COLUMNS.values()),
+    )
+
+
+def inputs(rows, rng):
+    seasonal = 25 * np.cos(2 * np.pi * np.arange(rows) / 365.25)
+    df = pd.DataFrame(
+        {
+            "DAILY_HIGH_AVG": 65 + seasonal + rng.normal(0, 6, rows),
+            "DAILY_LOW_AVG": 40 + seasonal + rng.normal(0, 6, rows),
+            "DAILY_DEWPOINT_AVG": 35 + seasonal + rng.normal(0, 4, rows),
+        }
+    )
+    for column_name in COLUMNS:
+        spikes = rng.random(rows) < 0.01
+        df.loc[spikes, column_name] += rng.choice([-40, 40], spikes.sum())
+        df.loc[rng.random(rows) < 0.002, column_name] = np.nan
+        start = rng.integers(0, rows - 30)
+        df.loc[start : start + rng.integers(5, 30), column_name] = 50.0
+    return df
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=10957)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--atol", type=float, default=1e-9)
+    args = parser.parse_args()
+
+    df = inputs(args.rows, np.random.default_rng(0))
+    previous_seconds, (expected, expected_outliers) = best_time(
+        previous_filter, [df], args.repeat
+    )
+    seconds, (cleaned, is_outlier) = best_time(fused_filter, [df], args.repeat)
+
+    print(f"pandas rolling   {previous_seconds * 1000:8.2f} ms")
+    print(f"cumulative sums  {seconds * 1000:8.2f} ms")
+    print(f"{int(is_outlier.sum())} outliers in {len(COLUMNS)} columns")
+
+    if not np.array_equal(is_outlier, expected_outliers):
+        raise SystemExit("Outliers differ from the previous version")
+    if not np.allclose(cleaned, expected, rtol=0, atol=args.atol, equal_nan=True):
+        raise SystemExit(
+            f"Cleaned values differ from the previous version by more than {args.atol}"
+        )
+    print(f"Outliers identical, cleaned values within {args.atol:g}")
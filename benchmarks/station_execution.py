@@ -0,0 +1,95 @@
+"""
+Compare the thread, process and serial STATION_EXECUTION_MODEs of the station
+processing in climate_point_interpolation, and check they give the same result.
+
+    python benchmarks/station_execution.py [--local-directory DIR]
+        [--station-directory DIR] [--point 39.2,-105.1,6000] [--repeat 5]
+
+The directories default to the repository root and its STATIONS directory, as when
+running application.py. Each mode is run once untimed first, so the process pool and
+the station catalog are already loaded when it is timed. Exits non-zero if any mode
+gives a different result from the thread mode.
+"""
+
+import os
+import time
+import argparse
+import numpy as np
+
+from common import ROOT
+import lambda_climate_data.climate_point_interpolation as cpi
+from lambda_climate_data.station_pool import (
+    process_pool_available,
+    shutdown_station_process_pool,
+)
+
+
+def parse_point(text):
+    latitude, longitude, elevation = (float(value) for value in text.split(","))
+    return latitude, longitude, elevation
+
+
+def run_mode(mode, points, repeat):
+    cpi.STATION_EXECUTION_MODE = mode
+    results = [cpi.interpolate_station_data(*point)[0] for point in points]
+    times = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        for point in points:
+            cpi.interpolate_station_data(*point)
+        times.append(time.perf_counter() - start_time)
+    return times, results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--local-directory", default=ROOT)
+    parser.add_argument("--station-directory")
+    parser.add_argument(
+        "--point",
+        action="append",
+        type=parse_point,
+        help="lat,lon,elevation, may be repeated",
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    cpi.STATION_STORE.local_directory = args.local_directory
+    cpi.STATION_STORE.station_directory = args.station_directory or os.path.join(
+        args.local_directory, "STATIONS"
+    )
+    points = args.point or [(39.2, -105.1, 6000.0)]
+
+    modes = ["thread", "serial"]
+    if process_pool_available():
+        modes.insert(1, "process")
+    else:
+        print("No /dev/shm, skipping the process mode")
+
+    timings = {}
+    expected = None
+    for mode in modes:
+        times, results = run_mode(mode, points, args.repeat)
+        timings[mode] = times
+        if expected is None:
+            expected = results
+            continue
+        for result, expected_result in zip(results, expected):
+            if not (
+                result.columns.equals(expected_result.columns)
+                and np.array_equal(
+                    result.drop(columns="DATE").to_numpy(dtype=np.float64),
+                    expected_result.drop(columns="DATE").to_numpy(dtype=np.float64),
+                    equal_nan=True,
+                )
+            ):
+                raise SystemExit(f"{mode} mode differs from thread mode")
+    shutdown_station_process_pool()
+
+    print(f"{len(points)} point(s), {args.repeat} repeats")
+    for mode, times in timings.items():
+        print(
+            f"{mode:8s} min {min(times) * 1000:8.1f} ms  "
+            f"mean {np.mean(times) * 1000:8.1f} ms"
+        )
+    print("Results identical across modes")
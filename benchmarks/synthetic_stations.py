@@ -0,0 +1,177 @@
+"""
+Write a synthetic data set laid out like the S3 bucket, for the benchmarks.
+
+    python benchmarks/synthetic_stations.py <out_dir> [--noaa-stations 20]
+        [--nws-stations 8] [--seed 0]
+
+Writes the NOAA and NWS station CSVs under <out_dir>/STATIONS, the station identifier
+tables, the model training CSVs, and the dewpoint model and adjustment coefficients
+built from them, all around 39N 105W. Values are random but seeded and the dates are
+fixed, so the same arguments always give the same files and the same climate data.
+Nothing is read from S3 or the network.
+"""
+
+import os
+import argparse
+import numpy as np
+import pandas as pd
+
+import common  # puts the repository root on sys.path
+from lambda_climate_data.station_archive import (
+    NOAA_STATION_DIRECTORY,
+    NWS_STATION_DIRECTORY,
+)
+from lambda_climate_data.station_store import LocalStationStore
+from lambda_climate_data.climate_models import (
+    ModelArtifactStore,
+    build_dewpoint_model,
+    build_dewpoint_adjustment,
+)
+
+CENTER = (39.0, -105.0)
+SPREAD_DEGREES = 1.5
+NOAA_DATES = pd.date_range("1995-01-01", "2024-12-31", freq="D")
+# The NWS record starts in 2019, the earlier dates are filled in by the gap-fill model
+NWS_DATES = pd.date_range("2019-04-01", "2024-12-31", freq="D")
+TRAINING_ROWS = 3000
+
+# Points inside the synthetic station field, for the benchmarks to request
+BENCHMARK_POINTS = [(39.2, -105.1, 6000.0), (38.6, -104.4, 4500.0)]
+
+
+def station_location(rng):
+    return (
+        round(CENTER[0] + rng.uniform(-SPREAD_DEGREES, SPREAD_DEGREES), 4),
+        round(CENTER[1] + rng.uniform(-SPREAD_DEGREES, SPREAD_DEGREES), 4),
+        float(rng.uniform(1000, 2500)),
+    )
+
+
+def noaa_station_frame(rng, station, seed):
+    """Daily TMAX/TMIN in tenths of C and PRCP/SNOW in tenths of mm, like GHCN-D."""
+    days = len(NOAA_DATES)
+    seasonal = np.cos(2 * np.pi * (NOAA_DATES.dayofyear.values - 200) / 365.25)
+    tmax = (180 + 150 * seasonal + rng.normal(0, 40, days)).round()
+    tmin = tmax - rng.uniform(60, 160, days).round()
+    prcp = np.where(rng.random(days) < 0.25, rng.exponential(40, days), 0).round()
+    df = pd.DataFrame(
+        {
+            "STATION": station,
+            "DATE": NOAA_DATES.strftime("%Y-%m-%d"),
+            "PRCP": prcp,
+            "SNOW": np.where(tmax < 20, prcp, 0),
+            "TMAX": tmax,
+            "TMIN": tmin,
+        }
+    )
+    # Stations miss some days entirely and some values on the days they report
+    df = df.sample(frac=0.97, random_state=seed).sort_values("DATE")
+    df.loc[df.sample(frac=0.01, random_state=seed + 1).index, "TMAX"] = np.nan
+    df.loc[df.sample(frac=0.01, random_state=seed + 2).index, "SNOW"] = np.nan
+    return df
+
+
+def nws_station_frame(rng):
+    """Daily climate report columns, with the NWS file naming quirks kept."""
+    days = len(NWS_DATES)
+    return pd.DataFrame(
+        {
+            "Date": NWS_DATES.strftime("%Y-%m-%d"),
+            "MAX SPD": rng.uniform(2, 15, days).round(1),
+            "DR": rng.integers(1, 36, days) * 10,
+            "S-S": rng.integers(-1, 11, days),
+            "DIR": rng.uniform(10, 40, days).round(),
+            "WX": rng.integers(0, 9, days),
+        }
+    )
+
+
+def write_training_data(rng, out_dir):
+    tmax = rng.uniform(10, 100, TRAINING_ROWS)
+    tmin = tmax - rng.uniform(5, 35, TRAINING_ROWS)
+    pd.DataFrame(
+        {
+            "TMax": tmax,
+            "TMin": tmin,
+            "Total": rng.exponential(0.1, TRAINING_ROWS),
+            "DAvg": tmin - rng.uniform(0, 15, TRAINING_ROWS),
+            "DMax": tmin,
+        }
+    ).to_csv(os.path.join(out_dir, "temperature-humidity-data.csv"), index=False)
+
+    high = rng.uniform(20, 100, TRAINING_ROWS)
+    low = high - rng.uniform(5, 35, TRAINING_ROWS)
+    predicted = low - 5
+    actual = predicted + 0.1 * (high - low) - 2 + rng.normal(0, 1, TRAINING_ROWS)
+    pd.DataFrame(
+        {
+            "High_Temp": high,
+            "Low_Temp": low,
+            "Predicted_Dewpoint": predicted,
+            "Actual_Dewpoint": actual,
+        }
+    ).to_csv(os.path.join(out_dir, "dewpoint-adjustment-data.csv"), index=False)
+
+
+def generate(out_dir, noaa_stations=20, nws_stations=8, seed=0):
+    """
+    Write the synthetic data set into out_dir.
+
+    :return: The LocalStationStore reading it.
+    """
+    rng = np.random.default_rng(seed)
+    noaa_dir = os.path.join(out_dir, "STATIONS", NOAA_STATION_DIRECTORY)
+    nws_dir = os.path.join(out_dir, "STATIONS", NWS_STATION_DIRECTORY)
+    os.makedirs(noaa_dir, exist_ok=True)
+    os.makedirs(nws_dir, exist_ok=True)
+
+    noaa_rows = []
+    for i in range(noaa_stations):
+        lat, lon, elevation = station_location(rng)
+        station, name = f"USC00{i:06d}", f"STATION{i}"
+        noaa_rows.append((lat, lon, station, elevation, name))
+        noaa_station_frame(rng, station, seed + i).to_csv(
+            os.path.join(
+                noaa_dir, f"{station}_{lat}_{lon}_{round(elevation)}_{name}.csv"
+            ),
+            index=False,
+        )
+    pd.DataFrame(
+        noaa_rows, columns=["LAT", "LON", "STATION", "ELEVATION", "NAME"]
+    ).to_csv(os.path.join(out_dir, "noaa-station-identifiers.csv"), index=False)
+
+    nws_rows = []
+    for i in range(nws_stations):
+        lat, lon, elevation = station_location(rng)
+        provider, city_code = f"PR{i}", f"C{i}"
+        nws_rows.append((lat, lon, provider, city_code, elevation, f"NWS{i}"))
+        nws_station_frame(rng).to_csv(
+            os.path.join(nws_dir, f"{provider}_{city_code}.csv"), index=False
+        )
+    pd.DataFrame(
+        nws_rows,
+        columns=["LAT", "LON", "NWS_PROVIDER", "CITY_CODE", "ELEVATION", "STATION"],
+    ).to_csv(os.path.join(out_dir, "nws-station-identifiers.csv"), index=False)
+
+    write_training_data(rng, out_dir)
+    store = LocalStationStore(out_dir, os.path.join(out_dir, "STATIONS"))
+    artifacts = ModelArtifactStore(store)
+    build_dewpoint_model(
+        os.path.join(out_dir, "temperature-humidity-data.csv"), artifacts
+    )
+    build_dewpoint_adjustment(
+        os.path.join(out_dir, "dewpoint-adjustment-data.csv"), artifacts
+    )
+    return store
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("out_dir")
+    parser.add_argument("--noaa-stations", type=int, default=20)
+    parser.add_argument("--nws-stations", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    generate(args.out_dir, args.noaa_stations, args.nws_stations, args.seed)
+    print(f"Wrote synthetic station data to {args.out_dir}")
@@ -3,6 +3,13 @@ import joblib
 import numpy as np
 import pandas as pd
 import time
+from climate_kernels import (
+    calc_comfort_index_vector,
+    calc_aparent_temp_vector,
+    calc_apparent_temperatures,
+    calc_humidity_percentages,
+    calc_uv_index_vectorized,
+)
 
 # Load the models
 sun_model = joblib.load("sunlight_linear_regression_model.pkl")
@@ -189,29 +196,30 @@ def calc_additional_climate_parameters(
         ]:
             replace_outliers(df, column)
 
-    df["apparent_high_temperature"] = calc_aparent_temp_vector(
-        df["high_temperature"],
-        df["dewpoint"],
-        df["wind"],
-    )
-    df["apparent_low_temperature"] = calc_aparent_temp_vector(
-        df["low_temperature"],
-        df["dewpoint"],
-        df["wind"],
+    (
+        df["apparent_high_temperature"],
+        df["apparent_low_temperature"],
+    ) = calc_apparent_temperatures(
+        [df["high_temperature"].to_numpy(), df["low_temperature"].to_numpy()],
+        df["dewpoint"].to_numpy(),
+        df["wind"].to_numpy(),
     )
 
     df["apparent_mean_temperature"] = (
         df["apparent_high_temperature"] + df["apparent_low_temperature"]
     ) / 2
 
-    df["morning_humidity"] = calc_humidity_percentage_vector(
-        df["dewpoint"], df["low_temperature"]
-    )
-    df["afternoon_humidity"] = calc_humidity_percentage_vector(
-        df["dewpoint"], df["high_temperature"]
-    )
-    df["mean_humidity"] = calc_humidity_percentage_vector(
-        df["dewpoint"], df["mean_temperature"]
+    (
+        df["morning_humidity"],
+        df["afternoon_humidity"],
+        df["mean_humidity"],
+    ) = calc_humidity_percentages(
+        df["dewpoint"].to_numpy(),
+        [
+            df["low_temperature"].to_numpy(),
+            df["high_temperature"].to_numpy(),
+            df["mean_temperature"].to_numpy(),
+        ],
     )
 
     df["morning_frost_chance"] = 100 * (
@@ -255,159 +263,6 @@ def calc_degree_days_vectorized(temperatures, degree_day_type):
         return None
 
 
-def calc_uv_index_vectorized(sun_angle, altitude, sunshine_percentage):
-    # Ensure sunshine_percentage is within [0,1]
-    sunshine_percentage = sunshine_percentage.clip(0, 100) / 100
-
-    # Calculate the basic UV index
-    uv_index = (sun_angle / 90) * 12
-
-    # Adjust for altitude
-    altitude_adjustment = altitude / 1000 * 0.05
-    uv_index_adjusted = uv_index * (1 + altitude_adjustment)
-
-    # Adjust for sunshine percentage, with a sqrt transformation
-    uv_index_adjusted *= np.sqrt(sunshine_percentage).clip(0, 1)
-
-    return uv_index_adjusted.clip(lower=0)
-
-
-def calc_humidity_percentage_vector(dew_points_F, temperatures_F):
-    # Convert Fahrenheit to Celsius
-    dew_points_C = (dew_points_F - 32) * 5 / 9
-    temperatures_C = (temperatures_F - 32) * 5 / 9
-
-    # Calculate actual vapor pressure
-    vapor_pressure = 6.112 * 10 ** (7.5 * dew_points_C / (237.7 + dew_points_C))
-
-    # Calculate saturation vapor pressure
-    saturation_vapor_pressure = 6.112 * 10 ** (
-        7.5 * temperatures_C / (237.7 + temperatures_C)
-    )
-
-    # Calculate humidity percentage
-    humidity_percentages = (vapor_pressure / saturation_vapor_pressure) * 100
-
-    # Handle the case where dew point is equal to or greater than the temperature
-    humidity_percentages = np.where(
-        dew_points_F >= temperatures_F, 100, humidity_percentages
-    )
-
-    return humidity_percentages
-
-
-# https://www.weather.gov/epz/wxcalc_windchill
-# https://www.wpc.ncep.noaa.gov/html/heatindex_equation.shtml
-def calc_aparent_temp_vector(T, DP, V):
-    # Replace zero values with 3 for wind speed
-    V = np.where(V == 0, 3, V)
-
-    RH = 100 * (
-        np.exp((17.625 * DP) / (243.04 + DP)) / np.exp((17.625 * T) / (243.04 + T))
-    )
-
-    # Conditions for Heat Index calculation
-    condition_heat_index = T > 80
-    HI = np.where(
-        condition_heat_index,
-        -42.379
-        + 2.04901523 * T
-        + 10.14333127 * RH
-        - 0.22475541 * T * RH
-        - 0.00683783 * T * T
-        - 0.05481717 * RH * RH
-        + 0.00122874 * T * T * RH
-        + 0.00085282 * T * RH * RH
-        - 0.00000199 * T * T * RH * RH,
-        T,  # default to nan, will be replaced later
-    )
-
-    # Adjustments for Heat Index
-    condition_adjustment1 = (T < 112) & (RH < 13)
-    adjustment1 = np.where(
-        condition_adjustment1,
-        ((13 - RH) / 4) * np.sqrt((17 - np.abs(T - 95.0)) / 17),
-        0,
-    )
-    condition_adjustment2 = (T < 87) & (RH > 85)
-    adjustment2 = np.where(condition_adjustment2, ((RH - 85) / 10) * ((87 - T) / 5), 0)
-    HI = HI - adjustment1 + adjustment2
-
-    # Conditions for Wind Chill calculation
-    condition_wind_chill = (T < 50) & (V >= 3)
-    WC = np.where(
-        condition_wind_chill,
-        35.74 + (0.6215 * T) - 35.75 * (V**0.16) + 0.4275 * T * (V**0.16),
-        T,  # default to nan, will be replaced later
-    )
-
-    # If neither Heat Index nor Wind Chill conditions are met, return the original temperature
-    result = np.where(
-        condition_heat_index | condition_wind_chill,
-        np.where(condition_heat_index, HI, WC),
-        T,
-    )
-
-    return result
-
-
-def calc_comfort_index_vector(temperature_df, apparent_df, dewpoint_df, sunshine_df):
-    def temperature_score(temp):
-        if temp <= 20 or temp >= 110:
-            return 0
-        elif temp == 70:
-            return 100
-        elif 20 < temp < 70:
-            return (temp - 20) * (100 / 50)  # linearly scale between 20 and 70
-        elif 70 < temp < 110:
-            return (110 - temp) * (100 / 40)  # linearly scale between 70 and 110
-
-    def apparent_temperature_score(apparent_temp):
-        if apparent_temp <= 20 or apparent_temp >= 110:
-            return 0
-        elif apparent_temp == 70:
-            return 100
-        elif 20 < apparent_temp < 70:
-            return (apparent_temp - 20) * (100 / 50)  # linearly scale between 20 and 70
-        elif 70 < apparent_temp < 110:
-            return (110 - apparent_temp) * (
-                100 / 40
-            )  # linearly scale between 70 and 110
-
-    def dewpoint_score(dewpoint):
-        if dewpoint >= 80:
-            return 0
-        elif dewpoint < 55:
-            return 100
-        else:
-            return (80 - dewpoint) * (100 / 25)  # linearly scale between 55 and 80
-
-    def sunlight_score(sunlight):
-        if sunlight >= 60:
-            return 100
-        elif sunlight <= 0:
-            return 0
-        else:
-            return sunlight * (100 / 60)  # linearly scale between 0 and 60
-
-    # Calculate individual component scores
-    df = pd.DataFrame()
-
-    df["temp_score"] = temperature_df.apply(temperature_score) * 0.4  # 40% weight
-    df["apparent_temp_score"] = (
-        apparent_df.apply(apparent_temperature_score) * 0.2
-    )  # 40% weight
-    df["dew_score"] = dewpoint_df.apply(dewpoint_score) * 0.2  # 20% weight
-    df["sun_score"] = sunshine_df.apply(sunlight_score) * 0.2  # 20% weight
-
-    # Calculate the final comfort index
-    df["comfort_index"] = (
-        df["temp_score"] + df["apparent_temp_score"] + df["dew_score"] + df["sun_score"]
-    )
-
-    return df["comfort_index"]
-
-
 # https://en.wikipedia.org/wiki/K%C3%B6ppen_climate_classification#Overview
 def calc_koppen_climate(temp_f, precip_in):
     # Conversion from Fahrenheit to Celsius and inches to millimeters
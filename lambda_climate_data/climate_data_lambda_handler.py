@@ -1,13 +1,24 @@
 import boto3
-import uuid
 import json
-from climate_point_interpolation import optimized_climate_data
-from botocore.exceptions import NoCredentialsError
+from climate_point_interpolation import (
+    optimized_climate_data_batch,
+    climate_data_year,
+    NoDataForYearError,
+    FORMAT_VERSIONS,
+    MAX_BATCH_POINTS,
+)
+from climate_json import dumps
+from result_cache import ResultLRU, data_version, quantize_point, result_key
+from tracing import span, server_timing, TRACE_DEBUG
+from botocore.exceptions import ClientError, NoCredentialsError
 
 # Initialize a boto3 S3 client
 s3_client = boto3.client("s3")
 BUCKET_NAME = "us-climate-maps-json-url"
 
+# Results written by this container, see result_cache.py
+RESULT_CACHE = ResultLRU()
+
 
 def create_presigned_url(bucket_name, object_name, expiration=3600):
     """Generate a presigned URL to share an S3 object"""
@@ -24,16 +35,174 @@ def create_presigned_url(bucket_name, object_name, expiration=3600):
     return response
 
 
-def upload_to_s3(bucket_name, object_name, data):
-    """Upload JSON data to S3 as a file"""
+def upload_to_s3(bucket_name, object_name, body):
+    """Upload encoded JSON to S3 as a file"""
     try:
-        s3_client.put_object(Bucket=bucket_name, Key=object_name, Body=json.dumps(data))
+        s3_client.put_object(
+            Bucket=bucket_name,
+            Key=object_name,
+            Body=body,
+            ContentType="application/json",
+        )
     except NoCredentialsError:
         print("Credentials not available")
-        return None
+        return False
+    return True
+
+
+def object_exists(bucket_name, object_name):
+    """Check for an S3 object without downloading it"""
+    try:
+        s3_client.head_object(Bucket=bucket_name, Key=object_name)
+    except ClientError as e:
+        code = e.response["Error"]["Code"]
+        if code == "403":
+            # S3 answers 403 for missing keys without s3:ListBucket on the bucket
+            print("No permission to check for a cached result, recomputing")
+        if code in ("NoSuchKey", "404", "403"):
+            return False
+        raise
+    return True
+
+
+def request_part(body):
+    """
+    The part of the result a request asks for: "summary" with "summary": true for
+    the averages without the historical data, the year with "year": 2015 for one
+    year of historical data, or "full".
+    """
+    if body.get("year") is not None:
+        return int(body["year"])
+    if body.get("summary"):
+        return "summary"
+    return "full"
+
+
+def compute_results(points, format_version, part):
+    """Compute the part of the result for each point, see request_part."""
+    if part in ("full", "summary"):
+        results = optimized_climate_data_batch(
+            points, format_version, include_historical=part == "full"
+        )
+        return [
+            {"climate_data": climate_data, "location_data": location_data}
+            for climate_data, location_data in results
+        ]
+    return [climate_data_year(*point, part, format_version) for point in points]
+
+
+def cached_result_names(points, format_version, part="full"):
+    """
+    Return the S3 object names holding the results for the points' cache cells,
+    computing and uploading the results no container has yet. The missing results
+    are computed together, so stations shared by the points are read once.
+
+    :param points: List of (latitude, longitude, elevation) tuples.
+    :param part: See request_part.
+    """
+    # One data version for the whole request, even if its period ends meanwhile
+    version = data_version()
+    file_names = [
+        result_key(*point, format_version, part, version=version) for point in points
+    ]
+    missing = {}
+    for point, file_name in zip(points, file_names):
+        if file_name in missing:
+            continue
+        if file_name in RESULT_CACHE:
+            print("RESULT CACHE HIT (memory): ", file_name)
+        elif object_exists(BUCKET_NAME, file_name):
+            print("RESULT CACHE HIT (S3): ", file_name)
+        else:
+            # Computed for the center of the cell, so it is valid for every point in it
+            missing[file_name] = quantize_point(*point)
+
+    if missing:
+        with span("compute_results", points=len(missing), part=part):
+            results = compute_results(list(missing.values()), format_version, part)
+        for file_name, result in zip(missing, results):
+            with span("upload_result", key=file_name) as upload_span:
+                body = dumps(result)
+                upload_span.set(bytes=len(body))
+                if upload_to_s3(BUCKET_NAME, file_name, body):
+                    RESULT_CACHE.add(file_name)
+    return file_names
+
+
+def cached_result_name(latitude, longitude, elevation, format_version, part="full"):
+    return cached_result_names(
+        [(latitude, longitude, elevation)], format_version, part
+    )[0]
+
+
+def error_response(status_code, message):
+    return {"statusCode": status_code, "body": json.dumps({"error": message})}
+
+
+def batch_response(body, format_version, part):
+    """
+    Handle a request for several points, {"points": [{"latitude", "longitude",
+    "elevation"}, ...]}, returning one presigned URL per point, in order.
+    """
+    try:
+        points = [
+            (
+                float(point["latitude"]),
+                float(point["longitude"]),
+                float(point["elevation"]),
+            )
+            for point in body["points"]
+        ]
+    except (KeyError, TypeError, ValueError):
+        return {
+            "statusCode": 400,
+            "body": json.dumps(
+                {"error": "Each point needs a latitude, longitude, and elevation"}
+            ),
+        }
+    if not 0 < len(points) <= MAX_BATCH_POINTS:
+        return {
+            "statusCode": 400,
+            "body": json.dumps(
+                {"error": f"Send between 1 and {MAX_BATCH_POINTS} points"}
+            ),
+        }
+
+    try:
+        file_names = cached_result_names(points, format_version, part)
+    except NoDataForYearError as e:
+        return error_response(400, str(e))
+    presigned_urls = [
+        create_presigned_url(BUCKET_NAME, file_name, expiration=3600)
+        for file_name in file_names
+    ]
+    if not all(presigned_urls):
+        return {
+            "statusCode": 500,
+            "body": json.dumps({"error": "Could not generate the presigned URL"}),
+        }
+    return {
+        "statusCode": 200,
+        "headers": {
+            "Content-Type": "application/json",
+            "Access-Control-Allow-Origin": "*",
+        },
+        "body": json.dumps({"urls": presigned_urls}),
+    }
 
 
 def lambda_handler(event, context):
+    with span("lambda_handler") as request_span:
+        response = handle_request(event)
+    if TRACE_DEBUG:
+        # Durations of the traced stages, shown in the browser's network panel
+        headers = response.setdefault("headers", {})
+        headers["Server-Timing"] = server_timing(request_span)
+        headers["Timing-Allow-Origin"] = "*"
+    return response
+
+
+def handle_request(event):
     if (
         event.get("source") == "aws.events"
         and event.get("detail-type") == "Scheduled Event"
@@ -44,28 +213,37 @@ def lambda_handler(event, context):
     # Parse the incoming JSON from the event body
     body = json.loads(event["body"])
 
+    # Opt in to the columnar historical records with "format_version": 2
+    try:
+        format_version = int(body.get("format_version", 1))
+    except (TypeError, ValueError):
+        format_version = body["format_version"]
+    if format_version not in FORMAT_VERSIONS:
+        return error_response(400, f"Unsupported format_version {format_version}")
+
+    try:
+        part = request_part(body)
+    except (TypeError, ValueError):
+        return error_response(400, f"Invalid year {body['year']}")
+
+    # Several points at once, e.g. for the compare page
+    if "points" in body:
+        return batch_response(body, format_version, part)
+
     # Check if the necessary data is in the body of the request
     if "latitude" in body and "longitude" in body and "elevation" in body:
         latitude = float(body["latitude"])
         longitude = float(body["longitude"])
         elevation = float(body["elevation"])
 
-        # Get the climate and location data
-        climate_data, location_data = optimized_climate_data(
-            latitude, longitude, elevation
-        )
-
-        # Prepare the data to return
-        result_data = {
-            "climate_data": climate_data,
-            "location_data": location_data,
-        }
-
-        # Generate a unique file name
-        file_name = f"climate_data/{uuid.uuid4()}_{latitude}_{longitude}.json"
-
-        # Upload the result data to S3
-        upload_to_s3(BUCKET_NAME, file_name, result_data)
+        # Get the climate and location data, or the result already stored for
+        # this neighborhood
+        try:
+            file_name = cached_result_name(
+                latitude, longitude, elevation, format_version, part
+            )
+        except NoDataForYearError as e:
+            return error_response(400, str(e))
 
         # Generate the presigned URL
         presigned_url = create_presigned_url(BUCKET_NAME, file_name, expiration=3600)
@@ -0,0 +1,61 @@
+import json
+import numpy as np
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+"""
+JSON encoding of the climate data result.
+
+The frontend cannot parse NaN or Infinity, so these are written as null. Encoding
+happens in one pass over the result without building a cleaned copy of it first.
+orjson is used when installed, since it writes NaN as null and NumPy types natively.
+Otherwise the standard library encoder is used with a hook for NumPy types, and the
+non-finite tokens it writes are replaced with null afterwards. Only tokens following
+a ":", "," or "[" are replaced, which is where the encoder writes values, so a string
+would have to contain one of those characters right before NaN or Infinity to be
+changed. The keys and values in the result never do.
+"""
+NON_FINITE_TOKENS = ["NaN", "-Infinity", "Infinity"]
+VALUE_PREFIXES = [":", ",", "["]
+
+
+def encode_numpy(obj):
+    """default hook for json.dumps, for the NumPy types it cannot encode."""
+    if isinstance(obj, np.integer):
+        return int(obj)
+    if isinstance(obj, np.floating):
+        return float(obj)
+    if isinstance(obj, np.bool_):
+        return bool(obj)
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def replace_non_finite(text):
+    """Replace the NaN and Infinity values written by json.dumps with null."""
+    for token in NON_FINITE_TOKENS:
+        # Checking first skips a full pass for the tokens that are not present
+        if token not in text:
+            continue
+        for prefix in VALUE_PREFIXES:
+            text = text.replace(prefix + token, prefix + "null")
+    return text
+
+
+def dumps(obj):
+    """
+    Serialize obj to UTF-8 JSON bytes, writing NaN and infinite floats as null.
+
+    :param obj: Nested dicts and lists of Python or NumPy values. Dict keys may be
+        str or int.
+    """
+    if orjson is not None:
+        return orjson.dumps(
+            obj, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+        )
+    text = json.dumps(obj, default=encode_numpy, separators=(",", ":"))
+    return replace_non_finite(text).encode()
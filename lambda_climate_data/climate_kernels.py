@@ -0,0 +1,329 @@
+import os
+import functools
+import numpy as np
+import pandas as pd
+
+"""
+Vectorized climate metric kernels shared by the point interpolation, the climate
+database and the global data services.
+
+This is the only copy. lambda_db/ and global_data/ import it through a symlink when
+run locally, and lambda_db/Dockerfile copies it from here, building from the
+repository root.
+"""
+# Solar geometry tables are memoized by latitude rounded to this many degrees
+SOLAR_LATITUDE_STEP = float(os.environ.get("SOLAR_LATITUDE_STEP", 0.01))
+SOLAR_TABLE_CACHE_SIZE = int(os.environ.get("SOLAR_TABLE_CACHE_SIZE", 1024))
+
+
+def comfort_temperature_score(temperature):
+    """
+    100 at 70F, falling linearly to 0 at 20F and at 110F. NaN stays NaN.
+    """
+    return np.select(
+        [
+            (temperature <= 20) | (temperature >= 110),
+            temperature == 70,
+            (temperature > 20) & (temperature < 70),
+            (temperature > 70) & (temperature < 110),
+        ],
+        [
+            0,
+            100,
+            (temperature - 20) * (100 / 50),  # linearly scale between 20 and 70
+            (110 - temperature) * (100 / 40),  # linearly scale between 70 and 110
+        ],
+        np.nan,
+    )
+
+
+def comfort_dewpoint_score(dewpoint):
+    """100 below 55F, falling linearly to 0 at 80F."""
+    return np.select(
+        [dewpoint >= 80, dewpoint < 55],
+        [0, 100],
+        (80 - dewpoint) * (100 / 25),  # linearly scale between 55 and 80
+    )
+
+
+def comfort_sunlight_score(sunlight):
+    """0 with no sunshine, rising linearly to 100 at 60% sunshine."""
+    return np.select(
+        [sunlight >= 60, sunlight <= 0],
+        [100, 0],
+        sunlight * (100 / 60),  # linearly scale between 0 and 60
+    )
+
+
+def calc_comfort_index_vector(temperature_df, apparent_df, dewpoint_df, sunshine_df):
+    """
+    Comfort index from 0 to 100, weighting the temperature score 40%, and the
+    apparent temperature, dewpoint and sunshine scores 20% each.
+
+    :return: Series with the index of temperature_df.
+    """
+    temperature = np.asarray(temperature_df, dtype=np.float64)
+    apparent = np.asarray(apparent_df, dtype=np.float64)
+    dewpoint = np.asarray(dewpoint_df, dtype=np.float64)
+    sunshine = np.asarray(sunshine_df, dtype=np.float64)
+
+    comfort_index = (
+        comfort_temperature_score(temperature) * 0.4
+        + comfort_temperature_score(apparent) * 0.2
+        + comfort_dewpoint_score(dewpoint) * 0.2
+        + comfort_sunlight_score(sunshine) * 0.2
+    )
+    return pd.Series(
+        comfort_index,
+        index=getattr(temperature_df, "index", None),
+        name="comfort_index",
+    )
+
+
+def calc_uv_index_vectorized(sun_angle, altitude, sunshine_percentage):
+    """
+    UV index from the sun angle in degrees, raised 5% per 1000 units of altitude
+    and scaled by the square root of the sunshine fraction.
+    """
+    # Ensure sunshine_percentage is within [0,1]
+    sunshine_percentage = np.clip(np.asarray(sunshine_percentage, np.float64), 0, 100)
+    sunshine_percentage = sunshine_percentage / 100
+
+    # Calculate the basic UV index
+    uv_index = (np.asarray(sun_angle, np.float64) / 90) * 12
+
+    # Adjust for altitude
+    altitude_adjustment = altitude / 1000 * 0.05
+    uv_index_adjusted = uv_index * (1 + altitude_adjustment)
+
+    # Adjust for sunshine percentage, with a sqrt transformation
+    uv_index_adjusted *= np.clip(np.sqrt(sunshine_percentage), 0, 1)
+
+    return np.maximum(uv_index_adjusted, 0)
+
+
+def calc_humidity_percentages(dew_points_F, temperatures_F, out=None):
+    """
+    Relative humidity of several temperatures against one dewpoint. The dewpoint
+    vapor pressure is computed once and the saturation vapor pressure only on rows
+    where the dewpoint is below the temperature, the others are 100.
+
+    :param temperatures_F: List of temperature arrays, each the length of dew_points_F.
+    :param out: Optional list of preallocated float64 arrays to write into.
+    :return: List of humidity percentage arrays, out if given.
+    """
+    dew_points_F = np.asarray(dew_points_F, np.float64)
+    if out is None:
+        out = [np.empty(len(dew_points_F)) for _ in temperatures_F]
+
+    # Calculate actual vapor pressure
+    dew_points_C = (dew_points_F - 32) * 5 / 9
+    vapor_pressure = 6.112 * 10 ** (7.5 * dew_points_C / (237.7 + dew_points_C))
+
+    for temperature_F, humidity in zip(temperatures_F, out):
+        temperature_F = np.asarray(temperature_F, np.float64)
+        # Dew point equal to or greater than the temperature is saturated
+        humidity.fill(100)
+        rows = ~(dew_points_F >= temperature_F)
+
+        temperature_C = (temperature_F[rows] - 32) * 5 / 9
+        saturation_vapor_pressure = 6.112 * 10 ** (
+            7.5 * temperature_C / (237.7 + temperature_C)
+        )
+        humidity[rows] = (vapor_pressure[rows] / saturation_vapor_pressure) * 100
+    return out
+
+
+def calc_humidity_percentage_vector(dew_points_F, temperatures_F):
+    return calc_humidity_percentages(dew_points_F, [temperatures_F])[0]
+
+
+# https://www.weather.gov/epz/wxcalc_windchill
+# https://www.wpc.ncep.noaa.gov/html/heatindex_equation.shtml
+def calc_apparent_temperatures(temperatures, DP, V, out=None):
+    """
+    Apparent temperature of several temperatures sharing one dewpoint and wind speed.
+
+    The dewpoint and wind terms are computed once. The heat index is evaluated only
+    on rows above 80F and the wind chill only on rows below 50F with wind, every
+    other row keeps its temperature.
+
+    :param temperatures: List of temperature arrays, each the length of DP.
+    :param out: Optional list of preallocated float64 arrays to write into.
+    :return: List of apparent temperature arrays, out if given.
+    """
+    DP = np.asarray(DP, np.float64)
+    # Replace zero values with 3 for wind speed
+    V = np.asarray(V, np.float64)
+    V = np.where(V == 0, 3, V)
+    if out is None:
+        out = [np.empty(len(DP)) for _ in temperatures]
+
+    dewpoint_term = np.exp((17.625 * DP) / (243.04 + DP))
+    wind_term = V**0.16
+    has_wind = V >= 3
+
+    for T, result in zip(temperatures, out):
+        T = np.asarray(T, np.float64)
+        np.copyto(result, T)
+
+        # Heat Index
+        heat_rows = T > 80
+        t = T[heat_rows]
+        RH = 100 * (dewpoint_term[heat_rows] / np.exp((17.625 * t) / (243.04 + t)))
+        HI = (
+            -42.379
+            + 2.04901523 * t
+            + 10.14333127 * RH
+            - 0.22475541 * t * RH
+            - 0.00683783 * t * t
+            - 0.05481717 * RH * RH
+            + 0.00122874 * t * t * RH
+            + 0.00085282 * t * RH * RH
+            - 0.00000199 * t * t * RH * RH
+        )
+
+        # Adjustments for Heat Index
+        adjustment1 = np.zeros(len(t))
+        rows = (t < 112) & (RH < 13)
+        adjustment1[rows] = ((13 - RH[rows]) / 4) * np.sqrt(
+            (17 - np.abs(t[rows] - 95.0)) / 17
+        )
+        adjustment2 = np.zeros(len(t))
+        rows = (t < 87) & (RH > 85)
+        adjustment2[rows] = ((RH[rows] - 85) / 10) * ((87 - t[rows]) / 5)
+        result[heat_rows] = HI - adjustment1 + adjustment2
+
+        # Wind Chill
+        chill_rows = (T < 50) & has_wind
+        t = T[chill_rows]
+        wind = wind_term[chill_rows]
+        result[chill_rows] = 35.74 + (0.6215 * t) - 35.75 * wind + 0.4275 * t * wind
+    return out
+
+
+def calc_aparent_temp_vector(T, DP, V):
+    return calc_apparent_temperatures([T], DP, V)[0]
+
+
+def leap_aligned_day_of_year(index):
+    """
+    Day of year from 1 to 366 where Feb 29 is always 60 and Mar 1 is always 61, so
+    every calendar date has the same key in leap and non-leap years.
+
+    :param index: DatetimeIndex.
+    :return: Integer array of keys.
+    """
+    day_of_year = index.dayofyear.to_numpy()
+    return day_of_year + (~index.is_leap_year & (index.month > 2))
+
+
+def solar_geometry(latitude, step=SOLAR_LATITUDE_STEP):
+    """
+    Solar noon elevation and daylight length for every day of the year at a latitude.
+
+    :param step: The latitude is rounded to a multiple of step degrees, and the
+        tables of each rounded latitude are computed once.
+    :return: (sun_angle, daylight_length), read-only arrays of 366 days in degrees
+        and hours, indexed by leap_aligned_day_of_year - 1. They are shared by every
+        caller, so copy them before modifying.
+    """
+    return _solar_geometry_table(int(round(latitude / step)), step)
+
+
+@functools.lru_cache(maxsize=SOLAR_TABLE_CACHE_SIZE)
+def _solar_geometry_table(latitude_index, step):
+    phi = np.radians(round(latitude_index * step, 10))
+
+    # Day of a 365-day year for each leap-aligned day, Feb 29 halfway between
+    # Feb 28 and Mar 1
+    day_of_year = np.arange(1, 367, dtype=np.float64)
+    day_of_year[59] = 59.5
+    day_of_year[60:] -= 1
+    # declination of the sun as a function of the day of the year
+    delta = np.radians(-23.45 * np.cos(np.radians(360 / 365 * (day_of_year + 10))))
+
+    # cosine of the hour angle at which the sun sets/rises, 1 when the sun never
+    # rises and -1 when it never sets
+    cos_hour_angle = np.clip(-np.tan(phi) * np.tan(delta), -1, 1)
+    omega = np.arccos(cos_hour_angle)
+    daylight_length = 2 * omega * 24 / (2 * np.pi)  # Convert radians to hours
+
+    # solar noon elevation, 0 in the polar night as the sun stays below the horizon
+    sun_angle = np.degrees(
+        np.arcsin(
+            np.clip(np.sin(phi) * np.sin(delta) + np.cos(phi) * np.cos(delta), -1, 1)
+        )
+    )
+    sun_angle[cos_hour_angle == 1] = 0
+
+    sun_angle.setflags(write=False)
+    daylight_length.setflags(write=False)
+    return sun_angle, daylight_length
+
+
+def replace_rolling_outliers(columns, window_size, std_devs):
+    """
+    Replace outliers in several columns with their centered rolling mean, as
+    Series.rolling(window_size, center=True) does it, in one pass over all columns.
+
+    The rolling sums of the values and of their squares come from cumulative sums, on
+    values shifted by the column mean to keep them precise. A value is an outlier if it
+    is more than std_devs rolling standard deviations (ddof 1) from the rolling mean.
+    Windows that run past either end or hold a NaN have no mean, so their values are
+    kept.
+
+    :param columns: Sequence of equal length 1-D arrays or Series.
+    :param window_size: The number of values in each rolling window.
+    :param std_devs: The number of standard deviations defining an outlier, one for all
+        columns or one per column.
+    :return: (cleaned, is_outlier), 2-D arrays with a row per column.
+    """
+    values = np.array([np.asarray(column, dtype=np.float64) for column in columns])
+    rows, days = values.shape
+    is_outlier = np.zeros(values.shape, dtype=bool)
+    if days < window_size:
+        return values, is_outlier
+
+    is_value = ~np.isnan(values)
+    counts = is_value.sum(axis=1, keepdims=True)
+    shift = np.where(is_value, values, 0).sum(axis=1, keepdims=True) / np.maximum(
+        counts, 1
+    )
+    shifted = np.where(is_value, values - shift, 0)
+
+    def window_sums(array):
+        cumulative = np.zeros((rows, days + 1))
+        np.cumsum(array, axis=1, out=cumulative[:, 1:])
+        return cumulative[:, window_size:] - cumulative[:, :-window_size]
+
+    sums = window_sums(shifted)
+    squares = window_sums(shifted * shifted)
+    complete = window_sums(is_value.astype(np.float64)) == window_size
+    # Windows of one repeated value have exactly that mean and no deviation, as in
+    # pandas, rather than the rounding error of the sums
+    changes = np.zeros(values.shape)
+    changes[:, 1:] = values[:, 1:] != values[:, :-1]
+    constant = window_sums(changes) - changes[:, : days - window_size + 1] == 0
+
+    # A centered window holds (window_size - 1) // 2 values after its label
+    first = window_size - 1 - (window_size - 1) // 2
+    labels = slice(first, first + days - window_size + 1)
+    rolling_mean = np.full(values.shape, np.nan)
+    rolling_std = np.full(values.shape, np.nan)
+    variance = (squares - sums * sums / window_size) / (window_size - 1)
+    rolling_mean[:, labels] = np.where(
+        complete,
+        np.where(constant, values[:, window_size - 1 :], sums / window_size + shift),
+        np.nan,
+    )
+    rolling_std[:, labels] = np.where(
+        complete,
+        np.where(constant, 0, np.sqrt(np.maximum(variance, 0))),
+        np.nan,
+    )
+
+    limit = np.reshape(np.asarray(std_devs, dtype=np.float64), (-1, 1)) * rolling_std
+    is_outlier = (values < rolling_mean - limit) | (values > rolling_mean + limit)
+    cleaned = np.where(is_outlier, rolling_mean, values)
+    return cleaned, is_outlier
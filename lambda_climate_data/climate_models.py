@@ -0,0 +1,376 @@
+import os
+import io
+import json
+import hashlib
+import argparse
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from botocore.exceptions import ClientError
+import platform
+
+if "amzn" in platform.platform():
+    from station_store import (
+        S3StationStore,
+        LocalStationStore,
+        is_missing_object_error,
+    )
+else:
+    from .station_store import (
+        S3StationStore,
+        LocalStationStore,
+        is_missing_object_error,
+    )
+
+"""
+Models used by the interpolation engine are trained offline and stored as versioned
+joblib artifacts, so requests only load them instead of fitting them. joblib and
+sklearn are imported by the functions that need them, so importing this module adds
+nothing to a cold start; loading an artifact imports the sklearn modules it uses.
+
+Build the artifacts from the repository root, for example:
+    python -m lambda_climate_data.climate_models dewpoint temperature-humidity-data.csv
+    python -m lambda_climate_data.climate_models dewpoint temperature-humidity-data.csv --bucket us-climate-maps-bucket
+    python -m lambda_climate_data.climate_models dewpoint-adjustment dewpoint-adjustment-data.csv
+    python -m lambda_climate_data.climate_models nws-gapfill geo_elev_grid_points_updated.csv
+"""
+
+DEWPOINT_MODEL_VERSION = 1
+DEWPOINT_MODEL_KEY = f"models/dewpoint-model-v{DEWPOINT_MODEL_VERSION}.joblib"
+DEWPOINT_FEATURES = ["TMax", "TMin", "TDiurinal", "Total"]
+
+# Stored next to the station identifier tables and served by StationCatalog
+DEWPOINT_ADJUSTMENT_KEY = "dewpoint-adjustment-coefficients.json"
+
+# The NWS record starts in 2019, so these columns are predicted from the NOAA
+# columns for earlier dates
+NWS_GAPFILL_MODEL_VERSION = 1
+NWS_GAPFILL_PREFIX = f"models/nws-gapfill-v{NWS_GAPFILL_MODEL_VERSION}"
+NWS_GAPFILL_FALLBACK_KEY = f"{NWS_GAPFILL_PREFIX}/fallback.joblib"
+NWS_GAPFILL_TARGETS = [
+    "DAILY_WIND_DIR_AVG",
+    "DAILY_WIND_AVG",
+    "DAILY_SUNSHINE_AVG",
+    "DAILY_WIND_MAX",
+    # "CONDITIONS",
+]
+NWS_GAPFILL_FEATURES = [
+    "DAILY_HIGH_AVG",
+    "DAILY_LOW_AVG",
+    "DAILY_PRECIP_AVG",
+    "DAILY_SNOW_AVG",
+]
+NWS_GAPFILL_CACHE_SIZE = int(os.environ.get("NWS_GAPFILL_CACHE_SIZE", 4))
+# Cached in place of an artifact for keys with none usable
+MISSING_MODEL = object()
+# Rows per neighbor set pooled into the fallback model's training data
+NWS_GAPFILL_FALLBACK_SAMPLE_ROWS = 2000
+
+
+class ModelArtifactStore:
+    """
+    Reads and writes joblib model artifacts through a station store.
+
+    :param store: S3StationStore or LocalStationStore, see station_store.py.
+    """
+
+    def __init__(self, store):
+        self.store = store
+
+    def load(self, key):
+        """Return the artifact stored under key, or None if there is none."""
+        import joblib
+
+        try:
+            with self.store.open(key) as source:
+                # joblib needs a seekable file
+                if hasattr(source, "read"):
+                    source = io.BytesIO(source.read())
+                return joblib.load(source)
+        except (FileNotFoundError, ClientError) as e:
+            if not is_missing_object_error(e):
+                raise
+            return None
+
+    def save(self, key, artifact):
+        import joblib
+
+        buffer = io.BytesIO()
+        joblib.dump(artifact, buffer, compress=3)
+        return self.save_bytes(key, buffer.getvalue())
+
+    def save_json(self, key, data):
+        return self.save_bytes(key, json.dumps(data, indent=2).encode("utf-8"))
+
+    def save_bytes(self, key, body):
+        return self.store.write(key, body)
+
+
+def is_compatible_artifact(artifact, version):
+    """Artifacts are only used with the model version and sklearn they were built for."""
+    import sklearn
+
+    return (
+        artifact is not None
+        and artifact.get("version") == version
+        and artifact.get("sklearn_version") == sklearn.__version__
+    )
+
+
+def train_dewpoint_model(df):
+    """
+    Fit the dewpoint regression on temperature-humidity-data.csv.
+
+    :param df: DataFrame with TMax, TMin, Total and DAvg columns.
+    :return: Artifact dict holding the fitted scaler and forest.
+    """
+    import sklearn
+    from sklearn.preprocessing import StandardScaler
+    from sklearn.ensemble import RandomForestRegressor
+
+    df = df.copy()
+    # Calculate TDiurinal (TMax - TMin)
+    df["TDiurinal"] = df["TMax"] - df["TMin"]
+
+    X = df[DEWPOINT_FEATURES]
+    y = df[["DAvg"]]
+
+    # Scale the features using StandardScaler
+    scaler = StandardScaler()
+    X_scaled = scaler.fit_transform(X)
+
+    rf_model = RandomForestRegressor(n_estimators=5, random_state=42)
+    rf_model.fit(X_scaled, y.values.ravel())
+
+    return {
+        "version": DEWPOINT_MODEL_VERSION,
+        "sklearn_version": sklearn.__version__,
+        "features": DEWPOINT_FEATURES,
+        "scaler": scaler,
+        "model": rf_model,
+    }
+
+
+def predict_dewpoint(artifact, Tmax, Tmin, totalPrcp):
+    Tmax = np.asarray(Tmax, dtype=np.float64)
+    Tmin = np.asarray(Tmin, dtype=np.float64)
+
+    new_data = pd.DataFrame(
+        {
+            "TMax": Tmax,
+            "TMin": Tmin,
+            "TDiurinal": Tmax - Tmin,
+            "Total": np.asarray(totalPrcp, dtype=np.float64),
+        }
+    )[artifact["features"]]
+    new_data_scaled = artifact["scaler"].transform(new_data)
+    return artifact["model"].predict(new_data_scaled)
+
+
+def fit_dewpoint_adjustment(df):
+    """
+    Fit the linear correction applied to the predicted dewpoint as a function of the
+    diurnal temperature range, using dewpoint-adjustment-data.csv.
+
+    :return: Tuple of the coefficients (a, b), where adjustment = a * DTR + b.
+    """
+    from sklearn.linear_model import LinearRegression
+
+    dtr = df["High_Temp"] - df["Low_Temp"]
+    dewpoint_adjustment = df["Actual_Dewpoint"] - df["Predicted_Dewpoint"]
+
+    model = LinearRegression().fit(dtr.to_frame("DTR"), dewpoint_adjustment)
+    return float(model.coef_[0]), float(model.intercept_)
+
+
+def build_dewpoint_adjustment(csv_path, store):
+    a, b = fit_dewpoint_adjustment(pd.read_csv(csv_path))
+    return store.save_json(DEWPOINT_ADJUSTMENT_KEY, {"a": a, "b": b})
+
+
+def nws_gapfill_model_key(nws_station_identifiers):
+    """Artifact key of the gap-fill model for a set of (provider, city code) NWS stations."""
+    neighbor_set = ",".join(
+        sorted(
+            f"{provider}_{city_code}" for provider, city_code in nws_station_identifiers
+        )
+    )
+    digest = hashlib.sha1(neighbor_set.encode("utf-8")).hexdigest()
+    return f"{NWS_GAPFILL_PREFIX}/{digest}.joblib"
+
+
+def train_nws_gapfill_model(combined, compact=False):
+    """
+    Fit the model predicting the NWS columns from the NOAA columns.
+
+    :param combined: Daily DataFrame with NWS_GAPFILL_FEATURES and NWS_GAPFILL_TARGETS,
+        only rows where every target is known are used.
+    :param compact: Fit a small, fast forest for use as a fallback.
+    :return: Artifact dict holding the fitted forest.
+    """
+    import sklearn
+    from sklearn.ensemble import RandomForestRegressor
+
+    train_df = combined.dropna(subset=NWS_GAPFILL_TARGETS)
+
+    if compact:
+        model = RandomForestRegressor(
+            n_estimators=20,
+            max_depth=12,
+            min_samples_leaf=2,
+            random_state=0,
+        )
+    else:
+        model = RandomForestRegressor(random_state=0)
+    model.fit(train_df[NWS_GAPFILL_FEATURES], train_df[NWS_GAPFILL_TARGETS])
+
+    return {
+        "version": NWS_GAPFILL_MODEL_VERSION,
+        "sklearn_version": sklearn.__version__,
+        "features": NWS_GAPFILL_FEATURES,
+        "targets": NWS_GAPFILL_TARGETS,
+        "model": model,
+    }
+
+
+class NwsGapfillModelStore:
+    """
+    Lazily loads gap-fill models keyed by NWS neighbor set and keeps the most
+    recently used ones in memory. Falls back to a compact model shared by every
+    neighbor set when no model was built for the requested one.
+
+    Keys with no usable artifact, missing or built for another model or sklearn
+    version, are cached as misses, and a neighbor set without its own model caches
+    the fallback under its key, so neither is looked up again.
+    """
+
+    def __init__(self, artifact_store, max_models=NWS_GAPFILL_CACHE_SIZE):
+        self.artifact_store = artifact_store
+        self.max_models = max_models
+        self._models = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, nws_station_identifiers):
+        """
+        Return the artifact for the neighbor set, or the fallback artifact.
+        Returns None if neither has been built.
+        """
+        key = nws_gapfill_model_key(nws_station_identifiers)
+        artifact = self._get_cached(key)
+        if artifact is None:
+            artifact = self._load(key)
+            if artifact is MISSING_MODEL:
+                artifact = self._get_cached(NWS_GAPFILL_FALLBACK_KEY)
+                if artifact is None:
+                    artifact = self._load(NWS_GAPFILL_FALLBACK_KEY)
+                self._cache(key, artifact)
+        return None if artifact is MISSING_MODEL else artifact
+
+    def _get_cached(self, key):
+        """Return the cached artifact or MISSING_MODEL for key, None if not cached."""
+        with self._lock:
+            artifact = self._models.get(key)
+            if artifact is not None:
+                self._models.move_to_end(key)
+            return artifact
+
+    def _load(self, key):
+        """Load and cache the artifact for key, MISSING_MODEL if there is none usable."""
+        artifact = self.artifact_store.load(key)
+        if not is_compatible_artifact(artifact, NWS_GAPFILL_MODEL_VERSION):
+            artifact = MISSING_MODEL
+        self._cache(key, artifact)
+        return artifact
+
+    def _cache(self, key, artifact):
+        with self._lock:
+            self._models[key] = artifact
+            self._models.move_to_end(key)
+            while len(self._models) > self.max_models:
+                self._models.popitem(last=False)
+
+
+def build_nws_gapfill_models(points_csv, store):
+    """
+    Train and store a gap-fill model for the NWS neighbor set of every point in
+    points_csv (latitude, longitude, elevation columns), plus the compact fallback
+    model trained on rows pooled from all of them.
+    """
+    # Only needed offline, and importing it at module level would be circular
+    from lambda_climate_data.climate_point_interpolation import (
+        interpolate_station_data,
+    )
+
+    points = pd.read_csv(points_csv)
+    built_keys = set()
+    pooled_rows = []
+    for latitude, longitude, elevation in zip(
+        points["latitude"], points["longitude"], points["elevation"]
+    ):
+        combined, nws_station_identifiers = interpolate_station_data(
+            latitude, longitude, elevation
+        )
+        key = nws_gapfill_model_key(nws_station_identifiers)
+        if key in built_keys:
+            continue
+
+        print(
+            "Saved NWS gap-fill model to",
+            store.save(key, train_nws_gapfill_model(combined)),
+        )
+        built_keys.add(key)
+
+        known_rows = combined.dropna(subset=NWS_GAPFILL_TARGETS)
+        pooled_rows.append(
+            known_rows.sample(
+                n=min(len(known_rows), NWS_GAPFILL_FALLBACK_SAMPLE_ROWS),
+                random_state=0,
+            )[NWS_GAPFILL_FEATURES + NWS_GAPFILL_TARGETS]
+        )
+
+    fallback = train_nws_gapfill_model(
+        pd.concat(pooled_rows, ignore_index=True), compact=True
+    )
+    return store.save(NWS_GAPFILL_FALLBACK_KEY, fallback)
+
+
+def build_dewpoint_model(csv_path, store):
+    artifact = train_dewpoint_model(pd.read_csv(csv_path))
+    return store.save(DEWPOINT_MODEL_KEY, artifact)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build offline model artifacts")
+    parser.add_argument(
+        "model", choices=["dewpoint", "dewpoint-adjustment", "nws-gapfill"]
+    )
+    parser.add_argument(
+        "training_csv",
+        help="Training data, or for nws-gapfill the points to build models for",
+    )
+    parser.add_argument("--bucket", help="Upload to this S3 bucket")
+    parser.add_argument(
+        "--output-dir",
+        default=os.path.dirname(os.path.dirname(os.path.realpath(__file__))),
+        help="Local directory to write to when no bucket is given",
+    )
+    args = parser.parse_args()
+
+    store = ModelArtifactStore(
+        S3StationStore(args.bucket)
+        if args.bucket
+        else LocalStationStore(args.output_dir)
+    )
+    if args.model == "dewpoint":
+        print("Saved dewpoint model to", build_dewpoint_model(args.training_csv, store))
+    elif args.model == "dewpoint-adjustment":
+        print(
+            "Saved dewpoint adjustment to",
+            build_dewpoint_adjustment(args.training_csv, store),
+        )
+    elif args.model == "nws-gapfill":
+        print(
+            "Saved NWS gap-fill fallback model to",
+            build_nws_gapfill_models(args.training_csv, store),
+        )
@@ -1,29 +1,116 @@
 import os
-import glob
-import shutil
 import sys
-import joblib
 import numpy as np
 import pandas as pd
-from sklearn.discriminant_analysis import StandardScaler
-from sklearn.linear_model import Lasso, LinearRegression
-from sklearn.pipeline import Pipeline
-from sklearn.preprocessing import PolynomialFeatures
 import time
-from sklearn.ensemble import RandomForestRegressor
-from sklearn.model_selection import GridSearchCV, train_test_split
-from sklearn.metrics import mean_squared_error, mean_absolute_error, r2_score
-import boto3
+from botocore.exceptions import ClientError
 import platform
-from concurrent.futures import ThreadPoolExecutor
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+
+try:
+    import resource
+except ImportError:
+    resource = None
 
 """
 USE RELATIVE IMPORTS FOR LOCAL DEVELOPMENT ONLY
 """
 if "amzn" in platform.platform():
     from climate_point_interpolation_helpers import *
+    from climate_kernels import (
+        calc_comfort_index_vector,
+        calc_apparent_temperatures,
+        calc_humidity_percentages,
+        calc_uv_index_vectorized,
+        leap_aligned_day_of_year,
+        replace_rolling_outliers,
+        solar_geometry,
+    )
+    from climate_rollups import PeriodRollups, NoDataForYearError
+    from station_catalog import StationCatalog
+    from station_store import (
+        S3StationStore,
+        LocalStationStore,
+        is_missing_object_error,
+    )
+    from station_archive import (
+        NOAA_STATION_DIRECTORY,
+        NWS_STATION_DIRECTORY,
+        STATION_FILE_COLUMNS,
+        archive_available,
+        archive_directory,
+        archive_file_name,
+        read_station_archive,
+        read_station_csv,
+    )
+    from station_pool import (
+        process_pool_available,
+        station_process_pool,
+        process_station_to_shared_memory,
+        read_station_from_shared_memory,
+        free_shared_memory_blocks,
+    )
+    from climate_models import (
+        ModelArtifactStore,
+        DEWPOINT_MODEL_KEY,
+        DEWPOINT_MODEL_VERSION,
+        is_compatible_artifact,
+        train_dewpoint_model,
+        predict_dewpoint,
+        fit_dewpoint_adjustment,
+        NwsGapfillModelStore,
+        train_nws_gapfill_model,
+    )
+    from tracing import span, traced, current_span, bind_current_span
 else:
     from .climate_point_interpolation_helpers import *
+    from .climate_kernels import (
+        calc_comfort_index_vector,
+        calc_apparent_temperatures,
+        calc_humidity_percentages,
+        calc_uv_index_vectorized,
+        leap_aligned_day_of_year,
+        replace_rolling_outliers,
+        solar_geometry,
+    )
+    from .climate_rollups import PeriodRollups, NoDataForYearError
+    from .station_catalog import StationCatalog
+    from .station_store import (
+        S3StationStore,
+        LocalStationStore,
+        is_missing_object_error,
+    )
+    from .station_archive import (
+        NOAA_STATION_DIRECTORY,
+        NWS_STATION_DIRECTORY,
+        STATION_FILE_COLUMNS,
+        archive_available,
+        archive_directory,
+        archive_file_name,
+        read_station_archive,
+        read_station_csv,
+    )
+    from .station_pool import (
+        process_pool_available,
+        station_process_pool,
+        process_station_to_shared_memory,
+        read_station_from_shared_memory,
+        free_shared_memory_blocks,
+    )
+    from .climate_models import (
+        ModelArtifactStore,
+        DEWPOINT_MODEL_KEY,
+        DEWPOINT_MODEL_VERSION,
+        is_compatible_artifact,
+        train_dewpoint_model,
+        predict_dewpoint,
+        fit_dewpoint_adjustment,
+        NwsGapfillModelStore,
+        train_nws_gapfill_model,
+    )
+    from .tracing import span, traced, current_span, bind_current_span
 
 
 """
@@ -51,421 +138,263 @@ ELEV_TEMPERATURE_CHANGE = 4.5
 
 S3_BUCKET_NAME = "us-climate-maps-bucket"
 
-
-def optimized_climate_data(target_lat, target_lon, target_elevation):
-    if is_running_on_aws():
-        start_time = time.time()
-        # Use the built-in '/tmp' directory in AWS Lambda
-        temp_local_path = "/tmp/nws-station-identifiers.csv"
-        get_csv_from_s3(S3_BUCKET_NAME, "nws-station-identifiers.csv", temp_local_path)
-        df_stations_NWS_names = pd.read_csv(temp_local_path)
-        os.remove(temp_local_path)
-
-        temp_local_path = "/tmp/noaa-station-identifiers.csv"
-        get_csv_from_s3(S3_BUCKET_NAME, "noaa-station-identifiers.csv", temp_local_path)
-        df_stations_NOAA_names = pd.read_csv(temp_local_path)
-        os.remove(temp_local_path)
-
-        print("FINISHED DOWNLOADING STATIONS NAMES: ", time.time() - start_time)
-
-    else:
-        df_stations_NWS_names = pd.read_csv(
-            os.path.join(
-                parent_directory,
-                "nws-station-identifiers.csv",
-            )
-        )
-        df_stations_NOAA_names = pd.read_csv(
-            os.path.join(
-                parent_directory,
-                "noaa-station-identifiers.csv",
-            )
-        )
-
-    start_time = time.time()
-    # Get a list of closest points to coordinate
-    closest_points_NWS = nearest_coordinates_to_point_NWS(
-        target_lat,
-        target_lon,
-        df_stations_NWS_names,
-        num_results=NUM_NWS_SAMPLE_STATIONS,
-    )
-    closest_points_NOAA = nearest_coordinates_to_point_NOAA(
-        target_lat,
-        target_lon,
-        df_stations_NOAA_names,
-        num_results=NUM_NOAA_SAMPLE_STATIONS,
-    )
-
-    # Compute inverse weighted average so closest distance has most weight
-    # The higher the weight power, the more the weights are skewed towards the closest point
-
-    weights_NWS = inverse_dist_weights(closest_points_NWS, weight_power=0.5)
-    weights_NOAA = inverse_dist_weights(closest_points_NOAA, weight_power=1)
-
-    # Get the historical weather for each location
-    nws_station_identifiers = [(entry[2], entry[3]) for entry in closest_points_NWS]
-    noaa_station_files = list(
-        station[2]
-        + "_"
-        + str(station[0])
-        + "_"
-        + str(station[1])
-        + "_"
-        + str(round(station[3]))
-        + "_"
-        + station[4]
-        + ".csv"
-        for station in closest_points_NOAA
-    )
-    elev_values = [entry[3] for entry in closest_points_NOAA]
-    average_weighted_elev = sum(
-        elevation * weight for elevation, weight in zip(elev_values, weights_NOAA)
+# Response formats of optimized_climate_data, version 1 until clients move to 2
+FORMAT_VERSIONS = (1, 2)
+DEFAULT_FORMAT_VERSION = 1
+# Daily climate frames kept for climate_data_year, each a few MB
+DAILY_FRAME_CACHE_SIZE = int(os.environ.get("DAILY_FRAME_CACHE_SIZE", 8))
+# Most points accepted by one optimized_climate_data_batch request
+MAX_BATCH_POINTS = int(os.environ.get("MAX_BATCH_POINTS", 10))
+
+# Read station files from the columnar archive, see station_archive.py. Only enable
+# once the archive has been uploaded, every station without one costs a failed GET.
+USE_STATION_ARCHIVE = (
+    os.environ.get("USE_STATION_ARCHIVE", "0") == "1" and archive_available()
+)
+# (archive directory, file name) of the archive files found missing in this container
+MISSING_STATION_ARCHIVES = set()
+
+# How the station files are read and transformed, see map_stations. "thread" overlaps
+# the downloads and is the default, "serial" is for profiling. "process" runs the
+# GIL-bound parsing on several cores, and only pays off on a long-running server with
+# spare cores whose requests are CSV-parsing bound, see station_pool. It needs
+# /dev/shm, so it is not available on AWS Lambda.
+STATION_EXECUTION_MODES = ("thread", "process", "serial")
+STATION_EXECUTION_MODE = os.environ.get("STATION_EXECUTION_MODE", "thread")
+if STATION_EXECUTION_MODE not in STATION_EXECUTION_MODES:
+    raise ValueError(f"Unknown STATION_EXECUTION_MODE {STATION_EXECUTION_MODE}")
+if STATION_EXECUTION_MODE == "process" and not process_pool_available():
+    print("Station process pool needs /dev/shm, processing stations in threads")
+    STATION_EXECUTION_MODE = "thread"
+
+# Every read goes through one store, so on AWS all threads share one S3 client.
+# Locally the station files are read from LOCAL_STATION_DIRECTORY, by default
+# STATIONS in the working directory.
+if "amzn" in platform.platform():
+    STATION_STORE = S3StationStore(S3_BUCKET_NAME, max_pool_connections=MAX_THREADS)
+else:
+    STATION_STORE = LocalStationStore(
+        parent_directory, os.environ.get("LOCAL_STATION_DIRECTORY")
     )
-    elev_diff = target_elevation - average_weighted_elev
-
-    print("TEST NWS STATIONS: ", nws_station_identifiers)
-    print("TEST NWS WEIGHTS: ", weights_NWS)
-    print("TEST NOAA FILES: ", noaa_station_files)
-    print("TEST NOAA WEIGHTS: ", weights_NOAA)
-    print("ELEV DIFF: ", elev_diff)
-
-    print("FINISHED GETTING WEIGHTS: ", time.time() - start_time)
 
+# Loaded lazily on first use, then reused by every request served by this container
+STATION_CATALOG = StationCatalog(STATION_STORE)
+MODEL_STORE = ModelArtifactStore(STATION_STORE)
+# Models kept resident across warm invocations, see load_dewpoint_model
+RESIDENT_MODELS = {}
+NWS_GAPFILL_MODELS = NwsGapfillModelStore(MODEL_STORE)
+
+
+def optimized_climate_data(
+    target_lat,
+    target_lon,
+    target_elevation,
+    format_version=DEFAULT_FORMAT_VERSION,
+    station_frames=None,
+    include_historical=True,
+    selection=None,
+):
     """
-    zip function to unpack the tuple thats returned by process_noaa_station_data. 
-    This results in two lists: all_data_frames and cols_to_aggregate_lists. 
-    The former is a list of dataframes and the latter is a list of lists containing column names.
-    The data is flattened and deduplicated the cols_to_aggregate_lists to get the unique cols_to_aggregate list.
-    This is then passed to the aggregate_data function.
+    Interpolate the climate of a point from the surrounding stations.
+
+    :param format_version: Shape of the monthly and daily records in historical.
+        1 is a list of dicts, one per date. 2 is columnar, a shared "dates" vector
+        and one array per variable under "columns", see PeriodRollups.columnar.
+    :param station_frames: Raw station frames already loaded by load_stations, see
+        optimized_climate_data_batch. Stations are read from the store if None.
+    :param include_historical: If False, only the averages are returned, with the
+        list of years under "years" in place of historical. Each year can then be
+        fetched with climate_data_year, which reuses the cached rollups.
+    :param selection: The point's select_stations result the station_frames were
+        loaded for, selected again if None.
+    :return: (climate_data, location_data)
     """
-    # Process each CSV and combine the dataframes into one
-
-    start_time = time.time()
-
-    # Process NOAA station data in parallel
-    with ThreadPoolExecutor(max_workers=MAX_THREADS) as executor:
-        noaa_results = executor.map(
-            process_noaa_station_data,
-            noaa_station_files,
-            weights_NOAA,
-            [elev_diff] * len(noaa_station_files),
+    if format_version not in FORMAT_VERSIONS:
+        raise ValueError(f"Unsupported format_version {format_version}")
+
+    with span(
+        "optimized_climate_data",
+        latitude=target_lat,
+        longitude=target_lon,
+        elevation=target_elevation,
+    ):
+        rollups = daily_climate_rollups(
+            target_lat, target_lon, target_elevation, station_frames, selection
         )
 
-    noaa_all_data_frames, noaa_cols_to_aggregate_lists = zip(*noaa_results)
-
-    """
-    # This is the original code that was used to process the NOAA dataframes not threaded
-    noaa_all_data_frames, noaa_cols_to_aggregate_lists = zip(
-        *[
-            process_noaa_station_data(station, weight, elev_diff)
-            for station, weight in zip(noaa_station_files, weights_NOAA)
-        ]
-    )
-    """
-    noaa_all_data = pd.concat(noaa_all_data_frames, ignore_index=True)
-    noaa_cols_to_aggregate = list(
-        set([col for sublist in noaa_cols_to_aggregate_lists for col in sublist])
-    )
+        # Converting dataframe into useful dictionary for json return
+        #########################################################################
+
+        with span("climate_summary", rows=len(rollups.df)):
+            climate_data, location_data = climate_summary(rollups, target_elevation)
+        if include_historical:
+            with span("historical"):
+                climate_data["historical"] = {
+                    year: historical_year(rollups, year, format_version)
+                    for year in rollups.years
+                }
+        else:
+            climate_data["years"] = list(rollups.years)
+        current_span().set(peak_rss_mb=peak_rss_mb())
 
-    # Compute the weighted average across all stations for each date
-    noaa_final_data = noaa_all_data.groupby("DATE").sum().reset_index()
-    noaa_final_data = aggregate_data(noaa_all_data, noaa_cols_to_aggregate)
-    noaa_final_data.set_index("DATE", inplace=True)
+    return climate_data, location_data
 
-    print("FINISHED NOAA AGGREGATE FILES: ", time.time() - start_time)
 
-    start_time = time.time()
+def climate_data_year(
+    target_lat,
+    target_lon,
+    target_elevation,
+    year,
+    format_version=DEFAULT_FORMAT_VERSION,
+):
+    """
+    The historical annual, monthly and daily data of one year for a point, as in
+    optimized_climate_data's historical[year]. Served from the cached rollups when
+    the point was requested recently.
 
-    # Outlier Detection
-    ########################################################################
-    WINDOW_SIZE = 14  # for example, 15 days before and 15 days after
-    STD_DEV = 3
+    :raises NoDataForYearError: If there is no data for the year.
+    """
+    if format_version not in FORMAT_VERSIONS:
+        raise ValueError(f"Unsupported format_version {format_version}")
 
-    noaa_final_data = replace_outliers_with_rolling_mean(
-        noaa_final_data, "DAILY_HIGH_AVG", WINDOW_SIZE, STD_DEV
-    )
-    noaa_final_data = replace_outliers_with_rolling_mean(
-        noaa_final_data, "DAILY_LOW_AVG", WINDOW_SIZE, STD_DEV
-    )
+    rollups = daily_climate_rollups(target_lat, target_lon, target_elevation)
+    return historical_year(rollups, year, format_version)
 
-    print("FINISHED NOAA OUTLIER DETECTION: ", time.time() - start_time)
 
-    noaa_final_data["DAILY_MEAN_AVG"] = (
-        noaa_final_data["DAILY_HIGH_AVG"] + noaa_final_data["DAILY_LOW_AVG"]
-    ) / 2
+class DailyFrameCache:
+    """
+    The PeriodRollups of the most recently used daily climate frames, keyed by the
+    point they were interpolated for, so a point's summary and its per-year details
+    share one interpolation.
+    """
 
-    start_time = time.time()
+    def __init__(self, max_frames=DAILY_FRAME_CACHE_SIZE):
+        self.max_frames = max_frames
+        self._frames = OrderedDict()
+        self._lock = threading.Lock()
 
-    noaa_final_data["REGR_DEWPOINT_AVG"] = dewpoint_regr_calc(
-        noaa_final_data["DAILY_HIGH_AVG"],
-        noaa_final_data["DAILY_LOW_AVG"],
-        noaa_final_data["DAILY_PRECIP_AVG"],
-    )
+    def get(self, key):
+        with self._lock:
+            df = self._frames.get(key)
+            if df is not None:
+                self._frames.move_to_end(key)
+            return df
 
-    # Calculate the Diurnal Temperature Range (DTR)
-    noaa_final_data["DTR"] = (
-        noaa_final_data["DAILY_HIGH_AVG"] - noaa_final_data["DAILY_LOW_AVG"]
-    )
+    def put(self, key, df):
+        with self._lock:
+            self._frames[key] = df
+            self._frames.move_to_end(key)
+            while len(self._frames) > self.max_frames:
+                self._frames.popitem(last=False)
 
-    # Apply the correction factor for dewpoint using known data
-    a, b = fit_dewpoint_adjustment_model()
-    noaa_final_data["REGR_DEWPOINT_AVG"] = noaa_final_data.apply(
-        lambda row: adjust_dewpoint(row, a, b, "DTR", "REGR_DEWPOINT_AVG"), axis=1
-    )
 
-    noaa_final_data["DAILY_DEWPOINT_AVG"] = noaa_final_data["REGR_DEWPOINT_AVG"]
-    noaa_final_data = replace_outliers_with_rolling_mean(
-        noaa_final_data, "DAILY_DEWPOINT_AVG", 14, 2
-    )
+# Daily frames of the most recently requested points, see daily_climate_rollups
+DAILY_FRAMES = DailyFrameCache()
 
-    print("FINISHED DEWPOINT REGR: ", time.time() - start_time)
-    noaa_final_data["NUM_HIGH_DEWPOINT_DAYS"] = (
-        noaa_final_data["DAILY_DEWPOINT_AVG"] > 70
-    ).astype(int)
-
-    start_time = time.time()
-    noaa_final_data["DAILY_HUMIDITY_AVG"] = calc_humidity_percentage_vector(
-        noaa_final_data["DAILY_DEWPOINT_AVG"], noaa_final_data["DAILY_MEAN_AVG"]
-    ).clip(0, 100)
-    noaa_final_data["DAILY_MORNING_HUMIDITY_AVG"] = calc_humidity_percentage_vector(
-        noaa_final_data["DAILY_DEWPOINT_AVG"], noaa_final_data["DAILY_LOW_AVG"]
-    ).clip(0, 100)
 
+def daily_climate_rollups(
+    target_lat, target_lon, target_elevation, station_frames=None, selection=None
+):
     """
-    # Set any 0 values to 100 using numpy.where
-    noaa_final_data["DAILY_MORNING_HUMIDITY_AVG"] = np.where(
-        noaa_final_data["DAILY_MORNING_HUMIDITY_AVG"] == 0,
-        100,
-        noaa_final_data["DAILY_MORNING_HUMIDITY_AVG"],
-    ).clip(0, 100)
+    Return the PeriodRollups of a point's interpolated daily frame, from DAILY_FRAMES
+    if it was built recently. They are shared, so callers must not modify them.
     """
-    noaa_final_data["DAILY_AFTERNOON_HUMIDITY_AVG"] = calc_humidity_percentage_vector(
-        noaa_final_data["DAILY_DEWPOINT_AVG"], noaa_final_data["DAILY_HIGH_AVG"]
-    ).clip(0, 100)
-
-    noaa_final_data["DAILY_MORNING_FROST_CHANCE"] = 100 * (
-        (noaa_final_data["DAILY_MORNING_HUMIDITY_AVG"] > 90)
-        & (noaa_final_data["DAILY_LOW_AVG"] <= 32)
-    ).astype(int)
-
-    noaa_final_data["HDD"] = np.maximum(65 - noaa_final_data["DAILY_MEAN_AVG"], 0)
-    noaa_final_data["CDD"] = np.maximum(noaa_final_data["DAILY_MEAN_AVG"] - 65, 0)
-    noaa_final_data["DAILY_GROWING_CHANCE"] = calc_growing_chance_vectorized(
-        noaa_final_data, window_size=30
-    )
-
-    noaa_final_data = calculate_statistic_by_date(
-        noaa_final_data, "DAILY_HIGH_AVG", "max", "DAILY_RECORD_HIGH"
-    )
-    noaa_final_data = calculate_statistic_by_date(
-        noaa_final_data, "DAILY_LOW_AVG", "min", "DAILY_RECORD_LOW"
-    )
-    noaa_final_data = calculate_statistic_by_date(
-        noaa_final_data, "DAILY_HIGH_AVG", "percentile", "DAILY_EXPECTED_MAX"
-    )
-    noaa_final_data = calculate_statistic_by_date(
-        noaa_final_data, "DAILY_LOW_AVG", "percentile", "DAILY_EXPECTED_MIN"
-    )
-    noaa_final_data["DATE"] = noaa_final_data.index
-    print("FINISHED NOAA CALCULATIONS: ", time.time() - start_time)
+    key = (target_lat, target_lon, target_elevation)
+    rollups = DAILY_FRAMES.get(key)
+    current_span().set(daily_frame_cached=rollups is not None)
+    if rollups is None:
+        df = build_daily_climate_frame(
+            target_lat, target_lon, target_elevation, station_frames, selection
+        )
+        with span("period_rollups"):
+            rollups = PeriodRollups(df)
+        DAILY_FRAMES.put(key, rollups)
+    return rollups
 
-    start_time = time.time()
-    # Process each CSV and combine the dataframes into one
 
-    # Process NWS station data in parallel
-    with ThreadPoolExecutor(max_workers=MAX_THREADS) as executor:
-        nws_results = executor.map(
-            process_nws_station_data,
-            [station[0] for station in nws_station_identifiers],
-            [station[1] for station in nws_station_identifiers],
-            weights_NWS,
-            [elev_diff] * len(nws_station_identifiers),
-        )
-    nws_all_data_frames, nws_cols_to_aggregate_lists = zip(*nws_results)
+def build_daily_climate_frame(
+    target_lat, target_lon, target_elevation, station_frames=None, selection=None
+):
+    """
+    Interpolate the stations and derive every daily metric for a point.
 
-    nws_all_data = pd.concat(nws_all_data_frames, ignore_index=True)
-    nws_cols_to_aggregate = list(
-        set([col for sublist in nws_cols_to_aggregate_lists for col in sublist])
+    :return: DataFrame indexed by DATE with one numeric column per metric, named
+        without the DAILY_ prefix.
+    """
+    combined, nws_station_identifiers = interpolate_station_data(
+        target_lat, target_lon, target_elevation, station_frames, selection
     )
 
-    # Compute the weighted average across all stations for each date
-    nws_final_data = nws_all_data.groupby("DATE").sum().reset_index()
-    nws_final_data = aggregate_data(nws_all_data, nws_cols_to_aggregate)
-    nws_final_data.set_index("DATE", inplace=True)
-    print("FINISHED NWS AGGREGATE FILES: ", time.time() - start_time)
-
     #####################################################################
     # Regression
 
-    start_time = time.time()
-    noaa_final_data = noaa_final_data.drop(columns="DATE").reset_index()
-    nws_final_data = nws_final_data.reset_index()
-
-    noaa_final_data["DATE"] = pd.to_datetime(noaa_final_data["DATE"])
-    nws_final_data["DATE"] = pd.to_datetime(nws_final_data["DATE"])
-
-    # Merge the two dataframes on the date column
-    combined = pd.merge(noaa_final_data, nws_final_data, on="DATE", how="left")
-    combined["DATE"] = pd.to_datetime(combined["DATE"])
-
-    # predict these columns
-    predict_columns = [
-        "DAILY_WIND_DIR_AVG",
-        "DAILY_WIND_AVG",
-        "DAILY_SUNSHINE_AVG",
-        "DAILY_WIND_MAX",
-        # "CONDITIONS",
-    ]
-
-    # Columns used to make predictions
-    feature_columns = [
-        "DAILY_HIGH_AVG",
-        "DAILY_LOW_AVG",
-        "DAILY_PRECIP_AVG",
-        "DAILY_SNOW_AVG",
-    ]
-
-    # Dataframe for dates where nws data is available
-    train_df = combined.dropna(subset=predict_columns)
-
-    # Split the training data
-    X_train = train_df[feature_columns]
-    y_train = train_df[predict_columns]
-
-    # Initialize and train the model
-    model = RandomForestRegressor(random_state=0)
-    model.fit(X_train, y_train)
-
-    # Identify the rows where NWS columns are NaN
-
-    # Bounding box for Hawaii
-    sw_corner = (15, -170)
-    ne_corner = (30, -130)
+    with span("nws_gapfill"):
+        fill_missing_nws_data(
+            combined, nws_station_identifiers, nws_date_limit(target_lat, target_lon)
+        )
 
-    if (
-        target_lat >= sw_corner[0]
-        and target_lat <= ne_corner[0]
-        and target_lon >= sw_corner[1]
-        and target_lon <= ne_corner[1]
-    ):
-        # Hawaii-specific date, since the NWS data is not available for Hawaii from 2019-04-01 to 2021-02-01
-        date_limit = pd.Timestamp("2021-02-01")
-    else:
-        # April 1st, 2019 is the start of the nws dataset
-        date_limit = pd.Timestamp("2019-04-01")
+    with span("derived_metrics"):
+        combined = combined.set_index("DATE")
+
+        sun_angle, daylight_length = solar_geometry(target_lat)
+        solar_days = leap_aligned_day_of_year(combined.index) - 1
+        combined["SUN_ANGLE"] = sun_angle[solar_days]
+        combined["DAYLIGHT_LENGTH"] = daylight_length[solar_days]
+
+        combined["SUNNY_DAYS"] = (combined["DAILY_SUNSHINE_AVG"] > 70).astype(int)
+        combined["PARTLY_CLOUDY_DAYS"] = (
+            (combined["DAILY_SUNSHINE_AVG"] > 30)
+            & (combined["DAILY_SUNSHINE_AVG"] <= 70)
+        ).astype(int)
+        combined["CLOUDY_DAYS"] = (combined["DAILY_SUNSHINE_AVG"] <= 30).astype(int)
+        combined["UV_INDEX"] = calc_uv_index_vectorized(
+            combined["SUN_ANGLE"], target_elevation, combined["DAILY_SUNSHINE_AVG"]
+        )
+        # All apparent temperatures share the dewpoint and wind terms, so they are
+        # computed together
+        apparent_columns = [
+            ("APPARENT_HIGH_AVG", "DAILY_HIGH_AVG"),
+            ("APPARENT_LOW_AVG", "DAILY_LOW_AVG"),
+            ("DAILY_APPARENT_EXPECTED_MAX", "DAILY_EXPECTED_MAX"),
+            ("DAILY_APPARENT_EXPECTED_MIN", "DAILY_EXPECTED_MIN"),
+            ("APPARENT_RECORD_HIGH", "DAILY_RECORD_HIGH"),
+            ("APPARENT_RECORD_LOW", "DAILY_RECORD_LOW"),
+        ]
+        apparent_temperatures = calc_apparent_temperatures(
+            [combined[column].to_numpy() for _, column in apparent_columns],
+            combined["DAILY_DEWPOINT_AVG"].to_numpy(),
+            combined["DAILY_WIND_AVG"].to_numpy(),
+        )
+        for (name, _), values in zip(apparent_columns[:2], apparent_temperatures[:2]):
+            combined[name] = values
+        combined["APPARENT_MEAN_AVG"] = (
+            combined["APPARENT_HIGH_AVG"] + combined["APPARENT_LOW_AVG"]
+        ) / 2
+        for (name, _), values in zip(apparent_columns[2:], apparent_temperatures[2:]):
+            combined[name] = values
+
+        combined["DAILY_COMFORT_INDEX"] = calc_comfort_index_vector(
+            combined["DAILY_MEAN_AVG"],
+            combined["APPARENT_MEAN_AVG"],
+            combined["DAILY_DEWPOINT_AVG"],
+            combined["DAILY_SUNSHINE_AVG"],
+        )
+        combined["SUNSHINE_HOURS"] = combined["DAYLIGHT_LENGTH"] * (
+            combined["DAILY_SUNSHINE_AVG"] / 100
+        )
 
-    print("date_limit: ", date_limit)
-    missing_data = combined[
-        (combined["DAILY_SUNSHINE_AVG"].isna()) & (combined["DATE"] < date_limit)
-    ]
+    df = combined.select_dtypes(include=[np.number])
+    df.columns = df.columns.str.replace("DAILY_", "")
+    return df
 
-    # Predict values where the data is missing
-    X_missing = missing_data[feature_columns]
-    predictions = model.predict(X_missing)
 
-    # TODO there is warning being raised somewhere here
+def climate_summary(rollups, target_elevation):
     """
-    RuntimeWarning: invalid value encountered in sqrt
-    result = getattr(ufunc, method)(*inputs, **kwargs)
+    Return the annual, monthly and day of year averages of a daily climate frame's
+    PeriodRollups as (climate_data, location_data).
     """
-
-    # This assumes 'DATE' or any other unique identifier is the index in 'combined' and 'missing_data' DataFrames
-    index_for_update = missing_data.index
-
-    for i, column in enumerate(predict_columns):
-        combined.loc[index_for_update, column] = predictions[:, i]
-
-    # Update the combined dataframe
-    combined.update(missing_data)
-
-    combined["DATE"] = pd.to_datetime(combined["DATE"])
-    combined.set_index("DATE", inplace=True)
-    combined["DAY_OF_YEAR"] = combined.index.dayofyear
-    combined["DATE"] = combined.index
-
-    sun_data = calc_sun_angle_and_daylight_length(target_lat)
-    sun_df = pd.DataFrame(
-        sun_data, columns=["DAY_OF_YEAR", "SUN_ANGLE", "DAYLIGHT_LENGTH"]
-    )
-    combined = combined.merge(sun_df, on="DAY_OF_YEAR", how="left")
-    combined.drop(columns=["DAY_OF_YEAR"], inplace=True)
-
-    combined["SUNNY_DAYS"] = (combined["DAILY_SUNSHINE_AVG"] > 70).astype(int)
-    combined["PARTLY_CLOUDY_DAYS"] = (
-        (combined["DAILY_SUNSHINE_AVG"] > 30) & (combined["DAILY_SUNSHINE_AVG"] <= 70)
-    ).astype(int)
-    combined["CLOUDY_DAYS"] = (combined["DAILY_SUNSHINE_AVG"] <= 30).astype(int)
-    combined["UV_INDEX"] = calc_uv_index_vectorized(
-        combined["SUN_ANGLE"], target_elevation, combined["DAILY_SUNSHINE_AVG"]
-    )
-    combined["APPARENT_HIGH_AVG"] = calc_aparent_temp_vector(
-        combined["DAILY_HIGH_AVG"],
-        combined["DAILY_DEWPOINT_AVG"],
-        combined["DAILY_WIND_AVG"],
-    )
-    combined["APPARENT_LOW_AVG"] = calc_aparent_temp_vector(
-        combined["DAILY_LOW_AVG"],
-        combined["DAILY_DEWPOINT_AVG"],
-        combined["DAILY_WIND_AVG"],
-    )
-    combined["APPARENT_MEAN_AVG"] = (
-        combined["APPARENT_HIGH_AVG"] + combined["APPARENT_LOW_AVG"]
-    ) / 2
-
-    combined["DAILY_APPARENT_EXPECTED_MAX"] = calc_aparent_temp_vector(
-        combined["DAILY_EXPECTED_MAX"],
-        combined["DAILY_DEWPOINT_AVG"],
-        combined["DAILY_WIND_AVG"],
-    )
-    combined["DAILY_APPARENT_EXPECTED_MIN"] = calc_aparent_temp_vector(
-        combined["DAILY_EXPECTED_MIN"],
-        combined["DAILY_DEWPOINT_AVG"],
-        combined["DAILY_WIND_AVG"],
-    )
-
-    combined["APPARENT_RECORD_HIGH"] = calc_aparent_temp_vector(
-        combined["DAILY_RECORD_HIGH"],
-        combined["DAILY_DEWPOINT_AVG"],
-        combined["DAILY_WIND_AVG"],
-    )
-    combined["APPARENT_RECORD_LOW"] = calc_aparent_temp_vector(
-        combined["DAILY_RECORD_LOW"],
-        combined["DAILY_DEWPOINT_AVG"],
-        combined["DAILY_WIND_AVG"],
-    )
-
-    combined["DAILY_COMFORT_INDEX"] = calc_comfort_index_vector(
-        combined["DAILY_MEAN_AVG"],
-        combined["APPARENT_MEAN_AVG"],
-        combined["DAILY_DEWPOINT_AVG"],
-        combined["DAILY_SUNSHINE_AVG"],
-    )
-    combined["SUNSHINE_HOURS"] = combined["DAYLIGHT_LENGTH"] * (
-        combined["DAILY_SUNSHINE_AVG"] / 100
-    )
-
-    print("FINISHED COMBINED REGRESSION: ", time.time() - start_time)
-
-    # Converting dataframe into useful dictionary for json return
-    #########################################################################
-
-    start_time = time.time()
-    df_numeric = combined.select_dtypes(include=[np.number])
-    df_date = combined[["DATE"]] if "DATE" in combined else None
-
-    if df_date is not None:
-        df = pd.concat([df_date, df_numeric], axis=1)
-    else:
-        raise KeyError("The 'DATE' column was not found in the original DataFrame.")
-
-    df["DATE"] = pd.to_datetime(df["DATE"])
-    df.set_index("DATE", inplace=True)
-
-    df.columns = df.columns.str.replace("DAILY_", "")
-
     # Calculate averages
-    avg_annual = df.mean().to_dict()
+    avg_annual = rollups.mean()
 
     max_columns = [
         "RECORD_HIGH",
@@ -480,32 +409,24 @@ def optimized_climate_data(target_lat, target_lon, target_elevation):
         "APPARENT_EXPECTED_MIN",
     ]
 
+    annual_max = rollups.mean_of_annual("max")
+    annual_min = rollups.mean_of_annual("min")
     for column in max_columns:
-        avg_annual[column] = df[column].resample("Y").max().mean()
+        avg_annual[column] = annual_max[column]
 
     for column in min_columns:
-        avg_annual[column] = df[column].resample("Y").min().mean()
+        avg_annual[column] = annual_min[column]
 
-    monthly_averages = df.resample("M").mean().groupby(lambda x: x.month).mean()
-    monthly_max = df[max_columns].resample("M").max().groupby(lambda x: x.month).mean()
-    monthly_min = df[min_columns].resample("M").min().groupby(lambda x: x.month).mean()
-
-    avg_monthly = []
-    for month in range(1, 13):  # Iterating over months
-        month_data = monthly_averages.loc[month].to_dict()
+    avg_monthly = rollups.monthly_climatology()
+    monthly_max = rollups.monthly_climatology("max")
+    monthly_min = rollups.monthly_climatology("min")
+    for month_data, month_max, month_min in zip(avg_monthly, monthly_max, monthly_min):
         for column in max_columns:
-            month_data[column] = monthly_max.loc[month, column]
+            month_data[column] = month_max[column]
         for column in min_columns:
-            month_data[column] = monthly_min.loc[month, column]
-        avg_monthly.append(month_data)
-
-    avg_daily = (
-        df.resample("D")
-        .mean()
-        .groupby(lambda x: (x.month, x.day))
-        .mean()
-        .to_dict(orient="records")
-    )
+            month_data[column] = month_min[column]
+
+    avg_daily = rollups.daily_climatology()
 
     # Adjustments for annual and monthly values
     process_columns = [
@@ -527,59 +448,14 @@ def optimized_climate_data(target_lat, target_lon, target_elevation):
         for month_data in avg_monthly:
             if column in month_data:
                 month_data[column] *= 30
-    # Historical data
-    historical = {}
-    for year, year_df in df.groupby(df.index.year):
-        # Convert Timestamp to string in the desired format
-        annual_data = year_df.mean(numeric_only=True).to_dict()
-        monthly_data = (
-            year_df.resample("M")
-            .mean()
-            .rename(lambda x: x.strftime("%m/%Y"))
-            .to_dict(orient="records")
-        )  # Removed on='DATE'
-        daily_data = (
-            year_df.resample("D")
-            .mean()
-            .rename(lambda x: x.strftime("%m/%d/%Y"))
-            .to_dict(orient="records")
-        )  # Removed on='DATE' and changed to_dict()
-
-        historical[year] = {
-            "annual": annual_data,
-            "monthly": monthly_data,
-            "daily": daily_data,
-        }
 
-    # Handle infinite values and NaN
-    def handle_nan(obj):
-        if isinstance(obj, float) and np.isnan(obj):
-            return None
-        elif isinstance(obj, np.float_):  # This checks for NumPy float types
-            return float(obj) if not np.isnan(obj) else None
-        elif isinstance(obj, np.int_):  # This checks for NumPy int types
-            return int(obj)
-        elif isinstance(obj, (list, tuple, np.ndarray)):
-            return [handle_nan(item) for item in obj]
-        elif isinstance(obj, dict):
-            return {k: handle_nan(v) for k, v in obj.items()}
-        return obj
-
-    result = {
+    # NaN values are left in place, climate_json.dumps writes them as null
+    climate_data = {
         "avg_annual": avg_annual,
         "avg_monthly": avg_monthly,
         "avg_daily": avg_daily,
-        "historical": historical,
     }
 
-    # Apply the handle_nan function to clean the entire result structure
-    # TODO this returns much faster if the handle_nan function is not applied, but
-    # the frontend will crash with the json output if this is not applied
-    # Find a way around this
-
-    climate_data = handle_nan(result)
-    # climate_data = result
-
     mean_temp_values = [month_data["MEAN_AVG"] for month_data in avg_monthly]
     precip_values = [month_data["PRECIP_AVG"] for month_data in avg_monthly]
 
@@ -589,12 +465,426 @@ def optimized_climate_data(target_lat, target_lon, target_elevation):
         "plant_hardiness": calc_plant_hardiness(avg_annual["EXPECTED_MIN"]),
     }
 
-    print("FINISHED CONVERTING TO DICT: ", time.time() - start_time)
     return climate_data, location_data
 
 
-def process_noaa_station_data(station, weight, elev_diff):
-    USE_COLS = ["DATE", "PRCP", "SNOW", "TMAX", "TMIN"]
+def historical_year(rollups, year, format_version):
+    """
+    Annual, monthly and daily data of one year of a daily climate frame's
+    PeriodRollups.
+
+    :raises NoDataForYearError: If there is no data for the year.
+    """
+    year_data = rollups.historical_year(year)
+    if format_version == 1:
+        year_data["monthly"] = records_from_columnar(year_data["monthly"])
+        year_data["daily"] = records_from_columnar(year_data["daily"])
+    return year_data
+
+
+def optimized_climate_data_batch(
+    points, format_version=DEFAULT_FORMAT_VERSION, include_historical=True
+):
+    """
+    Interpolate the climate of several points, reading each station they share once.
+
+    The closest stations of every point whose rollups are not in DAILY_FRAMES are
+    selected first, the distinct station files are loaded in parallel, and each point
+    is then aggregated from the loaded frames exactly as optimized_climate_data would.
+
+    :param points: List of (lat, lon, elevation) tuples.
+    :param include_historical: See optimized_climate_data.
+    :return: List of (climate_data, location_data), in the order of points.
+    """
+    if format_version not in FORMAT_VERSIONS:
+        raise ValueError(f"Unsupported format_version {format_version}")
+
+    with span("optimized_climate_data_batch", points=len(points)):
+        selections = {
+            point: select_stations(*point)
+            for point in points
+            if DAILY_FRAMES.get(point) is None
+        }
+        station_frames = load_stations(list(selections.values()))
+        return [
+            optimized_climate_data(
+                *point,
+                format_version,
+                # A point whose rollups were cached reads its stations from the
+                # store in the rare case they were evicted since
+                station_frames=station_frames if point in selections else None,
+                include_historical=include_historical,
+                selection=selections.get(point),
+            )
+            for point in points
+        ]
+
+
+def records_from_columnar(columnar):
+    """Compatibility shim turning columnar records back into the version 1 records."""
+    names = list(columnar["columns"])
+    values = [columnar["columns"][name].tolist() for name in names]
+    return [dict(zip(names, row)) for row in zip(*values)]
+
+
+def select_stations(target_lat, target_lon, target_elevation):
+    """
+    Find the closest NOAA and NWS stations to the target and their weights.
+
+    :return: Dict with the NWS (provider, city code) identifiers, the NOAA station
+        file names, the inverse distance weights of each, and elev_diff, the target
+        elevation less the weighted NOAA station elevation.
+    """
+    # Get the closest stations to coordinate from the prebuilt spatial indexes, each
+    # read with its table in one snapshot
+    nws_stations, nws_index = STATION_CATALOG.nws_stations
+    noaa_stations, noaa_index = STATION_CATALOG.noaa_stations
+    closest_NWS = nearest_coordinates_to_point_NWS(
+        target_lat,
+        target_lon,
+        nws_stations,
+        nws_index,
+        num_results=NUM_NWS_SAMPLE_STATIONS,
+    )
+    closest_NOAA = nearest_coordinates_to_point_NOAA(
+        target_lat,
+        target_lon,
+        noaa_stations,
+        noaa_index,
+        num_results=NUM_NOAA_SAMPLE_STATIONS,
+    )
+
+    # Compute inverse weighted average so closest distance has most weight
+    # The higher the weight power, the more the weights are skewed towards the closest point
+
+    weights_NWS = inverse_dist_weights(closest_NWS["DISTANCE"], weight_power=0.5)
+    weights_NOAA = inverse_dist_weights(closest_NOAA["DISTANCE"], weight_power=1)
+
+    # Get the historical weather for each location
+    nws_station_identifiers = list(
+        zip(closest_NWS["NWS_PROVIDER"], closest_NWS["CITY_CODE"])
+    )
+    noaa_station_files = [
+        noaa_station_file_name(station, lat, lon, elevation, name)
+        for station, lat, lon, elevation, name in zip(
+            closest_NOAA["STATION"],
+            closest_NOAA["LAT"],
+            closest_NOAA["LON"],
+            closest_NOAA["ELEVATION"],
+            closest_NOAA["NAME"],
+        )
+    ]
+    average_weighted_elev = sum(
+        elevation * weight
+        for elevation, weight in zip(closest_NOAA["ELEVATION"], weights_NOAA)
+    )
+    return {
+        "nws_station_identifiers": nws_station_identifiers,
+        "weights_NWS": weights_NWS,
+        "noaa_station_files": noaa_station_files,
+        "weights_NOAA": weights_NOAA,
+        "elev_diff": target_elevation - average_weighted_elev,
+    }
+
+
+def selected_station_files(selection):
+    """Return the (directory, file name) of every station in a select_stations result."""
+    return [
+        (NOAA_STATION_DIRECTORY, file_name)
+        for file_name in selection["noaa_station_files"]
+    ] + [
+        (NWS_STATION_DIRECTORY, nws_station_file_name(provider, city_code))
+        for provider, city_code in selection["nws_station_identifiers"]
+    ]
+
+
+def load_stations(selections):
+    """
+    Read every distinct station of several select_stations results once, in parallel.
+
+    :return: Dict of (directory, file name) -> raw station frame from load_station_data.
+    """
+    station_files = list(
+        dict.fromkeys(
+            station_file
+            for selection in selections
+            for station_file in selected_station_files(selection)
+        )
+    )
+    with span("load_stations", stations=len(station_files)):
+        with ThreadPoolExecutor(max_workers=MAX_THREADS) as executor:
+            frames = executor.map(
+                bind_current_span(lambda args: load_station_data(*args)),
+                station_files,
+            )
+            return dict(zip(station_files, frames))
+
+
+def interpolate_station_data(
+    target_lat, target_lon, target_elevation, station_frames=None, selection=None
+):
+    """
+    Inverse distance weight the closest NOAA and NWS stations to the target.
+
+    :param station_frames: Raw station frames from load_stations, or None to read
+        the stations from the store.
+    :param selection: The select_stations result station_frames were loaded for, so
+        a station catalog refresh since then cannot select stations not loaded.
+    :return: (combined, nws_station_identifiers) where combined is the daily
+        DataFrame of the NOAA columns left-joined with the NWS columns on DATE,
+        so NWS columns are NaN before the NWS record starts.
+    """
+    with span("select_stations") as selection_span:
+        if selection is None:
+            selection = select_stations(target_lat, target_lon, target_elevation)
+        nws_station_identifiers = selection["nws_station_identifiers"]
+        weights_NWS = selection["weights_NWS"]
+        noaa_station_files = selection["noaa_station_files"]
+        weights_NOAA = selection["weights_NOAA"]
+        elev_diff = selection["elev_diff"]
+        selection_span.set(
+            nws_stations=nws_station_identifiers,
+            nws_weights=list(weights_NWS),
+            noaa_stations=noaa_station_files,
+            noaa_weights=list(weights_NOAA),
+            elev_diff=elev_diff,
+        )
+
+    """
+    Each station frame holds weighted values and its WEIGHT per date. They are
+    scatter-added into a DailyAccumulator over the START_DATE..END_DATE calendar,
+    which divides by the summed weight of the stations that reported each column.
+    """
+    # Process each CSV and accumulate the weighted values by day
+
+    with span("noaa_aggregate", stations=len(noaa_station_files)) as noaa_span:
+        # Process NOAA station data in parallel
+        noaa_results = map_stations(
+            process_noaa_station_data,
+            [
+                (station, weight, elev_diff)
+                for station, weight in zip(noaa_station_files, weights_NOAA)
+            ],
+            station_frames,
+        )
+
+        noaa_accumulator = DailyAccumulator(START_DATE, END_DATE, noaa_results[0][1])
+        for station_data, _ in noaa_results:
+            noaa_accumulator.add(station_data)
+
+        # Weighted average across all stations for each date any station reported
+        noaa_final_data = noaa_accumulator.weighted_means()
+        noaa_span.set(rows=len(noaa_final_data))
+
+    with span("noaa_outliers") as outlier_span:
+        # Outlier Detection
+        ########################################################################
+        WINDOW_SIZE = 14  # for example, 15 days before and 15 days after
+        STD_DEV = 3
+
+        is_outlier = replace_outliers_with_rolling_mean(
+            noaa_final_data,
+            ["DAILY_HIGH_AVG", "DAILY_LOW_AVG"],
+            WINDOW_SIZE,
+            [STD_DEV, STD_DEV],
+        )
+        outlier_span.set(outliers=int(is_outlier.sum()))
+
+    noaa_final_data["DAILY_MEAN_AVG"] = (
+        noaa_final_data["DAILY_HIGH_AVG"] + noaa_final_data["DAILY_LOW_AVG"]
+    ) / 2
+
+    with span("dewpoint"):
+        regression_dewpoint = dewpoint_regr_calc(
+            noaa_final_data["DAILY_HIGH_AVG"],
+            noaa_final_data["DAILY_LOW_AVG"],
+            noaa_final_data["DAILY_PRECIP_AVG"],
+        )
+
+        # Calculate the Diurnal Temperature Range (DTR)
+        dtr = (
+            noaa_final_data["DAILY_HIGH_AVG"] - noaa_final_data["DAILY_LOW_AVG"]
+        ).to_numpy()
+
+        # Apply the correction factor for dewpoint using known data
+        a, b = fit_dewpoint_adjustment_model()
+        regression_dewpoint = adjust_dewpoint(
+            np.asarray(regression_dewpoint), dtr, a, b
+        )
+
+        noaa_final_data["REGR_DEWPOINT_AVG"] = regression_dewpoint
+        noaa_final_data["DTR"] = dtr
+        noaa_final_data["DAILY_DEWPOINT_AVG"] = regression_dewpoint
+        # Filtered apart from the temperatures, as it is predicted from them
+        replace_outliers_with_rolling_mean(
+            noaa_final_data, ["DAILY_DEWPOINT_AVG"], 14, [2]
+        )
+
+    noaa_final_data["NUM_HIGH_DEWPOINT_DAYS"] = (
+        noaa_final_data["DAILY_DEWPOINT_AVG"] > 70
+    ).astype(int)
+
+    with span("noaa_metrics"):
+        humidity_columns = [
+            ("DAILY_HUMIDITY_AVG", "DAILY_MEAN_AVG"),
+            ("DAILY_MORNING_HUMIDITY_AVG", "DAILY_LOW_AVG"),
+            ("DAILY_AFTERNOON_HUMIDITY_AVG", "DAILY_HIGH_AVG"),
+        ]
+        humidity = calc_humidity_percentages(
+            noaa_final_data["DAILY_DEWPOINT_AVG"].to_numpy(),
+            [noaa_final_data[column].to_numpy() for _, column in humidity_columns],
+        )
+        for (name, _), values in zip(humidity_columns, humidity):
+            noaa_final_data[name] = np.clip(values, 0, 100)
+
+        noaa_final_data["DAILY_MORNING_FROST_CHANCE"] = 100 * (
+            (noaa_final_data["DAILY_MORNING_HUMIDITY_AVG"] > 90)
+            & (noaa_final_data["DAILY_LOW_AVG"] <= 32)
+        ).astype(int)
+
+        noaa_final_data["HDD"] = np.maximum(65 - noaa_final_data["DAILY_MEAN_AVG"], 0)
+        noaa_final_data["CDD"] = np.maximum(noaa_final_data["DAILY_MEAN_AVG"] - 65, 0)
+        noaa_final_data["DAILY_GROWING_CHANCE"] = calc_growing_chance_vectorized(
+            noaa_final_data, window_size=30
+        )
+
+        date_statistics = day_of_year_statistics(
+            noaa_final_data,
+            {
+                "DAILY_RECORD_HIGH": ("DAILY_HIGH_AVG", "max"),
+                "DAILY_RECORD_LOW": ("DAILY_LOW_AVG", "min"),
+                "DAILY_EXPECTED_MAX": ("DAILY_HIGH_AVG", 90),
+                "DAILY_EXPECTED_MIN": ("DAILY_LOW_AVG", 10),
+            },
+        )
+        for column, values in date_statistics.items():
+            noaa_final_data[column] = values
+
+    with span("nws_aggregate", stations=len(nws_station_identifiers)):
+        # Process each CSV and combine the dataframes into one
+
+        # Process NWS station data in parallel
+        nws_results = map_stations(
+            process_nws_station_data,
+            [
+                (provider, city_code, weight, elev_diff)
+                for (provider, city_code), weight in zip(
+                    nws_station_identifiers, weights_NWS
+                )
+            ],
+            station_frames,
+        )
+
+        nws_accumulator = DailyAccumulator(START_DATE, END_DATE, nws_results[0][1])
+        for station_data, _ in nws_results:
+            nws_accumulator.add(station_data)
+
+    with span("merge_noaa_nws"):
+        # NWS columns on the NOAA dates, NaN where no NWS station reported
+        nws_final_data = nws_accumulator.weighted_means(noaa_final_data.index)
+        for column in nws_final_data.columns:
+            noaa_final_data[column] = nws_final_data[column].to_numpy()
+        combined = noaa_final_data.reset_index()
+
+    return combined, nws_station_identifiers
+
+
+def map_stations(function, station_args, station_frames=None):
+    """
+    Run a station processor over every station in the STATION_EXECUTION_MODE.
+
+    Stations already loaded by a batch only need their columns transformed, so they
+    are always processed in threads rather than pickled to the process pool.
+
+    :param function: process_noaa_station_data or process_nws_station_data.
+    :param station_args: List of argument tuples, one per station.
+    :return: List of (station_data, weighted_cols), in the order of station_args.
+    """
+    mode = STATION_EXECUTION_MODE
+    if mode == "process" and station_frames is None:
+        pool = station_process_pool()
+        futures = [
+            pool.submit(process_station_to_shared_memory, function, args)
+            for args in station_args
+        ]
+        # Wait for every worker, so no block is written after a failure is raised
+        wait(futures)
+        unread = [future for future in futures if future.exception() is None]
+        stations = []
+        try:
+            for future in futures:
+                result = future.result()
+                # The read frees the block itself, also when it fails
+                unread.remove(future)
+                stations.append(read_station_from_shared_memory(result))
+            return stations
+        finally:
+            # Workers hand their blocks over unregistered, so free any left unread
+            free_shared_memory_blocks([future.result() for future in unread])
+
+    station_args = [args + (station_frames,) for args in station_args]
+    if mode == "serial":
+        return [function(*args) for args in station_args]
+    with ThreadPoolExecutor(max_workers=MAX_THREADS) as executor:
+        return list(
+            executor.map(bind_current_span(lambda args: function(*args)), station_args)
+        )
+
+
+def nws_date_limit(target_lat, target_lon):
+    # Bounding box for Hawaii
+    sw_corner = (15, -170)
+    ne_corner = (30, -130)
+
+    if (
+        target_lat >= sw_corner[0]
+        and target_lat <= ne_corner[0]
+        and target_lon >= sw_corner[1]
+        and target_lon <= ne_corner[1]
+    ):
+        # Hawaii-specific date, since the NWS data is not available for Hawaii from 2019-04-01 to 2021-02-01
+        return pd.Timestamp("2021-02-01")
+    # April 1st, 2019 is the start of the nws dataset
+    return pd.Timestamp("2019-04-01")
+
+
+def fill_missing_nws_data(combined, nws_station_identifiers, date_limit):
+    """
+    Predict the NWS columns in place for the dates before date_limit that have no
+    NWS data, using the stored model for the NWS neighbor set. Without one, a full
+    model is fitted to this point's data alone, as every request did before models
+    were stored, and not kept, so a point never predicts with another point's fit.
+    """
+    missing_data = combined[
+        (combined["DAILY_SUNSHINE_AVG"].isna()) & (combined["DATE"] < date_limit)
+    ]
+    current_span().set(date_limit=str(date_limit.date()), rows=len(missing_data))
+    if missing_data.empty:
+        return
+
+    artifact = NWS_GAPFILL_MODELS.get(nws_station_identifiers)
+    current_span().set(stored_model=artifact is not None)
+    if artifact is None:
+        artifact = train_nws_gapfill_model(combined)
+
+    # Predict values where the data is missing
+    predictions = artifact["model"].predict(missing_data[artifact["features"]])
+
+    # TODO there is warning being raised somewhere here
+    """
+    RuntimeWarning: invalid value encountered in sqrt
+    result = getattr(ufunc, method)(*inputs, **kwargs)
+    """
+
+    # This assumes 'DATE' or any other unique identifier is the index in 'combined' and 'missing_data' DataFrames
+    index_for_update = missing_data.index
+
+    for i, column in enumerate(artifact["targets"]):
+        combined.loc[index_for_update, column] = predictions[:, i]
+
+
+@traced
+def process_noaa_station_data(station, weight, elev_diff, station_frames=None):
     FREEZING_POINT_F = 32
     # This is sort of a magic number, which reduces snowfall and rpecip in respect to the elevation difference
     # between the average elevation of the stations and the target elevation
@@ -620,23 +910,7 @@ def process_noaa_station_data(station, weight, elev_diff):
     MAX_ELEV_ADJUST_MULTIPLIER = 5
     elev_diff /= 1000
 
-    # Read the CSV data
-    if is_running_on_aws():
-        # Use the built-in '/tmp' directory in AWS Lambda
-        temp_local_path = f"/tmp/{station}"
-
-        get_csv_from_s3(S3_BUCKET_NAME, f"NOAA-STATIONS/{station}", temp_local_path)
-        df = pd.read_csv(temp_local_path, usecols=USE_COLS)
-        # Delete the file from /tmp directory after reading it
-        os.remove(temp_local_path)
-
-    else:
-        file_path = f"{os.getcwd()}\\STATIONS\\NOAA-STATIONS\\" + station
-        df = pd.read_csv(file_path, usecols=USE_COLS)
-
-    # Convert the 'DATE' column to datetime and filter rows based on the date range
-    df["DATE"] = pd.to_datetime(df["DATE"])
-    df = df[(df["DATE"] >= START_DATE) & (df["DATE"] <= END_DATE)]
+    df = read_station(NOAA_STATION_DIRECTORY, station, station_frames)
 
     df["DAILY_HIGH_AVG"] = (
         df["TMAX"] * 9 / 50 + 32 - elev_diff * ELEV_TEMPERATURE_CHANGE
@@ -651,8 +925,9 @@ def process_noaa_station_data(station, weight, elev_diff):
     # This aproximates how much moisture is in the air, similar to how the dewpoint is predicted.
     # If the diurinal temperature range is high, then the snow will be fluffier,
     # and if it is low, then the snow will be wetter, so less inches of snow per inch of precip.
-    df["DTR"] = df["DAILY_HIGH_AVG"] - df["DAILY_LOW_AVG"]
-    df["RAIN_TO_SNOW_CONVERSION"] = (df["DTR"] / 2).clip(lower=5, upper=20)
+    rain_to_snow_conversion = ((df["DAILY_HIGH_AVG"] - df["DAILY_LOW_AVG"]) / 2).clip(
+        lower=5, upper=20
+    )
 
     # Calculate snow averages using vectorized operations
     # Set DAILY_SNOW_AVG to 0 if DAILY_LOW_AVG is above the freezing point
@@ -686,9 +961,7 @@ def process_noaa_station_data(station, weight, elev_diff):
 
     df["DAILY_SNOW_AVG"] = np.where(
         rain_to_snow_condition,
-        df["DAILY_PRECIP_AVG"]
-        * df["RAIN_TO_SNOW_CONVERSION"]
-        * snow_elevation_adjustment,
+        df["DAILY_PRECIP_AVG"] * rain_to_snow_conversion * snow_elevation_adjustment,
         0,
     )
     df["DAILY_SNOW_AVG"] += np.where(
@@ -733,7 +1006,10 @@ def process_noaa_station_data(station, weight, elev_diff):
     return (df[["DATE", "WEIGHT"] + weighted_cols], weighted_cols)
 
 
-def process_nws_station_data(provider, city_code, weight, elev_diff):
+@traced
+def process_nws_station_data(
+    provider, city_code, weight, elev_diff, station_frames=None
+):
     """
     there is a column naming problem for all the nws csvs,so
     MAX SPD represents the normal wind speed
@@ -754,34 +1030,16 @@ def process_nws_station_data(provider, city_code, weight, elev_diff):
         X = TORNADO
     """
 
-    USE_COLS = ["Date", "MAX SPD", "DR", "S-S", "DIR", "WX"]
-    if is_running_on_aws():
-        # Use the built-in '/tmp' directory in AWS Lambda
-        temp_local_path = f"/tmp/{provider}_{city_code}.csv"
-
-        get_csv_from_s3(
-            S3_BUCKET_NAME,
-            f"NWS_STATION_FILES/{provider}_{city_code}.csv",
-            temp_local_path,
-        )
-        df = pd.read_csv(temp_local_path, usecols=USE_COLS)
-        # Delete the file from /tmp directory after reading it
-        os.remove(temp_local_path)
-
-    else:
-        file_path = (
-            f"{os.getcwd()}\\STATIONS\\NWS_STATION_FILES\\"
-            + f"{provider}_{city_code}.csv"
-        )
-        df = pd.read_csv(file_path, usecols=USE_COLS)
+    df = read_station(
+        NWS_STATION_DIRECTORY,
+        nws_station_file_name(provider, city_code),
+        station_frames,
+    )
     elev_diff /= 1000
     # Compute the required averages with elevation adjustments since conditions change with elevation
     elevation_adjustment_for_wind = min((1 + elev_diff * 0.2), 5)
     elevation_adjustment_for_sunshine = max((1 - elev_diff * 0.03), 0)
 
-    # Convert the 'DATE' column to datetime
-    df["DATE"] = pd.to_datetime(df["Date"])
-
     # TODO fix -10 values still appearing in the dataset for sunlight, see Hawaii values.
     df["DAILY_WIND_AVG"] = (
         df["MAX SPD"].where(df["MAX SPD"] > 0, 0) * elevation_adjustment_for_wind
@@ -827,131 +1085,142 @@ def process_nws_station_data(provider, city_code, weight, elev_diff):
     return (df[["DATE", "WEIGHT"] + weighted_cols], weighted_cols)
 
 
-# Function to aggregate the data, normalizing weights in the event of missing data
-def aggregate_data(all_data, cols_to_aggregate):
-    # Build the aggregation dictionary dynamically based on the input columns
-    agg_dict = {col: "sum" for col in cols_to_aggregate}
-    agg_dict["WEIGHT"] = "sum"  # Add the WEIGHT column to the aggregation dictionary
-
-    # Group by date and compute the sum based on the aggregation dictionary
-    aggregated = all_data.groupby("DATE").agg(agg_dict).reset_index()
-
-    # Calculate the weighted average for the specified columns
-    for col in cols_to_aggregate:
-        aggregated[col] /= aggregated["WEIGHT"]
-
-    return aggregated[["DATE"] + cols_to_aggregate]
-
+class DailyAccumulator:
+    """
+    Weighted daily average of station frames over a fixed calendar.
 
-def dewpoint_regr_calc(Tmax, Tmin, totalPrcp):
-    # Read the CSV file with temperature and dewpoint data
+    Weighted values and weights are scatter-added into arrays indexed by the day
+    offset from start_date. Weights are summed per column and only where that column
+    has a value, so a station missing a value on a day does not pull the average
+    towards zero.
 
-    if is_running_on_aws():
-        # Use the built-in '/tmp' directory in AWS Lambda
-        temp_local_path = "/tmp/temperature-humidity-data.csv"
+    :param columns: Weighted value columns of the frames passed to add.
+    """
 
-        get_csv_from_s3(
-            S3_BUCKET_NAME, "temperature-humidity-data.csv", temp_local_path
-        )
-        df = pd.read_csv(temp_local_path)
-        # Delete the file from /tmp directory after reading it
-        os.remove(temp_local_path)
-    else:
-        df = pd.read_csv(
-            os.path.join(
-                parent_directory,
-                "temperature-humidity-data.csv",
+    def __init__(self, start_date, end_date, columns):
+        self.dates = pd.date_range(start_date, end_date, freq="D", name="DATE")
+        self.epoch = self.dates[0].to_datetime64().astype("datetime64[D]")
+        self.columns = list(columns)
+        self.sums = np.zeros((len(self.columns), len(self.dates)))
+        self.column_weights = np.zeros((len(self.columns), len(self.dates)))
+        self.weights = np.zeros(len(self.dates))
+
+    def add(self, station_data):
+        """
+        :param station_data: DataFrame with DATE, WEIGHT and the weighted columns.
+        """
+        days = station_data["DATE"].to_numpy().astype("datetime64[D]")
+        offsets = (days - self.epoch).astype(np.int64)
+        in_range = (offsets >= 0) & (offsets < len(self.dates))
+        offsets = offsets[in_range]
+        weight = station_data["WEIGHT"].to_numpy()[in_range]
+        values = station_data[self.columns].to_numpy(dtype=np.float64)[in_range]
+
+        self.weights += np.bincount(offsets, weight, len(self.dates))
+        for i in range(len(self.columns)):
+            reported = ~np.isnan(values[:, i])
+            self.sums[i] += np.bincount(
+                offsets[reported], values[reported, i], len(self.dates)
+            )
+            self.column_weights[i] += np.bincount(
+                offsets[reported], weight[reported], len(self.dates)
             )
-        )
 
-    # Calculate TDiurinal (TMax - TMin)
-    df["TDiurinal"] = df["TMax"] - df["TMin"]
+    def weighted_means(self, dates=None):
+        """
+        Return the weighted averages as a DataFrame indexed by DATE.
 
-    # Define your input features and target variables
-    X = df[["TMax", "TMin", "TDiurinal", "Total"]]
-    y = df[["DAvg"]]
+        :param dates: Dates to return, NaN where no station reported. Defaults to
+            every date with at least one station.
+        """
+        if dates is None:
+            positions = np.flatnonzero(self.weights > 0)
+            dates = self.dates[positions]
+        else:
+            positions = self.dates.get_indexer(dates)
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means = self.sums / self.column_weights
+        # A column no station reported on a day that has data averages to 0, as
+        # the sum over the stations did before
+        means[(self.column_weights == 0) & (self.weights > 0)] = 0
+
+        values = np.full((len(positions), len(self.columns)), np.nan)
+        found = positions >= 0
+        values[found] = means[:, positions[found]].T
+        return pd.DataFrame(
+            values, index=pd.DatetimeIndex(dates, name="DATE"), columns=self.columns
+        )
 
-    # Split the data into training and testing sets (if needed)
-    # X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.5, random_state=42)
 
-    # Scale the features using StandardScaler
-    scaler = StandardScaler()
-    X_scaled = scaler.fit_transform(X)
+def dewpoint_regr_calc(Tmax, Tmin, totalPrcp):
+    return predict_dewpoint(load_dewpoint_model(), Tmax, Tmin, totalPrcp)
 
-    # Initialize the Random Forest Regressor
-    rf_model = RandomForestRegressor(n_estimators=5, random_state=42)
-    rf_model.fit(X_scaled, y.values.ravel())
 
-    Tdiurinal = [x - y for x, y in zip(Tmax, Tmin)]
+def load_dewpoint_model():
+    """
+    Return the pre-trained dewpoint model, loading it once per warm container.
+    Falls back to training it from temperature-humidity-data.csv if no compatible
+    artifact has been built with climate_models.py.
+    """
+    artifact = RESIDENT_MODELS.get(DEWPOINT_MODEL_KEY)
+    if artifact is None:
+        with span("load_dewpoint_model"):
+            artifact = MODEL_STORE.load(DEWPOINT_MODEL_KEY)
+            if not is_compatible_artifact(artifact, DEWPOINT_MODEL_VERSION):
+                print("No compatible dewpoint model artifact, training in process")
+                artifact = train_dewpoint_model(
+                    read_model_training_csv("temperature-humidity-data.csv")
+                )
+            RESIDENT_MODELS[DEWPOINT_MODEL_KEY] = artifact
+    return artifact
 
-    # Create a new DataFrame with your input data
-    new_data = pd.DataFrame(
-        {"TMax": Tmax, "TMin": Tmin, "TDiurinal": Tdiurinal, "Total": totalPrcp}
-    )
-    new_data_scaled = scaler.transform(new_data)
-    rf_predicted_dewpoint = rf_model.predict(new_data_scaled)
 
-    return rf_predicted_dewpoint
+def read_model_training_csv(file_name):
+    with STATION_STORE.open(file_name) as source:
+        return pd.read_csv(source)
 
 
 def fit_dewpoint_adjustment_model():
-    # Sample data
-    if is_running_on_aws():
-        # Use the built-in '/tmp' directory in AWS Lambda
-        temp_local_path = "/tmp/dewpoint-adjustment-data.csv"
-
-        get_csv_from_s3(S3_BUCKET_NAME, "dewpoint-adjustment-data.csv", temp_local_path)
-        df = pd.read_csv(temp_local_path)
-        # Delete the file from /tmp directory after reading it
-        os.remove(temp_local_path)
-    else:
-        df = pd.read_csv(
-            os.path.join(
-                parent_directory,
-                "dewpoint-adjustment-data.csv",
-            )
+    """
+    Return the (a, b) dewpoint adjustment coefficients built with climate_models.py
+    and stored with the station catalog. Falls back to fitting them once per warm
+    container from dewpoint-adjustment-data.csv if they have not been built.
+    """
+    coefficients = STATION_CATALOG.dewpoint_adjustment
+    if coefficients is not None:
+        return coefficients["a"], coefficients["b"]
+
+    if "dewpoint_adjustment" not in RESIDENT_MODELS:
+        print("No dewpoint adjustment coefficients, fitting in process")
+        RESIDENT_MODELS["dewpoint_adjustment"] = fit_dewpoint_adjustment(
+            read_model_training_csv("dewpoint-adjustment-data.csv")
         )
+    return RESIDENT_MODELS["dewpoint_adjustment"]
 
-    df["DTR"] = df["High_Temp"] - df["Low_Temp"]
-    df["Dewpoint_Adjustment"] = df["Actual_Dewpoint"] - df["Predicted_Dewpoint"]
-
-    # Fit the linear model
-    model = LinearRegression().fit(df[["DTR"]], df["Dewpoint_Adjustment"])
 
-    # Return the coefficients
-    return model.coef_[0], model.intercept_
+def adjust_dewpoint(predicted_dewpoint, dtr, a, b):
+    # Linear correction of the predicted dewpoint by the diurnal temperature range
+    return predicted_dewpoint + (a * dtr + b)
 
 
-def adjust_dewpoint(row, a, b, diurinal_str, dewpoint_str):
-    dtr = row[diurinal_str]
-    predicted_dewpoint = row[dewpoint_str]
-    adjustment = a * dtr + b
-    return predicted_dewpoint + adjustment
-
-
-def replace_outliers_with_rolling_mean(dataframe, column_name, window_size, std_dev):
+def replace_outliers_with_rolling_mean(dataframe, column_names, window_size, std_devs):
     """
-    Replace outliers in a specified column of a DataFrame with the rolling mean.
+    Replace outliers in columns of a DataFrame with their centered rolling mean, in
+    place. See climate_kernels.replace_rolling_outliers.
 
     :param dataframe: Pandas DataFrame containing the data.
-    :param column_name: The name of the column to process.
+    :param column_names: The names of the columns to process.
     :param window_size: The size of the rolling window.
-    :param std_dev: The number of standard deviations to use for defining outliers.
-    :return: DataFrame with outliers replaced in the specified column.
+    :param std_devs: The number of standard deviations defining outliers, per column.
+    :return: Boolean array of the outliers replaced, with a row per column.
     """
-    rolling_mean = (
-        dataframe[column_name].rolling(window=window_size, center=True).mean()
+    cleaned, is_outlier = replace_rolling_outliers(
+        [dataframe[column_name] for column_name in column_names], window_size, std_devs
     )
-    rolling_std = dataframe[column_name].rolling(window=window_size, center=True).std()
-
-    is_outlier = (dataframe[column_name] < (rolling_mean - std_dev * rolling_std)) | (
-        dataframe[column_name] > (rolling_mean + std_dev * rolling_std)
-    )
-
-    # Replace outliers with rolling mean
-    dataframe.loc[is_outlier, column_name] = rolling_mean[is_outlier]
-
-    return dataframe
+    for column_name, values in zip(column_names, cleaned):
+        dataframe[column_name] = values
+    return is_outlier
 
 
 def haversine_vectorized(lat1, lon1, lat2, lon2):
@@ -967,83 +1236,131 @@ def haversine_vectorized(lat1, lon1, lat2, lon2):
     return distance
 
 
-def nearest_coordinates_to_point_NWS(target_lat, target_lon, df, num_results=3):
-    latitudes = df["LAT"].values
-    longitudes = df["LON"].values
-    distances = haversine_vectorized(target_lat, target_lon, latitudes, longitudes)
-
-    # Combine with other columns and sort
-    results = np.column_stack(
-        (
-            latitudes,
-            longitudes,
-            df["NWS_PROVIDER"].values,
-            df["CITY_CODE"].values,
-            df["ELEVATION"].values,
-            df["STATION"].values,
-            distances,
-        )
-    )
-    closest = results[np.argsort(results[:, 6])][:num_results]
+def nearest_coordinates_to_point_NWS(
+    target_lat, target_lon, stations, station_index, num_results=3
+):
+    """
+    Find the closest NWS stations to a point, or to each of many points.
+
+    :param stations: NWS station table, dict of column name -> array.
+    :param station_index: StationIndex built from the same table.
+    :return: Dict of the station columns plus DISTANCE (km) for the closest stations,
+        sorted closest first. Arrays are (num_results,) for a scalar target and
+        (n_targets, num_results) when target_lat and target_lon are arrays.
+    """
+    _, indices = station_index.query(target_lat, target_lon, num_results)
 
+    closest = {column: values[indices] for column, values in stations.items()}
+    closest["DISTANCE"] = nearest_station_distances(target_lat, target_lon, closest)
     return closest
 
 
-def nearest_coordinates_to_point_NOAA(target_lat, target_lon, df, num_results=3):
-    start_time = time.time()
+def nearest_coordinates_to_point_NOAA(
+    target_lat, target_lon, stations, station_index, num_results=3
+):
+    """
+    Find the closest NOAA stations to a point, or to each of many points.
 
-    latitudes = df["LAT"].values
-    longitudes = df["LON"].values
-    distances = haversine_vectorized(target_lat, target_lon, latitudes, longitudes)
+    :param stations: NOAA station table, dict of column name -> array.
+    :param station_index: StationIndex built from the same table.
+    :return: Dict of the station columns plus DISTANCE (km) for the closest stations,
+        sorted closest first. Arrays are (num_results,) for a scalar target and
+        (n_targets, num_results) when target_lat and target_lon are arrays.
+    """
+    with span("nearest_noaa_stations", num_results=num_results):
+        _, indices = station_index.query(target_lat, target_lon, num_results)
 
-    # Combine with other columns and sort
-    results = np.column_stack(
-        (
-            latitudes,
-            longitudes,
-            df["STATION"].values,
-            df["ELEVATION"].values,
-            df["NAME"].values,
-            distances,
-        )
+        closest = {column: values[indices] for column, values in stations.items()}
+        closest["DISTANCE"] = nearest_station_distances(target_lat, target_lon, closest)
+    return closest
+
+
+def nearest_station_distances(target_lat, target_lon, closest):
+    # Exact haversine distances for the few selected stations, broadcasting each
+    # target against its own row of neighbors for batch queries
+    return haversine_vectorized(
+        np.expand_dims(target_lat, -1),
+        np.expand_dims(target_lon, -1),
+        closest["LAT"],
+        closest["LON"],
     )
-    closest = results[np.argsort(results[:, 5])][:num_results]
 
-    print("NOAA DISTANCES Elapsed Time:", time.time() - start_time, "seconds")
-    return closest
+
+def noaa_station_file_name(station, lat, lon, elevation, name):
+    # NOAA station files are named STATION_LAT_LON_ELEVATION_NAME.csv
+    return f"{station}_{float(lat)}_{float(lon)}_{round(float(elevation))}_{name}.csv"
 
 
 """
-This function takes in a list of the closest points to a target point
- and returns a list of weights for each point
+This function takes in the distances to the closest points to a target point
+ and returns an array of weights for each point
  The higher the weight power, the more the weights are skewed towards the closest point
 """
 
 
-def inverse_dist_weights(closest_points_list, weight_power=0.5):
-    dist_values = [entry[-1] for entry in closest_points_list]
+def inverse_dist_weights(distances, weight_power=0.5):
     # Squared to give increased weight to closest
-    inverses = [(1 / value) ** weight_power for value in dist_values]
-    sum_inverses = sum(inverses)
-    weights = [inverse / sum_inverses for inverse in inverses]
+    inverses = (1 / np.asarray(distances, dtype=np.float64)) ** weight_power
+    return inverses / inverses.sum(axis=-1, keepdims=True)
 
-    return weights
 
+def nws_station_file_name(provider, city_code):
+    return f"{provider}_{city_code}.csv"
 
-def is_running_on_aws():
-    return "amzn" in platform.platform()
 
+def read_station(directory, file_name, station_frames=None):
+    """
+    Return the raw frame of one station, copied from station_frames when a batch has
+    already loaded it, since the station processing modifies it.
+    """
+    if station_frames is None:
+        return load_station_data(directory, file_name)
+    return station_frames[(directory, file_name)].copy()
 
-def get_csv_from_s3(bucket_name, file_key, local_path):
-    try:
-        s3 = boto3.client("s3")
-        s3.download_file(bucket_name, file_key, local_path)
 
-    except Exception as e:
-        if hasattr(e, "response") and "Error" in e.response:
-            error_code = int(e.response["Error"]["Code"])
-            error_msg = e.response["Error"]["Message"]
-            print(f"Received error {error_code} from S3: {error_msg}")
-        else:
-            print(f"An error occurred: {e}")
-        raise
+def load_station_data(directory, file_name):
+    """
+    Read the raw daily values of one station between START_DATE and END_DATE.
+
+    Tries the columnar archive, and otherwise reads the station CSV.
+
+    :param directory: NOAA_STATION_DIRECTORY or NWS_STATION_DIRECTORY.
+    :param file_name: Name of the station CSV within directory.
+    :return: DataFrame with a datetime DATE column and the raw value columns.
+    """
+    with span("load_station_data", file=file_name) as station_span:
+        df, source_name = read_station_source(directory, file_name)
+        station_span.set(source=source_name, rows=len(df))
+    return df
+
+
+def peak_rss_mb():
+    """Peak resident memory of this process in MB, or None where it is unknown."""
+    if resource is None:
+        return None
+    # ru_maxrss is in KB on Linux and in bytes on macOS
+    scale = 1024**2 if sys.platform == "darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+
+def read_station_source(directory, file_name):
+    """Return the frame of load_station_data, and "archive" or "csv"."""
+    date_column, columns = STATION_FILE_COLUMNS[directory]
+    archive_key = (archive_directory(directory), archive_file_name(file_name))
+    if USE_STATION_ARCHIVE and archive_key not in MISSING_STATION_ARCHIVES:
+        try:
+            with STATION_STORE.open_station(*archive_key) as source:
+                return (
+                    read_station_archive(source, columns, START_DATE, END_DATE),
+                    "archive",
+                )
+        except (FileNotFoundError, ClientError) as e:
+            if not is_missing_object_error(e):
+                raise
+            MISSING_STATION_ARCHIVES.add(archive_key)
+
+    with STATION_STORE.open_station(directory, file_name) as source:
+        return (
+            read_station_csv(source, date_column, columns, START_DATE, END_DATE),
+            "csv",
+        )
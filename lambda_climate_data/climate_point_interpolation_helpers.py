@@ -2,7 +2,13 @@ import math
 import pandas as pd
 from math import radians, sin, cos, sqrt, atan2
 import numpy as np
-from scipy.stats import norm
+from scipy.special import ndtr
+import platform
+
+if "amzn" in platform.platform():
+    from climate_kernels import leap_aligned_day_of_year
+else:
+    from .climate_kernels import leap_aligned_day_of_year
 
 
 def calc_growing_chance_vectorized(noaa_final_data, window_size=14):
@@ -24,7 +30,8 @@ def calc_growing_chance_vectorized(noaa_final_data, window_size=14):
     # Calculate z-scores; use .fillna(0) to handle NaNs resulting from zero standard deviation
     z_scores = (35 - rolling_mean) / rolling_std
     z_scores = z_scores.fillna(0)
-    cumulative_probs = norm.cdf(z_scores)
+    # ndtr is norm.cdf, without importing scipy.stats on every cold start
+    cumulative_probs = ndtr(z_scores.to_numpy())
 
     # Calculate the percentiles
     percentiles_below_32 = (1 - cumulative_probs) * 100
@@ -40,231 +47,63 @@ def calc_growing_chance_vectorized(noaa_final_data, window_size=14):
     return growing_chance
 
 
-def fast_percentile(group, percentile):
-    return np.percentile(group, percentile)
-
-
-def calculate_statistic_by_date(
-    dataframe,
-    temp_col,
-    stat_function,
-    new_col_name,
-    percentile_high=90,
-    percentile_low=10,
-):
-    dataframe = dataframe.copy()
-
-    # Ensure the DataFrame's index is a DatetimeIndex
-    if not isinstance(dataframe.index, pd.DatetimeIndex):
-        dataframe.index = pd.to_datetime(dataframe.index)
-
-    dataframe["MONTH_DAY"] = dataframe.index.strftime("%m-%d")
-
-    if stat_function == "percentile":
-        if temp_col == "DAILY_HIGH_AVG":
-            dataframe[new_col_name] = dataframe.groupby("MONTH_DAY")[
-                temp_col
-            ].transform(lambda x: fast_percentile(x, percentile_high))
-        else:  # 'DAILY_LOW_AVG'
-            dataframe[new_col_name] = dataframe.groupby("MONTH_DAY")[
-                temp_col
-            ].transform(lambda x: fast_percentile(x, percentile_low))
-    else:
-        dataframe[new_col_name] = dataframe.groupby("MONTH_DAY")[temp_col].transform(
-            stat_function
-        )
-
-    dataframe.drop(columns="MONTH_DAY", inplace=True)
-
-    return dataframe
-
-
-# TODO This needs to take leap years into account
-def calc_sun_angle_and_daylight_length(latitude_degrees):
-    results = []
-
-    for day_of_year in range(1, 366):
-        # declination of the sun as a function of the day of the year
-        delta = -23.45 * math.cos(math.radians(360 / 365 * (day_of_year + 10)))
-        phi = math.radians(latitude_degrees)  # convert latitude to radians
-
-        # calculating the hour angle at which the sun sets/rises
-        clamped_value = max(-1, min(1, -math.tan(phi) * math.tan(math.radians(delta))))
-
-        # If clamped_value is -1 or 1, the sun never rises or never sets, respectively.
-        if clamped_value == 1:
-            daylight_length = 0  # Polar night
-            elevation_angle = 0  # Sun is below horizon all day
-        elif clamped_value == -1:
-            daylight_length = 24  # Midnight sun
-            # elevation_angle = 90  # Maximum possible solar noon elevation
-        else:
-            omega = math.acos(clamped_value)
-            daylight_length = 2 * omega * 24 / (2 * math.pi)  # Convert radians to hours
-            # solar noon elevation
-            elevation_angle = math.degrees(
-                math.asin(
-                    math.sin(phi) * math.sin(math.radians(delta))
-                    + math.cos(phi) * math.cos(math.radians(delta))
-                )
-            )
-
-        results.append((day_of_year, elevation_angle, daylight_length))
-
-    return results
-
-
-def calc_uv_index_vectorized(sun_angle, altitude, sunshine_percentage):
-    # Ensure sunshine_percentage is within [0,1]
-    sunshine_percentage = sunshine_percentage.clip(0, 100) / 100
-
-    # Calculate the basic UV index
-    uv_index = (sun_angle / 90) * 12
-
-    # Adjust for altitude
-    altitude_adjustment = altitude / 1000 * 0.05
-    uv_index_adjusted = uv_index * (1 + altitude_adjustment)
-
-    # Adjust for sunshine percentage, with a sqrt transformation
-    uv_index_adjusted *= np.sqrt(sunshine_percentage).clip(0, 1)
-
-    return uv_index_adjusted.clip(lower=0)
-
-
-def calc_humidity_percentage_vector(dew_points_F, temperatures_F):
-    # Convert Fahrenheit to Celsius
-    dew_points_C = (dew_points_F - 32) * 5 / 9
-    temperatures_C = (temperatures_F - 32) * 5 / 9
-
-    # Calculate actual vapor pressure
-    vapor_pressure = 6.112 * 10 ** (7.5 * dew_points_C / (237.7 + dew_points_C))
-
-    # Calculate saturation vapor pressure
-    saturation_vapor_pressure = 6.112 * 10 ** (
-        7.5 * temperatures_C / (237.7 + temperatures_C)
-    )
-
-    # Calculate humidity percentage
-    humidity_percentages = (vapor_pressure / saturation_vapor_pressure) * 100
-
-    # Handle the case where dew point is equal to or greater than the temperature
-    humidity_percentages = np.where(
-        dew_points_F >= temperatures_F, 100, humidity_percentages
-    )
-
-    return humidity_percentages
-
-
-# https://www.weather.gov/epz/wxcalc_windchill
-# https://www.wpc.ncep.noaa.gov/html/heatindex_equation.shtml
-def calc_aparent_temp_vector(T, DP, V):
-    # Replace zero values with 3 for wind speed
-    V = np.where(V == 0, 3, V)
-
-    RH = 100 * (
-        np.exp((17.625 * DP) / (243.04 + DP)) / np.exp((17.625 * T) / (243.04 + T))
-    )
-
-    # Conditions for Heat Index calculation
-    condition_heat_index = T > 80
-    HI = np.where(
-        condition_heat_index,
-        -42.379
-        + 2.04901523 * T
-        + 10.14333127 * RH
-        - 0.22475541 * T * RH
-        - 0.00683783 * T * T
-        - 0.05481717 * RH * RH
-        + 0.00122874 * T * T * RH
-        + 0.00085282 * T * RH * RH
-        - 0.00000199 * T * T * RH * RH,
-        T,  # default to nan, will be replaced later
-    )
-
-    # Adjustments for Heat Index
-    condition_adjustment1 = (T < 112) & (RH < 13)
-    adjustment1 = np.where(
-        condition_adjustment1,
-        ((13 - RH) / 4) * np.sqrt((17 - np.abs(T - 95.0)) / 17),
-        0,
-    )
-    condition_adjustment2 = (T < 87) & (RH > 85)
-    adjustment2 = np.where(condition_adjustment2, ((RH - 85) / 10) * ((87 - T) / 5), 0)
-    HI = HI - adjustment1 + adjustment2
-
-    # Conditions for Wind Chill calculation
-    condition_wind_chill = (T < 50) & (V >= 3)
-    WC = np.where(
-        condition_wind_chill,
-        35.74 + (0.6215 * T) - 35.75 * (V**0.16) + 0.4275 * T * (V**0.16),
-        T,  # default to nan, will be replaced later
-    )
-
-    # If neither Heat Index nor Wind Chill conditions are met, return the original temperature
+def group_percentile(sorted_values, starts, counts, percentile):
+    """
+    np.percentile with linear interpolation for every group of an array sorted by
+    group and then by value. A group containing NaN gives NaN, as np.percentile does.
+    """
+    position = percentile / 100 * (counts - 1)
+    below = np.floor(position).astype(np.int64)
+    above = np.minimum(below + 1, counts - 1)
+    weight = position - below
+
+    lower = sorted_values[starts + below]
+    upper = sorted_values[starts + above]
+    # Interpolate from whichever end is closer, the same way np.percentile does
+    difference = upper - lower
     result = np.where(
-        condition_heat_index | condition_wind_chill,
-        np.where(condition_heat_index, HI, WC),
-        T,
+        weight >= 0.5, upper - difference * (1 - weight), lower + difference * weight
     )
-
-    return result
-
-
-def calc_comfort_index_vector(temperature_df, apparent_df, dewpoint_df, sunshine_df):
-    def temperature_score(temp):
-        if temp <= 20 or temp >= 110:
-            return 0
-        elif temp == 70:
-            return 100
-        elif 20 < temp < 70:
-            return (temp - 20) * (100 / 50)  # linearly scale between 20 and 70
-        elif 70 < temp < 110:
-            return (110 - temp) * (100 / 40)  # linearly scale between 70 and 110
-
-    def apparent_temperature_score(apparent_temp):
-        if apparent_temp <= 20 or apparent_temp >= 110:
-            return 0
-        elif apparent_temp == 70:
-            return 100
-        elif 20 < apparent_temp < 70:
-            return (apparent_temp - 20) * (100 / 50)  # linearly scale between 20 and 70
-        elif 70 < apparent_temp < 110:
-            return (110 - apparent_temp) * (
-                100 / 40
-            )  # linearly scale between 70 and 110
-
-    def dewpoint_score(dewpoint):
-        if dewpoint >= 80:
-            return 0
-        elif dewpoint < 55:
-            return 100
-        else:
-            return (80 - dewpoint) * (100 / 25)  # linearly scale between 55 and 80
-
-    def sunlight_score(sunlight):
-        if sunlight >= 60:
-            return 100
-        elif sunlight <= 0:
-            return 0
-        else:
-            return sunlight * (100 / 60)  # linearly scale between 0 and 60
-
-    # Calculate individual component scores
-    df = pd.DataFrame()
-
-    df["temp_score"] = temperature_df.apply(temperature_score) * 0.4  # 40% weight
-    df["apparent_temp_score"] = (
-        apparent_df.apply(apparent_temperature_score) * 0.2
-    )  # 40% weight
-    df["dew_score"] = dewpoint_df.apply(dewpoint_score) * 0.2  # 20% weight
-    df["sun_score"] = sunshine_df.apply(sunlight_score) * 0.2  # 20% weight
-
-    # Calculate the final comfort index
-    df["comfort_index"] = (
-        df["temp_score"] + df["apparent_temp_score"] + df["dew_score"] + df["sun_score"]
+    has_nan = np.isnan(sorted_values[starts + counts - 1])
+    return np.where(has_nan, np.nan, result)
+
+
+def day_of_year_statistics(dataframe, statistics):
+    """
+    Climatology of each calendar date across all years, in one grouping pass.
+
+    :param dataframe: DataFrame with a DatetimeIndex. It is not copied or modified.
+    :param statistics: Dict of output name -> (column, statistic), where statistic
+        is "max", "min" (skipping NaN) or a percentile from 0 to 100.
+    :return: Dict of output name -> array with the statistic of each row's date.
+    """
+    keys = leap_aligned_day_of_year(pd.DatetimeIndex(dataframe.index))
+    # Rows grouped by date, then each group sorted by value so the min, max and
+    # percentiles are read at fixed positions. NaN sorts to the end of its group.
+    sorted_rows = {}
+    for column, _ in statistics.values():
+        if column not in sorted_rows:
+            values = dataframe[column].to_numpy(dtype=np.float64)
+            order = np.lexsort((values, keys))
+            sorted_rows[column] = values[order]
+
+    sorted_keys = np.sort(keys, kind="stable")
+    group_keys, starts, counts = np.unique(
+        sorted_keys, return_index=True, return_counts=True
     )
-
-    return df["comfort_index"]
+    row_groups = np.searchsorted(group_keys, keys)
+
+    results = {}
+    for name, (column, statistic) in statistics.items():
+        sorted_values = sorted_rows[column]
+        if statistic == "max":
+            group_stat = np.fmax.reduceat(sorted_values, starts)
+        elif statistic == "min":
+            group_stat = np.fmin.reduceat(sorted_values, starts)
+        else:
+            group_stat = group_percentile(sorted_values, starts, counts, statistic)
+        results[name] = group_stat[row_groups]
+    return results
 
 
 # https://en.wikipedia.org/wiki/K%C3%B6ppen_climate_classification#Overview
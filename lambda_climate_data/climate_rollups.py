@@ -0,0 +1,191 @@
+import numpy as np
+
+"""
+Period rollups of a daily climate frame, for the averages and historical data of the
+climate data result.
+
+The frame's index is sorted, so each calendar month is a contiguous run of rows. The
+sum, count, maximum and minimum of every column in every month are taken in one
+reduceat pass over the values, keyed by integer year * 12 + month. The years are
+rolled up from the months, and the climatological averages come from the month and
+year rollups instead of scanning the frame again. The day of year averages group the
+days by integer month * 32 + day the same way.
+
+NaN values are skipped, as by the pandas means, max and min these replace, and a
+period where a column has no value is NaN. Each year's historical monthly and daily
+data covers its first to last month and day present, NaN in between, as resample
+returns them.
+"""
+
+
+class NoDataForYearError(ValueError):
+    """Raised for a historical year the point has no data for."""
+
+
+def segment_starts(keys):
+    """Positions where a run of equal keys starts in a sorted key array."""
+    return np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+
+
+def safe_means(sums, counts):
+    """sums / counts, NaN where the count is 0."""
+    means = np.full(sums.shape, np.nan)
+    np.divide(sums, counts, out=means, where=counts > 0)
+    return means
+
+
+def grouped_nanmeans(values, groups, group_count):
+    """
+    Mean of the rows of values in each group, skipping NaN.
+
+    :param values: 2-D array with a row per period.
+    :param groups: Group of each row, from 0 to group_count - 1.
+    :return: 2-D array with a row per group.
+    """
+    is_value = ~np.isnan(values)
+    sums = np.zeros((group_count, values.shape[1]))
+    counts = np.zeros((group_count, values.shape[1]))
+    np.add.at(sums, groups, np.where(is_value, values, 0))
+    np.add.at(counts, groups, is_value)
+    return safe_means(sums, counts)
+
+
+class PeriodRollups:
+    """
+    Monthly, annual and day of year rollups of a daily climate frame.
+
+    :param df: DataFrame indexed by unique dates, with numeric columns.
+    """
+
+    def __init__(self, df):
+        if not df.index.is_monotonic_increasing:
+            df = df.sort_index()
+        self.df = df
+        self.columns = list(df.columns)
+
+        index = df.index
+        years = index.year.to_numpy()
+        months = index.month.to_numpy()
+        values = df.to_numpy(dtype=np.float64)
+        is_value = ~np.isnan(values)
+        value_counts = is_value.astype(np.int64)
+        zeroed_values = np.where(is_value, values, 0)
+
+        month_keys = years * 12 + months - 1
+        month_starts = segment_starts(month_keys)
+        self.month_keys = month_keys[month_starts]
+        self.month_rows = np.r_[month_starts, len(df)]
+        self.month_sums = np.add.reduceat(zeroed_values, month_starts)
+        self.month_counts = np.add.reduceat(value_counts, month_starts)
+        self.month_max = np.fmax.reduceat(values, month_starts)
+        self.month_min = np.fmin.reduceat(values, month_starts)
+
+        year_of_month = self.month_keys // 12
+        year_starts = segment_starts(year_of_month)
+        self.years = [int(year) for year in year_of_month[year_starts]]
+        self.year_months = np.r_[year_starts, len(self.month_keys)]
+        self.year_sums = np.add.reduceat(self.month_sums, year_starts)
+        self.year_counts = np.add.reduceat(self.month_counts, year_starts)
+        self.year_max = np.fmax.reduceat(self.month_max, year_starts)
+        self.year_min = np.fmin.reduceat(self.month_min, year_starts)
+
+        day_keys = months * 32 + index.day.to_numpy()
+        order = np.argsort(day_keys, kind="stable")
+        day_starts = segment_starts(day_keys[order])
+        self.day_sums = np.add.reduceat(zeroed_values[order], day_starts)
+        self.day_counts = np.add.reduceat(value_counts[order], day_starts)
+
+    def column_dict(self, row):
+        return dict(zip(self.columns, row.tolist()))
+
+    def mean(self):
+        """Mean of every column over all days, as DataFrame.mean."""
+        return self.column_dict(
+            safe_means(self.year_sums.sum(axis=0), self.year_counts.sum(axis=0))
+        )
+
+    def mean_of_annual(self, statistic):
+        """Mean over the years of each column's annual "max" or "min"."""
+        annual = self.year_max if statistic == "max" else self.year_min
+        return self.column_dict(
+            safe_means(np.nansum(annual, axis=0), (~np.isnan(annual)).sum(axis=0))
+        )
+
+    def monthly_climatology(self, statistic="mean"):
+        """
+        Mean over the years of each month's "mean", "max" or "min" of every column,
+        as a dict per calendar month from January.
+        """
+        if statistic == "max":
+            monthly = self.month_max
+        elif statistic == "min":
+            monthly = self.month_min
+        else:
+            monthly = safe_means(self.month_sums, self.month_counts)
+        means = grouped_nanmeans(monthly, self.month_keys % 12, 12)
+        return [self.column_dict(row) for row in means]
+
+    def daily_climatology(self):
+        """Mean of every column per month and day, as a dict per day in date order."""
+        means = safe_means(self.day_sums, self.day_counts)
+        return [self.column_dict(row) for row in means]
+
+    def historical_year(self, year):
+        """
+        Annual means, and the monthly and daily means as columnar records, of a year.
+
+        :raises NoDataForYearError: If there is no data for the year.
+        """
+        if year not in self.years:
+            raise NoDataForYearError(f"No data for year {year}")
+        position = self.years.index(year)
+
+        month_start, month_end = self.year_months[position : position + 2]
+        month_keys = self.month_keys[month_start:month_end]
+        monthly = self.period_grid(
+            month_keys,
+            safe_means(
+                self.month_sums[month_start:month_end],
+                self.month_counts[month_start:month_end],
+            ),
+        )
+        first_month = month_keys[0] % 12 + 1
+        month_dates = [
+            f"{month:02d}/{year}"
+            for month in range(first_month, first_month + monthly.shape[1])
+        ]
+
+        rows = slice(self.month_rows[month_start], self.month_rows[month_end])
+        dates = self.df.index[rows]
+        days = dates.to_numpy().astype("datetime64[D]")
+        daily = self.period_grid(
+            days.astype(np.int64), self.df.iloc[rows].to_numpy(dtype=np.float64)
+        )
+        all_days = np.arange(days[0], days[0] + daily.shape[1])
+        day_dates = [
+            f"{date[5:7]}/{date[8:10]}/{year}"
+            for date in np.datetime_as_string(all_days).tolist()
+        ]
+
+        return {
+            "annual": self.column_dict(
+                safe_means(self.year_sums[position], self.year_counts[position])
+            ),
+            "monthly": self.columnar(month_dates, monthly),
+            "daily": self.columnar(day_dates, daily),
+        }
+
+    def period_grid(self, keys, values):
+        """
+        Values of consecutive integer periods from the first to the last key, with a
+        row per column so each column is contiguous, NaN for the missing periods.
+        """
+        grid = np.full((len(self.columns), keys[-1] - keys[0] + 1), np.nan)
+        grid[:, keys - keys[0]] = values.T
+        return grid
+
+    def columnar(self, dates, grid):
+        return {
+            "dates": dates,
+            "columns": dict(zip(self.columns, grid)),
+        }
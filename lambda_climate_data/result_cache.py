@@ -0,0 +1,134 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+
+"""
+Cache of encoded climate data results, keyed by the neighborhood they were computed for.
+
+Points are snapped to a grid of RESULT_CACHE_GRID_DEGREES in latitude and longitude and
+to RESULT_CACHE_ELEVATION_BUCKET feet of elevation, and the result is computed for the
+snapped point, so every request in the same cell gets the same result. The default grid
+of 0.01 degrees is about 1 km, well inside the spacing of the stations being sampled.
+
+The key of a cell doubles as its S3 object key. The Lambda handler keeps the keys of
+recently written results in a ResultLRU and checks the bucket for older ones, so a
+repeated request only needs a presigned URL. The summary and each year of a cell are
+stored as their own objects next to the full result.
+
+Results go stale as the station files gain new days, so every key holds the data
+version, the UTC date starting the current period of RESULT_CACHE_MAX_AGE_DAYS. Once
+the period ends the keys change and each cell is recomputed on its next request, so a
+result is at most that old. Objects of past periods are never read again, and are
+deleted by a lifecycle rule expiring RESULT_CACHE_PREFIX after a few days. Bump
+RESULT_CACHE_VERSION when the contents of the result change, so stale objects are not
+served before the period ends.
+"""
+RESULT_CACHE_GRID_DEGREES = float(os.environ.get("RESULT_CACHE_GRID_DEGREES", 0.01))
+RESULT_CACHE_ELEVATION_BUCKET = float(
+    os.environ.get("RESULT_CACHE_ELEVATION_BUCKET", 100)
+)
+RESULT_CACHE_MAX_KEYS = int(os.environ.get("RESULT_CACHE_MAX_KEYS", 4096))
+RESULT_CACHE_VERSION = os.environ.get("RESULT_CACHE_VERSION", "2")
+RESULT_CACHE_MAX_AGE_DAYS = int(os.environ.get("RESULT_CACHE_MAX_AGE_DAYS", 1))
+RESULT_CACHE_PREFIX = "climate_data/cache"
+
+
+def cell_index(value, step):
+    return int(round(value / step))
+
+
+def quantize_point(
+    latitude,
+    longitude,
+    elevation,
+    grid_degrees=RESULT_CACHE_GRID_DEGREES,
+    elevation_bucket=RESULT_CACHE_ELEVATION_BUCKET,
+):
+    """Return the point snapped to the center of its cache cell."""
+    return (
+        round(cell_index(latitude, grid_degrees) * grid_degrees, 6),
+        round(cell_index(longitude, grid_degrees) * grid_degrees, 6),
+        round(cell_index(elevation, elevation_bucket) * elevation_bucket, 6),
+    )
+
+
+def data_version(now=None, max_age_days=RESULT_CACHE_MAX_AGE_DAYS):
+    """
+    Return the UTC date, as YYYYMMDD, starting the period of max_age_days that now
+    falls in. Periods are counted from the Unix epoch.
+
+    :param now: Seconds since the epoch, the current time if None.
+    """
+    day = int((time.time() if now is None else now) // 86400)
+    return time.strftime("%Y%m%d", time.gmtime((day - day % max_age_days) * 86400))
+
+
+def result_key(
+    latitude,
+    longitude,
+    elevation,
+    format_version,
+    part="full",
+    grid_degrees=RESULT_CACHE_GRID_DEGREES,
+    elevation_bucket=RESULT_CACHE_ELEVATION_BUCKET,
+    version=None,
+):
+    """
+    Return the cache key, and S3 object key, of the cell containing a point.
+
+    Cells are numbered by integer grid indices so the key does not depend on how the
+    snapped coordinates print.
+
+    :param part: "full", "summary", or the year of a per-year detail result.
+    :param version: Data version of the result, the current data_version if None.
+    """
+    if version is None:
+        version = data_version()
+    cell = "_".join(
+        str(index)
+        for index in (
+            cell_index(latitude, grid_degrees),
+            cell_index(longitude, grid_degrees),
+            cell_index(elevation, elevation_bucket),
+        )
+    )
+    return (
+        f"{RESULT_CACHE_PREFIX}/v{RESULT_CACHE_VERSION}/data{version}/"
+        f"format{format_version}/grid{grid_degrees:g}_elev{elevation_bucket:g}/{cell}{part_suffix(part)}.json"
+    )
+
+
+def part_suffix(part):
+    return "" if part == "full" else f"_{part}"
+
+
+class ResultLRU:
+    """
+    Least recently used set of the cache keys whose results are known to be in the
+    bucket, bounded by count. Only the keys are kept, the results are served from S3.
+
+    :param max_keys: Keys are evicted oldest first once there are more than this.
+    """
+
+    def __init__(self, max_keys=RESULT_CACHE_MAX_KEYS):
+        self.max_keys = max_keys
+        self._keys = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __contains__(self, key):
+        with self._lock:
+            if key not in self._keys:
+                return False
+            self._keys.move_to_end(key)
+            return True
+
+    def __len__(self):
+        return len(self._keys)
+
+    def add(self, key):
+        with self._lock:
+            self._keys[key] = None
+            self._keys.move_to_end(key)
+            while len(self._keys) > self.max_keys:
+                self._keys.popitem(last=False)
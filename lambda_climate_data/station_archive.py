@@ -0,0 +1,143 @@
+import os
+import glob
+import argparse
+import importlib.util
+import pandas as pd
+
+"""
+Columnar archive of the per-station daily files.
+
+The station CSVs hold the full history of each station, so reading them means parsing
+every DATE string before the rows outside START_DATE..END_DATE can be dropped. The
+archive keeps one Parquet file per station with DATE stored as a typed date and one row
+group per year, so a reader only decodes the row groups whose min/max statistics
+overlap the requested range.
+
+Build the archive from a directory of CSVs with
+
+    python -m lambda_climate_data.station_archive noaa <csv_dir> <archive_dir>
+    python -m lambda_climate_data.station_archive nws <csv_dir> <archive_dir>
+
+and upload <archive_dir> next to the CSV directory in the bucket, then set
+USE_STATION_ARCHIVE=1. Stations without an archive file, or containers without
+pyarrow, keep reading the CSVs. pyarrow is only imported once an archive file is read.
+"""
+ARCHIVE_SUFFIX = "-PARQUET"
+ARCHIVE_EXTENSION = ".parquet"
+
+# Station file directory -> (date column in the CSV, value columns kept)
+NOAA_STATION_DIRECTORY = "NOAA-STATIONS"
+NWS_STATION_DIRECTORY = "NWS_STATION_FILES"
+STATION_FILE_COLUMNS = {
+    NOAA_STATION_DIRECTORY: ("DATE", ["PRCP", "SNOW", "TMAX", "TMIN"]),
+    NWS_STATION_DIRECTORY: ("Date", ["MAX SPD", "DR", "S-S", "DIR"]),
+}
+
+
+def archive_available():
+    return importlib.util.find_spec("pyarrow") is not None
+
+
+def archive_directory(directory):
+    return directory + ARCHIVE_SUFFIX
+
+
+def archive_file_name(file_name):
+    return os.path.splitext(file_name)[0] + ARCHIVE_EXTENSION
+
+
+def read_station_csv(source, date_column, columns, start_date, end_date):
+    """
+    Read a station CSV, returning DATE as datetime64 and only rows in the date range.
+
+    :param source: Path or file-like object of the CSV.
+    :param date_column: Name of the date column in the CSV, returned as DATE.
+    :param columns: Value columns to keep.
+    """
+    df = pd.read_csv(source, usecols=[date_column] + columns)
+    df["DATE"] = pd.to_datetime(df.pop(date_column))
+    df = df[(df["DATE"] >= start_date) & (df["DATE"] <= end_date)]
+    return df[["DATE"] + columns]
+
+
+def read_station_archive(source, columns, start_date, end_date):
+    """
+    Read a station archive file, returning the same frame as read_station_csv.
+
+    The date range is pushed down to the reader, so row groups for years outside it
+    are never decoded. A file-like source is read whole first, so from S3 this saves
+    the decoding of the other years but not their download.
+
+    :param source: Path, or file-like object such as an S3 response body.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if hasattr(source, "read"):
+        # The reader seeks to the footer, which a streamed body cannot do
+        source = pa.BufferReader(source.read())
+    table = pq.read_table(
+        source,
+        columns=["DATE"] + columns,
+        filters=[
+            ("DATE", ">=", pd.Timestamp(start_date).date()),
+            ("DATE", "<=", pd.Timestamp(end_date).date()),
+        ],
+    )
+    return table.to_pandas(date_as_object=False)
+
+
+def convert_station_csv(csv_path, archive_path, date_column, columns):
+    """Write one station CSV as an archive file with a row group per year."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    df = read_station_csv(
+        csv_path, date_column, columns, pd.Timestamp.min, pd.Timestamp.max
+    )
+    df = df.sort_values("DATE", kind="mergesort").reset_index(drop=True)
+    years = df["DATE"].dt.year
+    df["DATE"] = df["DATE"].dt.date
+
+    schema = pa.Table.from_pandas(df, preserve_index=False).schema
+    with pq.ParquetWriter(archive_path, schema, compression="zstd") as writer:
+        for _, year_df in df.groupby(years, sort=True):
+            writer.write_table(
+                pa.Table.from_pandas(year_df, schema=schema, preserve_index=False)
+            )
+
+
+def convert_station_directory(directory, csv_dir, archive_dir):
+    """
+    Convert every CSV in csv_dir into archive_dir.
+
+    :param directory: NOAA_STATION_DIRECTORY or NWS_STATION_DIRECTORY, selects the columns.
+    :return: Number of files written.
+    """
+    date_column, columns = STATION_FILE_COLUMNS[directory]
+    os.makedirs(archive_dir, exist_ok=True)
+
+    csv_paths = sorted(glob.glob(os.path.join(csv_dir, "*.csv")))
+    for csv_path in csv_paths:
+        archive_path = os.path.join(
+            archive_dir, archive_file_name(os.path.basename(csv_path))
+        )
+        convert_station_csv(csv_path, archive_path, date_column, columns)
+    return len(csv_paths)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the columnar station archive")
+    parser.add_argument("stations", choices=["noaa", "nws"])
+    parser.add_argument("csv_dir", help="Directory of station CSVs")
+    parser.add_argument("archive_dir", help="Directory to write the archive files to")
+    args = parser.parse_args()
+
+    if not archive_available():
+        raise SystemExit("pyarrow is required to build the station archive")
+
+    directory = {"noaa": NOAA_STATION_DIRECTORY, "nws": NWS_STATION_DIRECTORY}[
+        args.stations
+    ]
+    count = convert_station_directory(directory, args.csv_dir, args.archive_dir)
+    print(f"Converted {count} station files to {args.archive_dir}")
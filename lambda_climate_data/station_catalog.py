@@ -0,0 +1,192 @@
+import os
+import json
+import time
+import threading
+import numpy as np
+import pandas as pd
+from botocore.exceptions import ClientError
+import platform
+
+if "amzn" in platform.platform():
+    from station_index import StationIndex
+    from station_store import is_missing_object_error
+    from tracing import span
+else:
+    from .station_index import StationIndex
+    from .station_store import is_missing_object_error
+    from .tracing import span
+
+"""
+The station identifier tables are small but are needed by every request, so they are
+parsed once per warm container and kept as typed NumPy arrays. The source objects are
+revalidated against their S3 ETag (or file modification time when running locally)
+at most once every STATION_CATALOG_REFRESH_SECONDS, and only re-downloaded if changed.
+A failed revalidation keeps the cached version until the next one is due.
+A spatial index is built once per loaded version of each table.
+
+The catalog also carries small build-time constants that belong with the station data,
+such as the dewpoint adjustment coefficients written by climate_models.py.
+"""
+STATION_CATALOG_REFRESH_SECONDS = float(
+    os.environ.get("STATION_CATALOG_REFRESH_SECONDS", 300)
+)
+
+NWS_STATIONS_KEY = "nws-station-identifiers.csv"
+NOAA_STATIONS_KEY = "noaa-station-identifiers.csv"
+DEWPOINT_ADJUSTMENT_KEY = "dewpoint-adjustment-coefficients.json"
+
+# Column name -> dtype of the array that is kept for it
+NWS_STATION_COLUMNS = {
+    "LAT": np.float64,
+    "LON": np.float64,
+    "NWS_PROVIDER": str,
+    "CITY_CODE": str,
+    "ELEVATION": np.float64,
+    "STATION": str,
+}
+NOAA_STATION_COLUMNS = {
+    "LAT": np.float64,
+    "LON": np.float64,
+    "STATION": str,
+    "ELEVATION": np.float64,
+    "NAME": str,
+}
+
+
+def parse_station_table(source, columns):
+    """
+    Parse a station identifier CSV into a dict of column name -> typed NumPy array.
+
+    :param source: Path or file-like object of the CSV.
+    :param columns: Mapping of column name to the dtype to keep it as.
+    :return: Dict of column arrays, all the same length.
+    """
+    df = pd.read_csv(source, usecols=list(columns))
+    return {
+        column: df[column].to_numpy(dtype=dtype) for column, dtype in columns.items()
+    }
+
+
+def parse_json(source):
+    if isinstance(source, str):
+        with open(source) as f:
+            return json.load(f)
+    return json.load(source)
+
+
+class StationCatalog:
+    """
+    Module-level cache of the NWS and NOAA station identifier tables.
+
+    :param store: S3StationStore or LocalStationStore the tables are read from.
+    """
+
+    def __init__(self, store, refresh_seconds=STATION_CATALOG_REFRESH_SECONDS):
+        self.store = store
+        self.refresh_seconds = refresh_seconds
+        self._tables = {}
+        self._versions = {}
+        self._checked_at = {}
+        self._indexes = {}
+        self._lock = threading.Lock()
+
+    @property
+    def nws(self):
+        return self.table(NWS_STATIONS_KEY, NWS_STATION_COLUMNS)
+
+    @property
+    def noaa(self):
+        return self.table(NOAA_STATIONS_KEY, NOAA_STATION_COLUMNS)
+
+    @property
+    def nws_stations(self):
+        return self.stations(NWS_STATIONS_KEY, NWS_STATION_COLUMNS)
+
+    @property
+    def noaa_stations(self):
+        return self.stations(NOAA_STATIONS_KEY, NOAA_STATION_COLUMNS)
+
+    def stations(self, key, columns):
+        """
+        Return the current table for key with its StationIndex, as one (table, index)
+        snapshot so a refresh between reading the two cannot pair them up wrong.
+        """
+        stations = self.table(key, columns)
+        with self._lock:
+            cached = self._indexes.get(key)
+            if cached is None or cached[0] is not stations:
+                cached = (stations, StationIndex(stations["LAT"], stations["LON"]))
+                # A refresh may have replaced the table since it was read above
+                if self._tables.get(key) is stations:
+                    self._indexes[key] = cached
+            return cached
+
+    @property
+    def dewpoint_adjustment(self):
+        """Dict with the dewpoint adjustment coefficients a and b, or None if not built."""
+        return self.load(DEWPOINT_ADJUSTMENT_KEY, parse_json, required=False)
+
+    def table(self, key, columns):
+        """Return the parsed station table for key."""
+        return self.load(key, lambda source: parse_station_table(source, columns))
+
+    def load(self, key, parser, required=True):
+        """
+        Return the parsed object for key, loading or revalidating it if it is due.
+
+        :param parser: Function turning a path or file-like object into the cached value.
+        :param required: If False, a missing source object is cached as None instead
+            of raising.
+
+        If revalidating a cached object fails, the cached version is returned and
+        revalidated again after refresh_seconds.
+        """
+        now = time.monotonic()
+        if (
+            key in self._tables
+            and now - self._checked_at.get(key, 0) < self.refresh_seconds
+        ):
+            return self._tables[key]
+
+        with self._lock:
+            # Another thread may have refreshed the table while we waited on the lock
+            if (
+                key in self._tables
+                and now - self._checked_at.get(key, 0) < self.refresh_seconds
+            ):
+                return self._tables[key]
+
+            try:
+                if (
+                    key not in self._tables
+                    or self.store.version(key) != self._versions[key]
+                ):
+                    with span("load_station_catalog", key=key):
+                        source, version = self.store.fetch(key)
+                        self._tables[key] = parser(source)
+                        self._versions[key] = version
+            except Exception as e:
+                if (
+                    not required
+                    and isinstance(e, (FileNotFoundError, ClientError))
+                    and is_missing_object_error(e)
+                ):
+                    self._tables[key] = None
+                    self._versions[key] = None
+                elif key in self._tables:
+                    # Keep serving the cached version, and retry after refresh_seconds
+                    print(
+                        f"Could not revalidate {key}, keeping the cached version: {e}"
+                    )
+                else:
+                    raise
+            self._checked_at[key] = time.monotonic()
+            return self._tables[key]
+
+    def invalidate(self):
+        """Drop every cached table so the next access reloads from the source."""
+        with self._lock:
+            self._tables.clear()
+            self._versions.clear()
+            self._checked_at.clear()
+            self._indexes.clear()
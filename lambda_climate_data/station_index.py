@@ -0,0 +1,56 @@
+import numpy as np
+from scipy.spatial import cKDTree
+
+EARTH_RADIUS_KM = 6371
+
+
+def lat_lon_to_unit_vectors(latitudes, longitudes):
+    """Convert degrees latitude/longitude into points on the unit sphere, shape (n, 3)."""
+    phi = np.radians(np.asarray(latitudes, dtype=np.float64))
+    lam = np.radians(np.asarray(longitudes, dtype=np.float64))
+    cos_phi = np.cos(phi)
+    return np.column_stack((cos_phi * np.cos(lam), cos_phi * np.sin(lam), np.sin(phi)))
+
+
+def chord_to_great_circle_km(chord):
+    """Convert a straight-line distance between unit vectors into a surface distance in km."""
+    return EARTH_RADIUS_KM * 2 * np.arcsin(np.clip(chord / 2, 0, 1))
+
+
+class StationIndex:
+    """
+    KD-tree over station positions on the unit sphere.
+
+    Nearest neighbors by straight-line (chord) distance are also nearest by
+    great-circle distance, so the tree answers haversine k-nearest queries in
+    logarithmic time without scanning every station.
+    """
+
+    def __init__(self, latitudes, longitudes):
+        self.size = len(latitudes)
+        self._tree = cKDTree(lat_lon_to_unit_vectors(latitudes, longitudes))
+
+    def query(self, target_lat, target_lon, num_results):
+        """
+        Find the closest stations to one or many target points.
+
+        :param target_lat: Latitude, or array of latitudes, in degrees.
+        :param target_lon: Longitude, or array of longitudes, in degrees.
+        :param num_results: Number of stations to return per target.
+        :return: (distances_km, indices), sorted closest first. Both have shape
+            (num_results,) for a scalar target and (n_targets, num_results) for arrays.
+        """
+        num_results = min(num_results, self.size)
+        scalar = np.ndim(target_lat) == 0
+        points = lat_lon_to_unit_vectors(
+            np.atleast_1d(target_lat), np.atleast_1d(target_lon)
+        )
+
+        chords, indices = self._tree.query(points, k=num_results)
+        chords = np.reshape(chords, (len(points), num_results))
+        indices = np.reshape(indices, (len(points), num_results))
+
+        distances = chord_to_great_circle_km(chords)
+        if scalar:
+            return distances[0], indices[0]
+        return distances, indices
@@ -0,0 +1,130 @@
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+
+try:
+    from multiprocessing import shared_memory, resource_tracker
+except ImportError:
+    shared_memory = None
+    resource_tracker = None
+
+"""
+Process pool for the station processors, for long-running servers with several cores.
+
+Parsing a station file and transforming its columns is mostly pandas work that holds
+the GIL, so station threads barely overlap. In the process pool each worker reads and
+transforms a whole station, then writes the result into a shared memory block as one
+int64 day array and one float64 value matrix. Only the block name and the column names
+are pickled back, and the parent copies the arrays out and frees the block. The parent
+waits for every worker of a request, so the blocks of the other stations are freed
+too when one fails.
+
+The pool is created on first use and kept for the life of the process, so its startup
+is paid once. AWS Lambda has no /dev/shm, so it cannot run the pool.
+
+It only helps with spare cores and stations that are parsed from CSV. On one core, or
+when the stations come from the parquet archive and parsing is cheap, the extra copy
+through shared memory and the task round trips make it no faster than threads, see
+benchmarks/station_execution.py. That is why it is opt-in with
+STATION_EXECUTION_MODE=process and never chosen as a fallback.
+"""
+STATION_PROCESS_WORKERS = int(
+    os.environ.get("STATION_PROCESS_WORKERS", os.cpu_count() or 1)
+)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def process_pool_available():
+    return shared_memory is not None and os.path.isdir("/dev/shm")
+
+
+def station_process_pool():
+    """Return the process pool shared by every request, creating it on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ProcessPoolExecutor(max_workers=STATION_PROCESS_WORKERS)
+    return _pool
+
+
+def shutdown_station_process_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+            _pool = None
+
+
+def process_station_to_shared_memory(function, args):
+    """
+    Run a station processor in a worker and move its result into shared memory.
+
+    :param function: process_noaa_station_data or process_nws_station_data.
+    :return: (block name, rows, weighted columns) for read_station_from_shared_memory.
+    """
+    station_data, weighted_cols = function(*args)
+    days = station_data["DATE"].to_numpy().astype("datetime64[D]").astype(np.int64)
+    values = station_data[["WEIGHT"] + weighted_cols].to_numpy(dtype=np.float64)
+
+    block = shared_memory.SharedMemory(
+        create=True, size=max(days.nbytes + values.nbytes, 1)
+    )
+    np.ndarray(days.shape, np.int64, block.buf)[:] = days
+    np.ndarray(values.shape, np.float64, block.buf, offset=days.nbytes)[:] = values
+    # The parent unlinks the block once it has read it
+    resource_tracker.unregister(block._name, "shared_memory")
+    block.close()
+    return block.name, len(days), weighted_cols
+
+
+def read_station_from_shared_memory(result):
+    """
+    Copy a station result out of its shared memory block and free the block.
+
+    :return: (station_data, weighted_cols), as returned by the station processor.
+    """
+    name, rows, weighted_cols = result
+    block = shared_memory.SharedMemory(name=name)
+    try:
+        days = np.ndarray(rows, np.int64, block.buf).copy()
+        values = np.ndarray(
+            (rows, len(weighted_cols) + 1), np.float64, block.buf, offset=days.nbytes
+        ).copy()
+    finally:
+        try:
+            block.close()
+        finally:
+            block.unlink()
+
+    station_data = pd.DataFrame(values, columns=["WEIGHT"] + weighted_cols)
+    station_data.insert(
+        0, "DATE", days.astype("datetime64[D]").astype("datetime64[ns]")
+    )
+    return station_data, weighted_cols
+
+
+def free_shared_memory(result):
+    """Free the block of a station result that will not be read, if not already."""
+    try:
+        block = shared_memory.SharedMemory(name=result[0])
+    except FileNotFoundError:
+        return
+    try:
+        block.close()
+    finally:
+        block.unlink()
+
+
+def free_shared_memory_blocks(results):
+    """Free the blocks of station results that will not be read, each on its own."""
+    for result in results:
+        try:
+            free_shared_memory(result)
+        except OSError as error:
+            # Keep freeing the rest, the failure already being raised matters more
+            print(f"Could not free shared memory block {result[0]}: {error}")
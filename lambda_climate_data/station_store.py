@@ -0,0 +1,129 @@
+import os
+import io
+import threading
+from contextlib import contextmanager
+
+"""
+Storage backends for the station files, station tables, training data and models.
+
+Every object is addressed by its key in the S3 bucket, with station files under
+"<directory>/<file name>". The S3 backend shares one client across all readers, with a
+connection pool sized to the number of threads reading stations at once, and hands the
+get_object body straight to the parser instead of downloading it to /tmp first. The
+local backend reads the same keys from local_directory, and station files from
+station_directory, and never imports boto3.
+"""
+
+
+def station_key(directory, file_name):
+    return f"{directory}/{file_name}"
+
+
+class S3StationStore:
+    """
+    Reads and writes objects in an S3 bucket through one shared client.
+
+    :param max_pool_connections: Size of the client's connection pool, at least the
+        number of threads reading from the store at once.
+    """
+
+    def __init__(self, bucket_name, max_pool_connections=10):
+        self.bucket_name = bucket_name
+        self.max_pool_connections = max_pool_connections
+        self._s3_client = None
+        self._lock = threading.Lock()
+
+    def client(self):
+        if self._s3_client is None:
+            import boto3
+            from botocore.config import Config
+
+            with self._lock:
+                if self._s3_client is None:
+                    self._s3_client = boto3.session.Session().client(
+                        "s3",
+                        config=Config(max_pool_connections=self.max_pool_connections),
+                    )
+        return self._s3_client
+
+    @contextmanager
+    def open(self, key):
+        """Yield the streaming body of key, raising ClientError if it does not exist."""
+        body = self.client().get_object(Bucket=self.bucket_name, Key=key)["Body"]
+        try:
+            yield body
+        finally:
+            body.close()
+
+    def open_station(self, directory, file_name):
+        return self.open(station_key(directory, file_name))
+
+    def fetch(self, key):
+        """Return the contents of key as a file-like object, with its ETag."""
+        response = self.client().get_object(Bucket=self.bucket_name, Key=key)
+        return io.BytesIO(response["Body"].read()), response["ETag"]
+
+    def version(self, key):
+        return self.client().head_object(Bucket=self.bucket_name, Key=key)["ETag"]
+
+    def write(self, key, body):
+        self.client().put_object(Bucket=self.bucket_name, Key=key, Body=body)
+        return f"s3://{self.bucket_name}/{key}"
+
+
+class LocalStationStore:
+    """
+    Reads and writes objects as files under local_directory.
+
+    :param station_directory: Directory holding the station file directories,
+        STATIONS in the working directory by default.
+    """
+
+    def __init__(self, local_directory, station_directory=None):
+        self.local_directory = local_directory
+        self.station_directory = station_directory or os.path.join(
+            os.getcwd(), "STATIONS"
+        )
+
+    def path(self, key):
+        return os.path.join(self.local_directory, *key.split("/"))
+
+    @contextmanager
+    def open(self, key):
+        """Yield the path of key, raising FileNotFoundError if it does not exist."""
+        yield existing_path(self.path(key))
+
+    @contextmanager
+    def open_station(self, directory, file_name):
+        yield existing_path(os.path.join(self.station_directory, directory, file_name))
+
+    def fetch(self, key):
+        """Return the path of key, with its modification time as the version."""
+        return self.path(key), self.version(key)
+
+    def version(self, key):
+        return os.stat(self.path(key)).st_mtime_ns
+
+    def write(self, key, body):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(body)
+        return path
+
+
+def existing_path(path):
+    if not os.path.exists(path):
+        raise FileNotFoundError(path)
+    return path
+
+
+def is_missing_object_error(e):
+    """
+    True for the error either backend raises when a key does not exist. S3 answers
+    403 AccessDenied instead of 404 for a missing key without s3:ListBucket on the
+    bucket, so that is treated as missing too.
+    """
+    if isinstance(e, FileNotFoundError):
+        return True
+    return e.response["Error"]["Code"] in ("NoSuchKey", "404", "AccessDenied", "403")
@@ -0,0 +1,246 @@
+import os
+import sys
+import json
+import time
+import uuid
+import functools
+import itertools
+import threading
+from contextvars import ContextVar
+
+"""
+Nested timing spans for the interpolation pipeline.
+
+    with span("noaa_aggregate", stations=len(files)) as noaa_span:
+        ...
+        noaa_span.set(rows=len(df))
+
+    @traced
+    def process_noaa_station_data(...): ...
+
+A span started inside another becomes its child. When a span with no parent ends,
+the whole tree is handed to every sink added with add_sink. Tracing is off unless a
+sink is added or TRACE_DEBUG is set, and then span returns a shared no-op span, so
+leaving spans in the request path costs one function call each.
+
+Configured from the environment at import:
+    TRACE_LOG    Write every span as a JSON line to this file, or to stdout if "-".
+    TRACE_DEBUG  If "1", record spans so the request handlers can return their
+                 durations in a Server-Timing response header, see server_timing.
+
+Spans follow the thread that started them. Work submitted to a thread pool is
+wrapped with bind_current_span so its spans nest under the span that submitted it.
+"""
+TRACE_LOG = os.environ.get("TRACE_LOG")
+TRACE_DEBUG = os.environ.get("TRACE_DEBUG", "0").lower() in ("1", "true", "yes")
+
+_current_span = ContextVar("current_span", default=None)
+_span_ids = itertools.count(1)
+_sinks = []
+_enabled = TRACE_DEBUG
+
+
+class Span:
+    """One timed operation, with its attributes and the spans started inside it."""
+
+    __slots__ = (
+        "name",
+        "attributes",
+        "children",
+        "parent",
+        "span_id",
+        "trace_id",
+        "start_time",
+        "duration",
+        "_start",
+        "_token",
+    )
+
+    def __init__(self, name, attributes):
+        self.name = name
+        self.attributes = attributes
+        self.children = []
+        self.parent = None
+        self.span_id = next(_span_ids)
+        self.trace_id = None
+        self.start_time = None
+        self.duration = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+        return self
+
+    def __enter__(self):
+        self.parent = _current_span.get()
+        self.trace_id = (
+            self.parent.trace_id if self.parent is not None else uuid.uuid4().hex
+        )
+        self._token = _current_span.set(self)
+        self.start_time = time.time()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.duration = time.perf_counter() - self._start
+        _current_span.reset(self._token)
+        if exc_type is not None:
+            self.attributes["error"] = exc_type.__name__
+        if self.parent is not None:
+            # list.append is atomic, so spans ending on several threads are safe
+            self.parent.children.append(self)
+        else:
+            for sink in list(_sinks):
+                sink.emit(self)
+        return False
+
+    def walk(self):
+        """Yield this span and every span under it, depth first."""
+        yield self
+        for child in self.children:
+            yield from child.walk()
+
+    def find(self, name):
+        """Return every span under this one, or this one, with the given name."""
+        return [traced_span for traced_span in self.walk() if traced_span.name == name]
+
+    def to_dict(self):
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent.span_id if self.parent is not None else None,
+            "name": self.name,
+            "start_time": self.start_time,
+            "duration_ms": self.duration * 1000,
+            "attributes": self.attributes,
+        }
+
+
+class NoopSpan:
+    """Returned by span while tracing is off, so callers need no checks."""
+
+    __slots__ = ()
+
+    def set(self, **attributes):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+NOOP_SPAN = NoopSpan()
+
+
+def span(name, **attributes):
+    """Return a span to use as a context manager, or NOOP_SPAN if tracing is off."""
+    if not _enabled:
+        return NOOP_SPAN
+    return Span(name, attributes)
+
+
+def traced(function=None, name=None):
+    """
+    Decorator running the function in a span, named after the function by default.
+    Use as @traced or @traced(name="...").
+    """
+    if function is None:
+        return functools.partial(traced, name=name)
+    span_name = name or function.__name__
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        if not _enabled:
+            return function(*args, **kwargs)
+        with Span(span_name, {}):
+            return function(*args, **kwargs)
+
+    return wrapper
+
+
+def current_span():
+    """The innermost open span of this thread, or NOOP_SPAN."""
+    current = _current_span.get() if _enabled else None
+    return current if current is not None else NOOP_SPAN
+
+
+def bind_current_span(function):
+    """Wrap function so spans it starts on another thread nest under the current span."""
+    parent = _current_span.get() if _enabled else None
+    if parent is None:
+        return function
+
+    @functools.wraps(function)
+    def bound(*args, **kwargs):
+        token = _current_span.set(parent)
+        try:
+            return function(*args, **kwargs)
+        finally:
+            _current_span.reset(token)
+
+    return bound
+
+
+def server_timing(root):
+    """
+    Server-Timing header value of a span tree, with the total duration of each span
+    name in the order first started, e.g. "climate_data;dur=812.4, ...".
+    """
+    if not isinstance(root, Span) or root.duration is None:
+        return ""
+    totals = {}
+    for traced_span in root.walk():
+        totals[traced_span.name] = (
+            totals.get(traced_span.name, 0) + traced_span.duration
+        )
+    return ", ".join(f"{name};dur={total * 1000:.1f}" for name, total in totals.items())
+
+
+def add_sink(sink):
+    global _enabled
+    _sinks.append(sink)
+    _enabled = True
+
+
+def remove_sink(sink):
+    global _enabled
+    _sinks.remove(sink)
+    _enabled = bool(_sinks) or TRACE_DEBUG
+
+
+class JsonLinesSink:
+    """Writes each span of a finished tree as one JSON object per line."""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self._lock = threading.Lock()
+
+    def emit(self, root):
+        lines = "".join(
+            json.dumps(traced_span.to_dict(), default=str) + "\n"
+            for traced_span in root.walk()
+        )
+        with self._lock:
+            self.stream.write(lines)
+            self.stream.flush()
+
+
+class MemorySink:
+    """Keeps every finished span tree in spans, for tests and benchmarks."""
+
+    def __init__(self):
+        self.spans = []
+
+    def emit(self, root):
+        self.spans.append(root)
+
+    def find(self, name):
+        return [found for root in self.spans for found in root.find(name)]
+
+    def clear(self):
+        self.spans.clear()
+
+
+if TRACE_LOG:
+    add_sink(JsonLinesSink(sys.stdout if TRACE_LOG == "-" else open(TRACE_LOG, "a")))
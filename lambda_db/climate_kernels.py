@@ -0,0 +1 @@
+../lambda_climate_data/climate_kernels.py
\ No newline at end of file
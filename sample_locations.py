@@ -14,6 +14,8 @@ import psycopg2.extras
 from dotenv import load_dotenv
 import os
 
+from lambda_climate_data.climate_kernels import leap_aligned_day_of_year, solar_geometry
+
 
 load_dotenv()
 
@@ -359,15 +361,13 @@ def climate_data(target_lat, target_lon, target_elevation):
 
     combined["DATE"] = pd.to_datetime(combined["DATE"])
     combined.set_index("DATE", inplace=True)
-    combined["DAY_OF_YEAR"] = combined.index.dayofyear
     combined["DATE"] = combined.index
 
-    sun_data = calc_sun_angle_and_daylight_length(target_lat)
-    sun_df = pd.DataFrame(
-        sun_data, columns=["DAY_OF_YEAR", "SUN_ANGLE", "DAYLIGHT_LENGTH"]
-    )
-    combined = combined.merge(sun_df, on="DAY_OF_YEAR", how="left")
-    combined.drop(columns=["DAY_OF_YEAR"], inplace=True)
+    sun_angle, daylight_length = solar_geometry(target_lat)
+    solar_days = leap_aligned_day_of_year(combined.index) - 1
+    combined["SUN_ANGLE"] = sun_angle[solar_days]
+    combined["DAYLIGHT_LENGTH"] = daylight_length[solar_days]
+    combined.reset_index(drop=True, inplace=True)
     combined.drop(columns=["DTR"], inplace=True)
     combined.drop(columns=["REGR_DEWPOINT_AVG"], inplace=True)
     combined.columns = combined.columns.str.replace("DAILY_", "")
@@ -416,37 +416,6 @@ def climate_data(target_lat, target_lon, target_elevation):
     return combined
 
 
-def calc_sun_angle_and_daylight_length(latitude_degrees):
-    results = []
-
-    for day_of_year in range(1, 366):
-        # declination of the sun as a function of the day of the year
-        delta = -23.45 * cos(radians(360 / 365 * (day_of_year + 10)))
-        phi = radians(latitude_degrees)  # convert latitude to radians
-
-        # calculating the hour angle at which the sun sets/rises
-        clamped_value = max(-1, min(1, -tan(phi) * tan(radians(delta))))
-
-        # If clamped_value is -1 or 1, the sun never rises or never sets, respectively.
-        if clamped_value == 1:
-            daylight_length = 0  # Polar night
-            elevation_angle = 0  # Sun is below horizon all day
-        elif clamped_value == -1:
-            daylight_length = 24  # Midnight sun
-            # elevation_angle = 90  # Maximum possible solar noon elevation
-        else:
-            omega = acos(clamped_value)
-            daylight_length = 2 * omega * 24 / (2 * pi)  # Convert radians to hours
-            # solar noon elevation
-            elevation_angle = degrees(
-                asin(sin(phi) * sin(radians(delta)) + cos(phi) * cos(radians(delta)))
-            )
-
-        results.append((day_of_year, elevation_angle, daylight_length))
-
-    return results
-
-
 def process_noaa_station_data(station, weight, elev_diff):
     USE_COLS = ["DATE", "PRCP", "SNOW", "TMAX", "TMIN"]
     FREEZING_POINT_F = 32